@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# Measures the per-query cost of the hot statements in swagbot/database when
+# their values are formatted into the SQL, as the DAO modules used to build
+# them, against the bound statements from swagbot.database.queries. Formatted
+# SQL differs for every value, so sqlite3 has to prepare each one; bound
+# statements are prepared once and reused from the statement cache. Runs
+# against a scratch database, so it never touches ~/.swagbot.
+#
+#   ./benchmarks/queries.py --rows 5000 --iterations 50000
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+schema = [
+    'CREATE TABLE users (id TEXT PRIMARY KEY, name TEXT, real_name TEXT, email TEXT, is_bot INTEGER, is_app_user INTEGER, updated INTEGER)',
+    'CREATE TABLE seen (id TEXT PRIMARY KEY, name TEXT, seen_time INTEGER, seen_channel TEXT)',
+    'CREATE TABLE commands (command TEXT PRIMARY KEY, description TEXT, usage TEXT, is_admin INTEGER, can_be_disabled INTEGER, module TEXT, method TEXT, type TEXT, monospace INTEGER, split_output INTEGER)',
+    'CREATE TABLE command_settings (command TEXT PRIMARY KEY, module TEXT, enabled INTEGER, hidden INTEGER)',
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare formatted and bound SQL for the bot\'s hot statements.')
+    parser.add_argument('--rows', help='Users and commands to seed the scratch database with.', metavar='<count>', type=int, default=1000, action='store')
+    parser.add_argument('--iterations', help='Queries to run for each case.', metavar='<count>', type=int, default=20000, action='store')
+    return parser.parse_args()
+
+def seed(database=None, rows=None):
+    with database.write() as conn:
+        for create in schema:
+            conn.execute(create)
+        conn.executemany('INSERT INTO users (id, name, real_name, email, is_bot, is_app_user, updated) VALUES (?, ?, ?, ?, 0, 0, 0)',
+            [(f'U{i:08d}', f'user{i}', f'User {i}', f'user{i}@example.com') for i in range(rows)])
+        conn.executemany('INSERT INTO commands (command, description, usage, is_admin, can_be_disabled, module, method, type, monospace, split_output) VALUES (?, ?, ?, 0, 1, ?, ?, ?, 0, 0)',
+            [(f'command{i}', 'A command.', f'command{i}', 'swagbot.plugins.core', f'command{i}', 'all') for i in range(rows)])
+        conn.executemany('INSERT INTO command_settings (command, module, enabled, hidden) VALUES (?, ?, 1, 0)',
+            [(f'command{i}', 'swagbot.plugins.core') for i in range(rows)])
+
+def cases(queries=None):
+    # name, connection type, formatted SQL for a value, bound SQL, parameters
+    # for a value
+    lookup = queries.core['command_lookup']
+    return [
+        ('core.get_user_by_id', 'read',
+            lambda i: f'SELECT * FROM users WHERE id="U{i:08d}"',
+            queries.core['get_user_by_id'],
+            lambda i: (f'U{i:08d}',)),
+        ('core.command_lookup', 'read',
+            lambda i: lookup.replace('commands.command=?', f"commands.command='command{i}'"),
+            lookup,
+            lambda i: (f'command{i}',)),
+        ('core.update_seen', 'write',
+            lambda i: f'INSERT OR REPLACE INTO seen (id, name, seen_time, seen_channel) VALUES ("U{i:08d}", "user{i}", {i}, "C00000001")',
+            queries.core['update_seen'],
+            lambda i: (f'U{i:08d}', f'user{i}', i, 'C00000001')),
+    ]
+
+def run(database=None, kind=None, statement=None, parameters=None, values=None):
+    # Returns microseconds per query.
+    start = time.perf_counter()
+    for i in values:
+        if kind == 'read':
+            with database.read() as conn:
+                conn.execute(statement(i), parameters(i)).fetchone()
+        else:
+            with database.write() as conn:
+                conn.execute(statement(i), parameters(i))
+    return (time.perf_counter() - start) / len(values) * 1000000
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+    import swagbot.database.connection as connection
+    import swagbot.database.queries as queries
+    import swagbot.utils.core as utils
+
+    with tempfile.TemporaryDirectory() as scratch:
+        database = connection.Database(path=os.path.join(scratch, 'bench.db'))
+        seed(database=database, rows=args.rows)
+        values = [random.randrange(args.rows) for _ in range(args.iterations)]
+        rows = []
+        for name, kind, formatted, bound, parameters in cases(queries=queries):
+            # Warm the page cache and the statement cache first.
+            run(database=database, kind=kind, statement=lambda i: bound, parameters=parameters, values=values[:1000])
+            before = run(database=database, kind=kind, statement=formatted, parameters=lambda i: (), values=values)
+            after = run(database=database, kind=kind, statement=lambda i: bound, parameters=parameters, values=values)
+            rows.append([name, f'{before:.2f}', f'{after:.2f}', f'{before / after:.2f}x'])
+        database.close()
+
+    print(f'{args.iterations} queries per case against {args.rows} rows.')
+    print(utils.generate_table(headers=['Statement', 'Formatted us/query', 'Bound us/query', 'Speedup'], data=rows))
+
+if __name__ == '__main__':
+    main()
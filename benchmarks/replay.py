@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+# Replays message events through SwagBot without a Slack workspace and reports
+# throughput, command latency percentiles, and database, HTTP, and Slack calls
+# per command. The bot's database is used as is, so point --home at a scratch
+# copy of ~/.swagbot rather than a live bot's.
+#
+#   ./benchmarks/replay.py --home /tmp/swagbot-bench --synthetic 1000 --commands time,uptime,help --rate 200
+#   ./benchmarks/replay.py --home /tmp/swagbot-bench --events events.jsonl --latency 0.05
+
+import argparse
+import os
+import sys
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Replay message events through SwagBot with a fake Slack client.')
+    parser.add_argument('--home', help='Use <home>/.swagbot instead of ~/.swagbot.', metavar='<home>', action='store')
+    parser.add_argument('--config', help='The bot config file. Defaults to <home>/.swagbot/bot.yml.', metavar='<file>', action='store')
+    parser.add_argument('--events', help='A JSONL file of Slack message events to replay.', metavar='<file>', action='store')
+    parser.add_argument('--synthetic', help='Generate <count> events instead, cycling through --commands.', metavar='<count>', type=int, action='store')
+    parser.add_argument('--commands', help='Comma-separated commands for --synthetic.', metavar='<commands>', default='time,uptime,help', action='store')
+    parser.add_argument('--rate', help='Events per second. 0 replays as fast as possible.', metavar='<rate>', type=float, default=0, action='store')
+    parser.add_argument('--latency', help='Seconds added to every fake Slack API call.', metavar='<seconds>', type=float, default=0, action='store')
+    parser.add_argument('--users', help='Users in the fake workspace.', metavar='<count>', type=int, default=100, action='store')
+    parser.add_argument('--channels', help='Channels in the fake workspace.', metavar='<count>', type=int, default=20, action='store')
+    parser.add_argument('--timeout', help='Seconds to wait for commands to finish.', metavar='<seconds>', type=float, default=120, action='store')
+    parser.add_argument('--debug', help='Log at the debug level.', action='store_true')
+    args = parser.parse_args()
+    if not args.events and not args.synthetic:
+        parser.error('one of --events or --synthetic is required')
+    return args
+
+def main():
+    args = parse_args()
+    if args.home:
+        # The database modules open their files under ~ when they are imported.
+        os.environ['HOME'] = args.home
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+    import swagbot.database.core
+    from swagbot.bot import SwagBot
+    import swagbot.globals as globals
+    import swagbot.harness as harness
+
+    config_file = args.config if args.config else os.path.expanduser('~/.swagbot/bot.yml')
+    globals.bot = SwagBot(config_file=config_file, debug=args.debug)
+    client = harness.FakeWebClient(
+        latency=args.latency,
+        users=harness.fake_users(count=args.users),
+        channels=harness.fake_channels(count=args.channels),
+    )
+    replay = harness.Harness(bot=globals.bot, client=client)
+    replay.start()
+
+    if args.events:
+        events = harness.load_events(path=args.events)
+    else:
+        events = harness.synthetic_events(
+            commands=args.commands.split(','),
+            count=args.synthetic,
+            users=client.users,
+            channels=client.channels,
+            prefix=globals.bot.command_prefix,
+        )
+
+    start = time.perf_counter()
+    replay.replay(events=events, rate=args.rate)
+    replay.wait(timeout=args.timeout)
+    elapsed = time.perf_counter() - start
+    print(replay.report(elapsed=elapsed, events=len(events)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# Compares the loop over cursor.description that used to build a dict for
+# every row with swagbot.database.connection.Row on the bot's own tables. Each
+# statement from swagbot.database.queries is fetched --iterations times, once
+# only fetching the rows and once also reading every column by name, since Row
+# looks names up on access where a dict already has them. Plugins usually read
+# a few columns of each row, so real use falls between the two. The databases
+# are opened read-only, so it is safe to point --home at a live bot, and
+# statements whose database or table doesn't exist are skipped.
+#
+#   ./benchmarks/rows.py --home /tmp/swagbot-bench --iterations 500
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare row factories on the bot\'s tables.')
+    parser.add_argument('--home', help='Read <home>/.swagbot instead of ~/.swagbot.', metavar='<home>', action='store')
+    parser.add_argument('--iterations', help='Times to fetch each statement.', metavar='<count>', type=int, default=200, action='store')
+    return parser.parse_args()
+
+def loop_factory(cursor, row):
+    d = {}
+    for idx,col in enumerate(cursor.description):
+        d[col[0]] = row[idx]
+    return d
+
+def statements(queries=None):
+    # database file, name, SQL, parameters
+    output = [
+        ('bot.db', 'core.help', queries.core['help'], (1,)),
+        ('bot.db', 'core.module_list', queries.core['module_list'], ()),
+        ('bot.db', 'core.admin_list', queries.core['admin_list'], ()),
+        ('bot.db', 'scheduler.get_all_jobs', queries.scheduler['get_all_jobs'], ()),
+    ]
+    for table in queries.pagerduty_tables:
+        output.append(('swagbot.plugins.pagerduty.db', f'pagerduty.list({table})', queries.pagerduty['list'][table], (None,)))
+    return output
+
+def run(conn=None, factory=None, select=None, parameters=None, iterations=None, read=False):
+    # Returns the row count and microseconds per fetch.
+    conn.row_factory = factory
+    cursor = conn.execute(select, parameters)
+    columns = [column[0] for column in cursor.description]
+    count = len(cursor.fetchall())
+    start = time.perf_counter()
+    for _ in range(iterations):
+        results = conn.execute(select, parameters).fetchall()
+        if read:
+            for row in results:
+                for column in columns:
+                    row[column]
+    return count, (time.perf_counter() - start) / iterations * 1000000
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+    import swagbot.database.connection as connection
+    import swagbot.database.queries as queries
+    import swagbot.utils.core as utils
+
+    config_root = os.path.join(args.home if args.home else os.path.expanduser('~'), '.swagbot')
+    connections = {}
+    rows = []
+    for dbfile, name, select, parameters in statements(queries=queries):
+        path = os.path.join(config_root, dbfile)
+        if not os.path.isfile(path):
+            continue
+        if not path in connections:
+            connections[path] = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        conn = connections[path]
+        try:
+            timings = []
+            for read in [False, True]:
+                for factory in [loop_factory, connection.Row]:
+                    count, timing = run(conn=conn, factory=factory, select=select, parameters=parameters, iterations=args.iterations, read=read)
+                    timings.append(timing)
+        except sqlite3.Error as e:
+            print(f'Skipping {name}: {e}')
+            continue
+        fetch_loop, fetch_row, read_loop, read_row = timings
+        rows.append([name, count, f'{fetch_loop:.1f}', f'{fetch_row:.1f}', f'{fetch_loop / fetch_row:.2f}x', f'{read_loop:.1f}', f'{read_row:.1f}', f'{read_loop / read_row:.2f}x'])
+    for conn in connections.values():
+        conn.close()
+
+    if len(rows) == 0:
+        print(f'No tables found under {config_root}.')
+        return
+    print(f'Microseconds per fetch, {args.iterations} fetches each.')
+    print(utils.generate_table(headers=['Statement', 'Rows', 'Fetch dict', 'Fetch Row', 'Speedup', 'Read dict', 'Read Row', 'Speedup'], data=rows))
+
+if __name__ == '__main__':
+    main()
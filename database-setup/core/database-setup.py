@@ -11,6 +11,9 @@ import re
 import sqlite3
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import swagbot.database.connection as connection
+
 def dict_factory(cursor, row):
     d = {}
     for idx,col in enumerate(cursor.description):
@@ -80,166 +83,11 @@ def make_confdir():
             sys.exit(1)
 
 def create_schema():
-    logger.info('Creating the database schema.')
-    config = {
-        'tables': {
-            'afk': {
-                'columns': {
-                    'username': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'message': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'timestamp': { 'type': 'integer', 'null': False, 'primary_key': False },
-                }
-            },
-            'command_settings': {
-                'columns': {
-                    'command': { 'type': 'text', 'null': False, 'primary_key': True },
-                    'module': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'enabled': { 'type': 'integer', 'null': False, 'primary_key': False, 'default': 1 },
-                    'hidden': { 'type': 'integer', 'null': False, 'primary_key': False, 'default': 0 },
-                    'channels': { 'type': 'integer', 'null': True, 'primary_key': False },
-                }
-            },
-            'commands': {
-                'columns': {
-                    'command': { 'type': 'text', 'null': False, 'primary_key': True },
-                    'usage': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'is_admin': { 'type': 'integer', 'null': False, 'primary_key': False, 'default': 0 },
-                    'can_be_disabled': { 'type': 'integer', 'null': False, 'primary_key': False, 'default': 1 },
-                    'module': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'method': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'type': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'monospace': { 'type': 'integer', 'null': False, 'primary_key': False, 'default': 0 },
-                    'split_output': { 'type': 'integer', 'null': False, 'primary_key': False, 'default': 0 },
-                }
-            },
-            'curses': {
-                'columns': {
-                    'username': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'curses_count': { 'type': 'integer', 'null': False, 'primary_key': False },
-                    'last_curse_time': { 'type': 'integer', 'null': False, 'primary_key': False },
-                    'last_curse_word': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'last_curse_channel': { 'type': 'text', 'null': False, 'primary_key': False },
-                }
-            },
-            'curse_words': {
-                'columns': {
-                    'word': { 'type': 'text', 'null': False, 'unique': True },
-                }
-            },
-            'modules': {
-                'columns': {
-                    'module': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'enabled': { 'type': 'integer', 'null': False, 'primary_key': False, 'default': 1 },
-                    'can_be_disabled': { 'type': 'integer', 'null': False, 'primary_key': False, 'default': 0 },
-                },
-            },
-            'greetings': {
-                'columns': {
-                    'language': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': True },
-                    'greeting': { 'type': 'text', 'null': False, 'unique': False, 'primary_key': False },
-                },
-            },
-            'seen': {
-                'columns': {
-                    'username': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'userid': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'time': { 'type': 'integer', 'null': False, 'primary_key': False },
-                    'channel': { 'type': 'text', 'null': False, 'primary_key': False },
-                },
-            },
-            # 'timers': {
-            #     'columns': {
-            #         'title': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': False },
-            #         'description': { 'type': 'text', 'null': False, 'primary_key': False },
-            #         'expires': { 'type': 'integer', 'null': False, 'primary_key': False },
-            #         'expired': { 'type': 'integer', 'null': False, 'primary_key': False },
-            #     }
-            # },
-            'users': {
-                'columns': {
-                    'id': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': True },
-                    'name': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': False },
-                    'real_name': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': False },
-                    'email': { 'type': 'text', 'null': True, 'unique': True, 'primary_key': False },
-                    'is_bot': { 'type': 'integer', 'null': True, 'unique': False, 'primary_key': False },
-                    'is_app_user': { 'type': 'integer', 'null': True, 'unique': False, 'primary_key': False },
-                    'deleted': { 'type': 'integer', 'null': True, 'primary_key': False, 'default': 0 },
-                    'updated': { 'type': 'integer', 'null': True, 'primary_key': False, 'default': 0 },
-                },
-            },
-            'admins': {
-                'columns': {
-                    'id': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': True },
-                    'name': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': False },
-                    'real_name': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': False },
-                },
-            },
-            'seen': {
-                'columns': {
-                    'id': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': True },
-                    'name': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': False },
-                    'seen_time': { 'type': 'integer', 'null': True, 'primary_key': False, 'default': 0 },
-                    'seen_channel': { 'type': 'text', 'null': True, 'primary_key': False },
-                },
-            },
-            'channels': {
-                'columns': {
-                    'id': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': True },
-                    'name': { 'type': 'text', 'null': False, 'unique': True, 'primary_key': False },
-                    'is_channel': { 'type': 'integer', 'null': True, 'unique': False, 'primary_key': False, 'default': 0 },
-                    'is_group': { 'type': 'integer', 'null': True, 'unique': False, 'primary_key': False, 'default': 0 },
-                    'is_im': { 'type': 'integer', 'null': True, 'unique': False, 'primary_key': False, 'default': 0 },
-                    'is_private': { 'type': 'integer', 'null': True, 'unique': False, 'primary_key': False, 'default': 0 },
-                    'is_mpim': { 'type': 'integer', 'null': True, 'unique': False, 'primary_key': False, 'default': 0 },
-                    'created': { 'type': 'integer', 'null': True, 'unique': False, 'primary_key': False, 'default': 0 },
-                    'creator': { 'type': 'text', 'null': True, 'unique': False, 'primary_key': False },
-                    'updated': { 'type': 'integer', 'null': True, 'unique': False, 'primary_key': False, 'default': 0 },
-                    'name_normalized': { 'type': 'text', 'null': True, 'unique': False, 'primary_key': False },
-                }
-            },
-            'slack_errors': {
-                'columns': {
-                    'method': { 'type': 'text', 'null': False, 'unique': False, 'primary_key': False },
-                    'error': { 'type': 'text', 'null': False, 'unique': False, 'primary_key': False },
-                    'bot_error': { 'type': 'text', 'null': False, 'unique': False, 'primary_key': False },
-                },
-            },
-            # CREATE TABLE scheduler (
-            # id INTEGER PRIMARY KEY AUTOINCREMENT,
-            # name TEXT NOT NULL,
-            # description TEXT,
-            # module TEXT NOT NULL,
-            # interval INTEGER NOT NULL,
-            # function TEXT NOT NULL,
-            # enabled INTEGER NOT NULL DEFAULT 1,
-            # paused_until INTEGER DEFAULT 0,
-            # UNIQUE(name, module) ON CONFLICT FAIL);
-        }	
-    }
-
-    for table_name, table_obj in config['tables'].items():
-        drop = 'DROP TABLE IF EXISTS {}'.format(table_name)
-        res = cursor.execute(drop)
-        conn.commit()
-
-        create_arr = []
-        for col_name, col_obj in table_obj['columns'].items():
-            arr = []
-            arr.append('{} {}'.format(col_name, col_obj['type'].upper()))
-            if 'null' in col_obj and col_obj['null'] == False:
-                arr.append('NOT NULL')
-            if 'primary_key' in col_obj and col_obj['primary_key'] == True:
-                arr.append('PRIMARY KEY')
-            if 'autoincrement' in col_obj and col_obj['autoincrement'] == True:
-                arr.append('AUTOINCREMENT')
-            if 'unique' in col_obj and col_obj['unique'] == True:
-                arr.append('UNIQUE')
-            if 'default' in col_obj:
-                arr.append('DEFAULT {}'.format(col_obj['default']))
-            create_arr.append(' '.join(arr))
-        create = 'CREATE TABLE {} ({})'.format(table_name, ', '.join(create_arr))
-        cursor.execute(create)
-        conn.commit()
+    # The schema is kept in swagbot.database.migrations, which brings the
+    # database up to date when it's opened.
+    logger.info('Updating the database schema.')
+    connection.get(path=database).open_writer()
+    connection.close_all()
 
 def enable_core_plugin():
     core_plugins = [
@@ -250,8 +98,10 @@ def enable_core_plugin():
     for plugin in core_plugins:
         logger.info('Enabling the plugin {}.'.format(plugin))
         try:
-            insert = 'INSERT INTO modules (module,enabled,can_be_disabled) VALUES("{}",1,0)'.format(plugin)
-            cursor.execute(insert)
+            if cursor.execute('SELECT module FROM modules WHERE module=?', (plugin,)).fetchone():
+                continue
+            insert = 'INSERT INTO modules (module,enabled,can_be_disabled) VALUES(?,1,0)'
+            cursor.execute(insert, (plugin,))
             conn.commit()
         except sqlite3.IntegrityError as e:
             logger.fatal('Failed to enable the core plugin: {}'.format(e))
@@ -292,6 +142,7 @@ def populate_slack_errors_table():
     conn = sqlite3.connect(database, check_same_thread=False)
     conn.row_factory = dict_factory
     cursor = conn.cursor()
+    cursor.execute('DELETE FROM slack_errors')
 
     for row in slack_error_data:
         print(row[0])
@@ -308,7 +159,7 @@ confdir = os.path.join( os.path.expanduser('~'), '.swagbot' )
 database = os.path.join(confdir, 'bot.db')
 
 result = get_input(
-    text='This will completely destroy any existing swagbot database in "{}". Are you sure you want to do this?'.format(confdir),
+    text='This will create or update the swagbot database in "{}" and reload its greetings and Slack errors. Are you sure you want to do this?'.format(confdir),
     default='no'
 )
 if result == 'yes':
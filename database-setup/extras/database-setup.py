@@ -7,6 +7,9 @@ import os
 import re
 import sqlite3
 import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import swagbot.database.connection as connection
 import time
 
 def dict_factory(cursor, row):
@@ -68,57 +71,20 @@ def is_file(path):
     return False
 
 def create_schema():
-    logger.info('Creating the database schema.')
-    config = {
-        'tables': {
-            'currency_conversion': {
-                'columns': {
-                    'currency_code': { 'type': 'text', 'null': False, 'unique': True },
-                    'currency_name': { 'type': 'text', 'null': False, 'unique': False }
-                }
-            },
-            'crypto_conversion': {
-                'columns': {
-                    'currency_code': { 'type': 'text', 'null': False, 'unique': True },
-                    'currency_name': { 'type': 'text', 'null': False, 'unique': False }
-                }
-            },
-        }	
-    }
-
-    for table_name, table_obj in config['tables'].items():
-        drop = 'DROP TABLE IF EXISTS {}'.format(table_name)
-        res = cursor.execute(drop)
-        conn.commit()
-
-        create_arr = []
-        for col_name, col_obj in table_obj['columns'].items():
-            arr = []
-            arr.append('{} {}'.format(col_name, col_obj['type'].upper()))
-            if 'null' in col_obj and col_obj['null'] == False:
-                arr.append('NOT NULL')
-            if 'primary_key' in col_obj and col_obj['primary_key'] == True:
-                arr.append('PRIMARY KEY')
-            if 'autoincrement' in col_obj and col_obj['autoincrement'] == True:
-                arr.append('AUTOINCREMENT')
-            if 'unique' in col_obj and col_obj['unique'] == True:
-                arr.append('UNIQUE')
-            if 'default' in col_obj:
-                arr.append('DEFAULT {}'.format(col_obj['default']))
-            create_arr.append(' '.join(arr))
-        create = 'CREATE TABLE {} ({})'.format(table_name, ', '.join(create_arr))
-        cursor.execute(create)
-        conn.commit()
+    # The schema is kept in swagbot.database.migrations, which brings the
+    # database up to date when it's opened.
+    logger.info('Updating the database schema.')
+    connection.get(path=database).open_writer()
+    connection.close_all()
 
 def populate_currency(table_name=None, filename=None):
     filename = os.path.join(os.getcwd(), filename)
     currency_data = parse_csv(filename)
 
-    confdir = os.path.join( os.path.expanduser('~'), '.swagbot' )
-    database = os.path.join(confdir, 'bot.db')
     conn = sqlite3.connect(database, check_same_thread=False)
     conn.row_factory = dict_factory
     cursor = conn.cursor()
+    cursor.execute(f'DELETE FROM {table_name}')
 
     for row in currency_data:
         insert = f'INSERT INTO {table_name} (currency_code, currency_name) VALUES(?,?)'
@@ -148,7 +114,7 @@ confdir = os.path.join( os.path.expanduser('~'), '.swagbot' )
 database = os.path.join(confdir, 'swagbot.plugins.extras.db')
 
 result = get_input(
-    text='This will completely destroy any existing swagbot.plugins.extras database in "{}". Are you sure you want to do this?'.format(confdir),
+    text='This will create or update the swagbot.plugins.extras database in "{}" and reload its currencies. Are you sure you want to do this?'.format(confdir),
     default='no'
 )
 
@@ -156,7 +122,7 @@ if result == 'yes':
     conn = sqlite3.connect(database, check_same_thread=False)
     conn.row_factory = dict_factory
     cursor = conn.cursor()
-    # create_schema()
+    create_schema()
     populate_physical_currency()
     populate_crypto_currency()
     logger.info('The database setup is complete.')
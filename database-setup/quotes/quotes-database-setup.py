@@ -10,6 +10,9 @@ import re
 import sqlite3
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import swagbot.database.connection as connection
+
 def dict_factory(cursor, row):
     d = {}
     for idx,col in enumerate(cursor.description):
@@ -72,41 +75,11 @@ def make_confdir():
             sys.exit(1)
 
 def create_schema():
-    logger.info('Creating the database schema.')
-    config = {
-        'tables': {
-            'quotes': {
-                'columns': {
-                    'quote': { 'type': 'text', 'null': False, 'primary_key': False },
-                    'category': { 'type': 'text', 'null': False, 'primary_key': False }
-                },
-            },
-        }	
-    }
-
-    for table_name, table_obj in config['tables'].items():
-        drop = 'DROP TABLE IF EXISTS {}'.format(table_name)
-        res = cursor.execute(drop)
-        conn.commit()
-
-        create_arr = []
-        for col_name, col_obj in table_obj['columns'].items():
-            arr = []
-            arr.append('{} {}'.format(col_name, col_obj['type'].upper()))
-            if 'null' in col_obj and col_obj['null'] == False:
-                arr.append('NOT NULL')
-            if 'primary_key' in col_obj and col_obj['primary_key'] == True:
-                arr.append('PRIMARY KEY')
-            if 'autoincrement' in col_obj and col_obj['autoincrement'] == True:
-                arr.append('AUTOINCREMENT')
-            if 'unique' in col_obj and col_obj['unique'] == True:
-                arr.append('UNIQUE')
-            if 'default' in col_obj:
-                arr.append('DEFAULT {}'.format(col_obj['default']))
-            create_arr.append(' '.join(arr))
-        create = 'CREATE TABLE {} ({})'.format(table_name, ', '.join(create_arr))
-        cursor.execute(create)
-        conn.commit()
+    # The schema is kept in swagbot.database.migrations, which brings the
+    # database up to date when it's opened.
+    logger.info('Updating the database schema.')
+    connection.get(path=database).open_writer()
+    connection.close_all()
 
 def enable_core_plugin():
     core_plugins = [
@@ -178,7 +151,7 @@ confdir = os.path.join( os.path.expanduser('~'), '.swagbot' )
 database = os.path.join(confdir, 'swagbot.plugins.quotes.db')
 
 result = get_input(
-    text='This will completely destroy any existing swagbot quote database in "{}". Are you sure you want to do this?'.format(confdir),
+    text='This will create or update the swagbot quote database in "{}" and reload its quotes. Are you sure you want to do this?'.format(confdir),
     default='no'
 )
 if result == 'yes':
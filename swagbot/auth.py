@@ -0,0 +1,48 @@
+# Cached authorization checks. The set of admin IDs is loaded from the admins
+# table once, merged with the owners from bot.yml, and reloaded lazily after
+# admin_grant or admin_revoke invalidate it.
+import logging
+import swagbot.database.core as db
+import swagbot.globals as globals
+import threading
+
+lock = threading.Lock()
+admins = None
+# Bumped by invalidate() so a load() that read the table before a grant or
+# revoke committed doesn't cache what it read.
+generation = 0
+
+def load():
+    global admins
+    with lock:
+        started = generation
+    ids = set(globals.config.get('owners', None) or [])
+    results = db.admin_list()
+    if results is False:
+        # Not cached, so the next check tries the table again.
+        logging.error('Failed to load the admins into the authorization cache.')
+        return frozenset(ids)
+    ids.update([admin['id'] for admin in results])
+    with lock:
+        if generation == started:
+            admins = frozenset(ids)
+    logging.debug(f'Loaded {len(ids)} admins and owners into the authorization cache.')
+    return frozenset(ids)
+
+def invalidate():
+    global admins, generation
+    with lock:
+        generation += 1
+        admins = None
+
+def is_admin(user=None):
+    ids = admins
+    if ids is None:
+        ids = load()
+    return user in ids
+
+def is_authorized(user=None, command=None):
+    requires_admin = command['is_admin'] if isinstance(command, dict) else command.is_admin
+    if requires_admin:
+        return is_admin(user=user)
+    return True
@@ -2,16 +2,26 @@ from pprint import pprint
 
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
+from swagbot.client import WebClient
 from swagbot.core import Command, Event
+from swagbot.dispatch import Dispatcher
+from swagbot.lock import InstanceLock
+from swagbot.seen import SeenTracker
+import atexit
 import logging
 import os
-import psutil
 import shlex
+import swagbot.database.connection as connection
 import swagbot.database.core as db
+import swagbot.database.scheduler as scheduler_db
 import swagbot.exception as exception
 import swagbot.logger as logger
+import swagbot.metrics as metrics
+import swagbot.outbound as outbound
 import swagbot.plugins
 import swagbot.globals as globals
+import swagbot.registry as registry
+import swagbot.scheduler as scheduler
 import swagbot.utils.core as utils
 import sys
 
@@ -36,36 +46,50 @@ class SwagBot(object):
         self.bot_token = globals.config.get('bot_token', '')
         self.command_prefix = globals.config.get('command_prefix', '!')
         self.userid = globals.config.get('userid', '')
+        self.instance_lock = InstanceLock(config_root=globals.config_root, instance=globals.config.get('instance', None))
+
+        seen_config = globals.config.get('seen', None) or {}
+        self.seen = SeenTracker(
+            flush_interval=seen_config.get('flush_interval', 30),
+            flush_size=seen_config.get('flush_size', 500),
+            name_ttl=seen_config.get('name_ttl', 3600),
+        )
+        dispatch_config = globals.config.get('dispatch', None) or {}
+        self.dispatcher = Dispatcher(
+            workers=dispatch_config.get('workers', 4),
+            express_workers=dispatch_config.get('express_workers', 1),
+            queue_size=dispatch_config.get('queue_size', 100),
+            priorities=dispatch_config.get('priorities', None),
+        )
         self.initialize_bot()
 
     def die_if_running(self):
-        pid = os.getpid()
-        myproc = [proc for proc in psutil.process_iter() if proc._pid == pid][0]
-        mycmdline = ' '.join(list(myproc.cmdline()))
-
-        bots = []
-        for proc in psutil.process_iter():
-            try:
-                cmdline = ' '.join(proc.cmdline())
-                if (cmdline == mycmdline) and proc._pid != pid:
-                    bots.append(proc)
-            except:
-                pass
-
-        if len(bots) > 0:
-            for bot in bots:
-                logging.fatal('There is a bot running with the pid {}. Cannot start.'.format(bot._pid))
+        if not self.instance_lock.acquire():
+            owner = f' with the pid {self.instance_lock.owner}' if self.instance_lock.owner else ''
+            logging.fatal(f'There is a bot running{owner} holding the lock {self.instance_lock.path}. Cannot start.')
             sys.exit(1)
 
     def initialize_bot(self):
         globals.start_time = utils.now()
         self.die_if_running()
 
-    def run(self):
-        app = App(token=self.bot_token)
-        self.client = app.client
+    def start(self, client=None):
+        # Starts everything but the Slack connection. Also used by the
+        # load-test harness with a fake client.
+        self.client = client
+        self.seen.start()
+        self.dispatcher.start()
+        outbound.sender.start(config=globals.config.get('outbound', None))
+        metrics.register_stats(name='swagbot_dispatch', function=self.dispatcher.stats)
+        metrics.register_stats(name='swagbot_outbound', function=outbound.sender.stats)
+        metrics.start_server(config=globals.config.get('metrics', None))
+        atexit.register(self.shutdown)
         self.load_plugins(reload=False)
 
+    def run(self):
+        app = App(client=WebClient(token=self.bot_token))
+        self.start(client=app.client)
+
         @app.event('message')
         def message_handler(event, say):
             bot_event = Event(event=event)
@@ -91,42 +115,66 @@ class SwagBot(object):
         SocketModeHandler(app, self.app_token).start()
 
     def load_plugins(self, reload=False):
-        globals.plugins = {}
-        for importer, modulename, ispkg in utils.iter_namespace(swagbot.plugins):
-            if modulename in globals.plugins:
-                logging.warning(f'Could not load the module "{modulename}" as a module with the same name is already loaded.')
-            else:
-                module = db.get_module(module=modulename)
-                if module:
-                    if module['enabled'] == 1:
-                        if reload:
-                            err = utils.reload_module(module=modulename, client=self.client)
+        # With lazy_plugins set, enabled modules that are already in the commands
+        # table are only registered here and are imported the first time one of
+        # their commands is run. Modules with scheduled jobs, modules seen for the
+        # first time, and modules that were loaded before a reload are loaded now.
+        # Holds the plugin lock throughout, so a command run during a reload
+        # waits for it instead of loading a second instance of its plugin.
+        with utils.plugin_lock:
+            lazy = globals.config.get('lazy_plugins', False)
+            previous = globals.plugins if reload else {}
+            job_modules = set([job['module'] for job in scheduler_db.get_all_jobs()]) if lazy else set()
+            enabled_modules = []
+            globals.plugins = {}
+            for importer, modulename, ispkg in utils.iter_namespace(swagbot.plugins):
+                if modulename in globals.plugins:
+                    logging.warning(f'Could not load the module "{modulename}" as a module with the same name is already loaded.')
+                else:
+                    module = db.get_module(module=modulename)
+                    if module:
+                        if module['enabled'] == 1:
+                            enabled_modules.append(modulename)
+                            if lazy and not modulename in previous and not modulename in job_modules and utils.register_module(module=modulename):
+                                continue
+                            if reload:
+                                err = utils.reload_module(module=modulename, client=self.client)
+                            else:
+                                err = utils.load_module(module=modulename, client=self.client)
+                            if err:
+                                logging.error(f'Failed to load the module {modulename}: {err}.')
+                                registry.unregister(module=modulename)
+                        else:
+                            logging.info(f'Not loading module {modulename} because it is disabled.')
+                    else:
+                        if 'enable_new_modules' in globals.config and globals.config['enable_new_modules']:
+                            enabled = True
+                            enabled_str = 'enabling it'
                         else:
-                            err = utils.load_module(module=modulename, client=self.client)
+                            enabled = False
+                            enabled_str = 'leaving it disabled'
+                        logging.info(f'I have found a new module named "{modulename}" which is not in the database. Adding the module and {enabled_str}.')
+                        db.moduleadd(module=modulename, enabled=enabled)
+                        enabled_modules.append(modulename)
+                        err = utils.load_module(module=modulename, client=self.client)
                         if err:
                             logging.error(f'Failed to load the module {modulename}: {err}.')
-                    else:
-                        logging.info(f'Not loading module {modulename} because it is disabled.')
-                else:
-                    if 'enable_new_modules' in globals.config and globals.config['enable_new_modules']:
-                        enabled = True
-                        enabled_str = 'enabling it'
-                    else:
-                        enabled = False
-                        enabled_str = 'leaving it disabled'
-                    logging.info(f'I have found a new module named "{modulename}" which is not in the database. Adding the module and {enabled_str}.')
-                    db.moduleadd(module=modulename, enabled=enabled)
-                    err = utils.load_module(module=modulename, client=self.client)
-                    if err:
-                        logging.error(f'Failed to load the module {modulename}: {err}.')
-        utils.prune_commands_table()
-    
+                            registry.unregister(module=modulename)
+            utils.prune_commands_table()
+            for line in utils.plugin_load_report(modules=enabled_modules):
+                logging.info(f'Module load time: {line}')
+
+    def shutdown(self):
+        self.dispatcher.stop()
+        outbound.sender.stop()
+        self.seen.stop()
+        scheduler.engine.stop()
+        connection.close_all()
+        metrics.stop_server()
+        self.instance_lock.release()
+
     def process_seen(self, userid=None, channel=None):
-        userinfo = db.get_user_by_id(id=userid)
-        if userinfo:
-            db.update_seen(userid=userid, username=userinfo['name'], channel=channel)
-        else:
-            logging.error(f'User info for {userid} not found')
+        self.seen.update(userid=userid, channel=channel)
 
     def process_message(self, event):
         can_process_message = False
@@ -153,7 +201,7 @@ class SwagBot(object):
 
                 argv = shlex.split(message_text, posix=False)
                 command_name = argv[0]
-                command_object = db.command_lookup(command=command_name)
+                command_object = registry.lookup(command=command_name)
 
                 command = Command()
                 command.event = event
@@ -162,16 +210,20 @@ class SwagBot(object):
                 if command_object:
                     command.__dict__.update(command_object)
                     command.argv = argv
-                    command.command = getattr(globals.plugins[command.module]['instance'], command.method)
+                    # Left unset for a plugin that hasn't been loaded yet. The
+                    # worker loads it before running the command.
+                    plugin = globals.plugins.get(command.module)
+                    command.command = getattr(plugin['instance'], command.method) if plugin else None
                     command.name = command_name
                     if command.validate():
-                        command.execute()
+                        if not self.dispatcher.submit(command=command):
+                            self.send(event.channel, f'I\'m too busy to run `{command_name}` right now. Please try again in a moment.')
                 else:
                     self.send(event.channel, f'Unknown command: `{command_name}`.')
 
     def send(self, channel, messages):
         if type(messages) == str:
-            self.client.chat_postMessage(channel=channel, text=messages)
+            outbound.send(client=self.client, channel=channel, text=messages)
         elif type(messages) == list:
             for message in messages:
-                self.client.chat_postMessage(channel=channel, text=message)
+                outbound.send(client=self.client, channel=channel, text=message)
@@ -0,0 +1,112 @@
+# A TTL cache with an LRU size bound for responses from third-party APIs.
+# Entries are keyed by the endpoint and the query string with credentials
+# removed. The cache can optionally be backed by a SQLite file so that it
+# survives restarts. The file is opened through swagbot.database.connection
+# and its table is held to the same size bound as the in-memory entries.
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import urlencode
+import copy
+import json
+import logging
+import os
+import swagbot.database.connection as connection
+import swagbot.database.queries as queries
+import time
+
+secret_params = ['apikey', 'api_key', 'appid', 'key', 'token']
+
+class Cache(object):
+    def __init__(self, **kwargs):
+        self.name = kwargs.get('name', 'cache')
+        self.size = kwargs.get('size', 1000)
+        self.default_ttl = kwargs.get('default_ttl', 300)
+        self.ttls = kwargs.get('ttls', None) or {}
+        self.path = kwargs.get('path', None)
+        self.lock = Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.database = None
+        if self.path:
+            self.__open()
+
+    def __open(self):
+        try:
+            self.database = connection.get(path=self.path)
+            with self.database.write() as conn:
+                conn.execute(queries.cache['create_table'])
+                conn.execute(queries.cache['create_index'])
+                conn.execute(queries.cache['purge_expired'], (time.time(),))
+        except Exception as e:
+            logging.error(f'Failed to open the {self.name} cache database {self.path}: {e}')
+            self.database = None
+
+    def key(self, uri=None, qs={}):
+        params = sorted([(k, str(v)) for k, v in qs.items() if not k.lower() in secret_params])
+        return f'{uri}?{urlencode(params)}' if len(params) > 0 else uri
+
+    def ttl(self, name=None):
+        return self.ttls.get(name, self.default_ttl)
+
+    def get(self, key=None):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(entry[1])
+                del self.entries[key]
+
+            if self.database:
+                try:
+                    with self.database.read() as conn:
+                        row = conn.execute(queries.cache['get'], (key,)).fetchone()
+                except Exception as e:
+                    logging.error(f'Failed to read from the {self.name} cache database: {e}')
+                    row = None
+                if row and row['expires'] > now:
+                    value = json.loads(row['value'])
+                    self.__store(key=key, value=value, expires=row['expires'])
+                    self.hits += 1
+                    return copy.deepcopy(value)
+            self.misses += 1
+            return None
+
+    def set(self, key=None, value=None, ttl=None):
+        expires = time.time() + (ttl if ttl is not None else self.default_ttl)
+        value = copy.deepcopy(value)
+        with self.lock:
+            self.__store(key=key, value=value, expires=expires)
+            if self.database:
+                try:
+                    with self.database.write() as conn:
+                        conn.execute(queries.cache['set'], (key, json.dumps(value), expires))
+                        conn.execute(queries.cache['purge_expired'], (time.time(),))
+                        conn.execute(queries.cache['trim'], (self.size,))
+                except Exception as e:
+                    logging.error(f'Failed to write to the {self.name} cache database: {e}')
+
+    def __store(self, key=None, value=None, expires=None):
+        self.entries[key] = (expires, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.database:
+                with self.database.write() as conn:
+                    conn.execute(queries.cache['clear'])
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
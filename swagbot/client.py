@@ -0,0 +1,26 @@
+# The Slack WebClient used by the bot. Every API call, including the ones made
+# by Bolt itself, goes through api_call, so timing it here covers them all.
+# send_api_call makes the actual request and is replaced by the load-test
+# harness's FakeWebClient.
+from slack_sdk import WebClient as SlackWebClient
+from slack_sdk.errors import SlackApiError
+import swagbot.metrics as metrics
+import time
+
+class WebClient(SlackWebClient):
+    def api_call(self, api_method, **kwargs):
+        metrics.count_call(kind='slack')
+        start = time.perf_counter()
+        try:
+            return self.send_api_call(api_method, **kwargs)
+        except SlackApiError as e:
+            metrics.slack_errors.inc(labels=(api_method, e.response.get('error', 'unknown')))
+            raise
+        except Exception:
+            metrics.slack_errors.inc(labels=(api_method, 'exception'))
+            raise
+        finally:
+            metrics.slack_seconds.observe(labels=(api_method,), value=time.perf_counter() - start)
+
+    def send_api_call(self, api_method, **kwargs):
+        return super().api_call(api_method, **kwargs)
@@ -1,9 +1,14 @@
-from contextlib import contextmanager
 from pprint import pprint
+from threading import Thread
+import argparse
 import inspect
-import swagbot.database.core as db
+import logging
+import swagbot.auth as auth
+import swagbot.exception as exception
 import swagbot.globals as globals
-import sys
+import swagbot.outbound as outbound
+import swagbot.utils.core as utils
+import time
 
 class Event(object):
     def __init__(self, **kwargs):
@@ -42,16 +47,16 @@ class Command(object):
         self.module = None
         self.monospace = False
         self.name = None
+        self.priority = None
+        self.split_output = False
         self.type = None
         self.usage = None
         self.__dict__.update(kwargs)
 
     def validate(self):
-        admininfo = db.get_admin_by_id(id=self.event.user)
-        is_admin = 1 if admininfo else 0
         if self.name:
             if self.enabled == True:
-                if (self.is_admin and not is_admin) and not self.event.user in globals.config['owners']:
+                if not auth.is_authorized(user=self.event.user, command=self):
                     self.send(self.event.channel, f'You are not permitted to use the command `{self.name}`.')
                     return False
 
@@ -67,37 +72,96 @@ class Command(object):
         return True
 
     def execute(self):
+        if self.command is None:
+            instance = utils.plugin_instance(module=self.module, client=self.client)
+            if not instance:
+                self.send(self.event.channel, f'The command `{self.name}` is not available right now.')
+                return
+            self.command = getattr(instance, self.method)
         self.command(self)
 
     def send(self, channel, messages):
         if type(messages) == str:
-            self.client.chat_postMessage(channel=channel, text=messages)
+            outbound.send(client=self.client, channel=channel, text=messages)
         elif type(messages) == list:
             for message in messages:
-                self.client.chat_postMessage(channel=channel, text=message)
+                outbound.send(client=self.client, channel=channel, text=message)
+
+class ArgumentParser(argparse.ArgumentParser):
+    # argparse prints to stderr and calls sys.exit() when it can't parse the
+    # arguments. Raise instead so a failed parse only affects its own command.
+    def error(self, message):
+        raise exception.ArgumentParserError(message=message, usage=self.format_usage())
+
+    def exit(self, status=0, message=None):
+        raise exception.ArgumentParserError(message=message, usage=self.format_usage())
+
+    def _print_message(self, message, file=None):
+        pass
 
 class BasePlugin(object):
+    # A plugin's __init__ should only do cheap, local setup. Anything slow,
+    # e.g., fetching data over the network, belongs in warmup(), which is run
+    # in the background once the plugin is loaded so the bot can connect to
+    # Slack straight away. Commands run while a plugin is warming up should
+    # serve whatever data they already have.
     def __init__(self, client):
         self.classname = self.__class__.__module__
         self.client = client
+        self.state = 'initializing'
+        self.state_error = None
+
+    def warmup(self):
+        pass
+
+    def start_warmup(self):
+        if type(self).warmup is BasePlugin.warmup:
+            self.state = 'ready'
+            return
+        self.state = 'warming up'
+        thread = Thread(
+            name=f'{self.classname}-warmup',
+            target=self.__warmup,
+            daemon=True
+        )
+        thread.start()
 
-    @contextmanager
-    def redirect_stdout_stderr(self, stream):
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-        sys.stdout = stream
-        sys.stderr = stream
+    def __warmup(self):
+        logging.info(f'Warming up the module {self.classname}.')
+        start = time.perf_counter()
         try:
-            yield
-        finally:
-            sys.stdout = old_stdout
-            sys.stderr = old_stderr
-    
+            self.warmup()
+            self.state = 'ready'
+            logging.info(f'The module {self.classname} is ready after {time.perf_counter() - start:.4f} seconds.')
+        except Exception as e:
+            self.state = 'failed'
+            self.state_error = str(e)
+            logging.error(f'Failed to warm up the module {self.classname}: {e}')
+
+    def is_ready(self):
+        return self.state == 'ready'
+
+    def parse_args(self, parser=None, argv=None):
+        # argv is the full command line, including the command name. Parsers
+        # are shared by every invocation of a command so they must never be
+        # handed sys.argv.
+        return parser.parse_args(argv[1:])
+
     def send_monospace(self, channel, text):
-        self.client.chat_postMessage(channel=channel, text=f'```{text}```')
+        outbound.send(client=self.client, channel=channel, text=f'```{text}```')
+
+    def send_table(self, channel, headers=None, data=None, command=None):
+        # Large results from commands with split_output set are uploaded as a
+        # single file rather than posted as many messages.
+        table = utils.generate_table(headers=headers, data=data)
+        if command and command.split_output and len(table) > utils.upload_threshold():
+            outbound.upload(client=self.client, channel=channel, content=table, filename=f'{command.name}.txt', title=f'{command.name} output')
+            return
+        for chunk in utils.pack_rendered_table(table=table):
+            self.send_monospace(channel, chunk)
 
     def send_plain(self, channel, text):
-        self.client.chat_postMessage(channel=channel, text=text)
+        outbound.send(client=self.client, channel=channel, text=text)
 
 def current_class():
     return inspect.stack()[1][3]
@@ -0,0 +1,144 @@
+# Shared access to the bot's SQLite files. Each file gets one Database, which
+# gives every thread its own read connection and funnels all writes through a
+# single writer connection guarded by a lock. The files are switched to WAL
+# journaling, so readers work from a snapshot instead of waiting on the writer,
+# e.g., flushing seen updates doesn't hold up command lookups.
+from contextlib import contextmanager
+from threading import Lock, RLock, current_thread, local
+import logging
+import sqlite3
+import swagbot.database.migrations as migrations
+import swagbot.database.queries as queries
+import swagbot.globals as globals
+
+lock = Lock()
+databases = {}
+
+class Row(sqlite3.Row):
+    # sqlite3.Row is built in C and keeps the row's values alongside the
+    # query's description instead of copying them into a new dict, which cost
+    # a Python loop per row. row['col'] and dict(row) work as before; get()
+    # and "in" (by column name) are added so rows can stand in for the dicts
+    # plugins expect. Rows are read-only: copy one with dict(row) to change it.
+    __slots__ = ()
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except IndexError:
+            return default
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+def pragmas():
+    # Read when a connection is opened rather than at import, so bot.yml has
+    # been parsed by then.
+    config = getattr(globals, 'config', None) or {}
+    database_config = config.get('database', None) or {}
+    return {
+        'busy_timeout': database_config.get('busy_timeout', 5000),
+        'synchronous': database_config.get('synchronous', 'NORMAL'),
+        'cache_size': database_config.get('cache_size', -16000),
+        'mmap_size': database_config.get('mmap_size', 268435456),
+    }
+
+class Database(object):
+    def __init__(self, **kwargs):
+        self.path = kwargs.get('path')
+        self.local = local()
+        self.write_lock = RLock()
+        self.writer = None
+        self.connections = []
+        # Read connections by the thread that owns them.
+        self.readers = {}
+
+    def connect(self, query_only=False):
+        # Large enough to hold every statement in the query registry, so each
+        # is prepared once per connection.
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=max(128, queries.count() * 2))
+        conn.row_factory = Row
+        for pragma, value in pragmas().items():
+            conn.execute(f'PRAGMA {pragma}={value}')
+        if query_only:
+            conn.execute('PRAGMA query_only=ON')
+        with lock:
+            self.connections.append(conn)
+        return conn
+
+    def open_writer(self):
+        # The writer is always opened first, so the file is in WAL mode and its
+        # schema is up to date before any reader uses it.
+        with self.write_lock:
+            if self.writer is None:
+                self.writer = self.connect()
+                journal_mode = self.writer.execute('PRAGMA journal_mode=WAL').fetchone()['journal_mode']
+                if journal_mode != 'wal':
+                    logging.warning(f'Failed to enable WAL journaling for {self.path}, it is using {journal_mode}.')
+                migrations.migrate(conn=self.writer, name=self.path)
+            return self.writer
+
+    @contextmanager
+    def read(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            self.open_writer()
+            self.prune()
+            conn = self.local.conn = self.connect(query_only=True)
+            with lock:
+                self.readers[current_thread()] = conn
+        yield conn
+
+    def prune(self):
+        # Closes the read connections of threads that have exited, e.g.,
+        # plugin warmup threads, which would otherwise stay open until
+        # shutdown.
+        with lock:
+            dead = [thread for thread in self.readers if not thread.is_alive()]
+            connections = [self.readers.pop(thread) for thread in dead]
+            self.connections = [conn for conn in self.connections if not conn in connections]
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logging.error(f'Failed to close a connection to {self.path}: {e}')
+
+    @contextmanager
+    def write(self):
+        # Commits when the block exits, or rolls back if it raises.
+        with self.write_lock:
+            conn = self.open_writer()
+            with conn:
+                yield conn
+
+    def close(self):
+        with self.write_lock:
+            with lock:
+                connections, self.connections = self.connections, []
+                self.readers = {}
+            for conn in connections:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logging.error(f'Failed to close a connection to {self.path}: {e}')
+            self.writer = None
+            self.local = local()
+
+def get(path=None):
+    # Every module using the same file shares its Database, and so its writer.
+    with lock:
+        if not path in databases:
+            databases[path] = Database(path=path)
+        return databases[path]
+
+def close_all():
+    with lock:
+        all_databases = [database for database in databases.values()]
+    for database in all_databases:
+        database.close()
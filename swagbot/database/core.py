@@ -1,7 +1,11 @@
 from pprint import pprint
 import logging
 import os
-import sqlite3
+import swagbot.auth as auth
+import swagbot.registry as registry
+import swagbot.database.connection as connection
+import swagbot.database.queries as queries
+import swagbot.metrics as metrics
 import swagbot.utils.core as utils
 
 def update_plugin_commands(module=None, methods=None):
@@ -11,15 +15,15 @@ def update_plugin_commands(module=None, methods=None):
         hidden = command_settings['hidden'] if 'hidden' in command_settings else 0
         split_output = command_settings['split_output'] if 'split_output' in command_settings else 0
 
-        select = f'SELECT * FROM commands WHERE command="{command_name}"'
-        with conn:
+        select = queries.core['command_exists']
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (command_name,))
             count = len(cursor.fetchall())
 
         if count <= 0:
-            insert = 'INSERT OR REPLACE INTO commands (command,description,usage,is_admin,can_be_disabled,module,method,type,monospace,split_output) VALUES (?,?,?,?,?,?,?,?,?,?)'
-            with conn:
+            insert = queries.core['insert_command']
+            with database.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute(insert, (
                     command_name,
@@ -35,8 +39,8 @@ def update_plugin_commands(module=None, methods=None):
                 ))
                 conn.commit()
         else:
-            update = f'UPDATE commands SET description=?,usage=?,is_admin=?,can_be_disabled=?,module=?,method=?,type=?,monospace=?,split_output=? WHERE command="{command_name}"'
-            with conn:
+            update = queries.core['update_command']
+            with database.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute(update, (
                     command_settings['description'],
@@ -48,17 +52,18 @@ def update_plugin_commands(module=None, methods=None):
                     command_settings['type'],
                     monospace,
                     split_output,
+                    command_name,
                 ))
                 conn.commit()
 
-        select = f'SELECT * FROM command_settings WHERE command="{command_name}"'
-        with conn:
+        select = queries.core['command_settings_exist']
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (command_name,))
             count = len(cursor.fetchall())
 
             if count <= 0:
-                insert = 'INSERT OR REPLACE INTO command_settings (command,module,enabled,hidden) VALUES (?,?,?,?)'
+                insert = queries.core['insert_command_settings']
                 cursor.execute(insert, (
                     command_name,
                     module,
@@ -69,15 +74,12 @@ def update_plugin_commands(module=None, methods=None):
 
 # Help and commands
 def help(is_admin=None):
-    where = ''
-    if is_admin == 0:
-        where = 'WHERE is_admin=0'
     commands = []
-    select = f'SELECT commands.*, command_settings.* FROM commands JOIN command_settings ON commands.command=command_settings.command AND command_settings.enabled=1 AND command_settings.hidden=0 {where} ORDER BY command'
+    select = queries.core['help']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            results = cursor.execute(select)
+            results = cursor.execute(select, (0 if is_admin == 0 else 1,))
             conn.commit()
             for row in results:
                 commands.append(row)
@@ -87,11 +89,11 @@ def help(is_admin=None):
         return None
 
 def usage(command=None):
-    select = f'SELECT usage FROM commands WHERE command="{command}"'
+    select = queries.core['usage']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (command,))
             results = cursor.fetchone()
             return results['usage'] if results else None
     except Exception as e:
@@ -100,9 +102,9 @@ def usage(command=None):
 
 def all_commands():
     commands = []
-    select = 'SELECT command FROM commands'
+    select = queries.core['all_commands']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
             results = cursor.execute(select)
             conn.commit()
@@ -114,13 +116,14 @@ def all_commands():
         return commands
 
 def command_lookup(command=None):
-    select = f"SELECT commands.command, commands.description, commands.usage, commands.is_admin, commands.can_be_disabled, commands.module, commands.method, commands.type, commands.monospace, commands.split_output, command_settings.enabled, command_settings.hidden FROM commands JOIN command_settings ON commands.command = command_settings.command WHERE commands.command='{command}'"
+    select = queries.core['command_lookup']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (command,))
             results = cursor.fetchone()
             if results:
+                results = dict(results)
                 results['can_be_disabled'] = True if ('can_be_disabled' in results and results['can_be_disabled'] == 1) else False
                 results['enabled'] = True if ('enabled' in results and results['enabled'] == 1) else False
                 results['hidden'] = True if ('hidden' in results and results['hidden'] == 1) else False
@@ -133,68 +136,92 @@ def command_lookup(command=None):
         logging.error(f'Failed to execute {select}: {e}')
         return False
 
+def get_command_settings(module=None):
+    output = []
+    select = queries.core['get_command_settings']
+    try:
+        with database.read() as conn:
+            cursor = conn.cursor()
+            results = cursor.execute(select, (module,))
+            for row in results:
+                output.append(row)
+            return output
+    except Exception as e:
+        logging.error(f'Failed to execute {select}: {e}')
+        return output
+
 def prune_commands_table(commands=None):
-    delete = f'DELETE FROM commands WHERE command IN ({utils.quote_list(commands)})'
+    # The only statement whose text varies, by the number of commands. It is
+    # run once per plugin load.
+    delete = f'DELETE FROM commands WHERE command IN ({",".join(["?"] * len(commands))})'
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(delete)
+            cursor.execute(delete, commands)
             conn.commit()
     except Exception as e:
         logging.error(f'Failed to execute {delete}: {e}')
         return False
 
 def hide_command(command=None):
-    update = f'UPDATE command_settings SET hidden=1 WHERE command="{command}"'
+    update = queries.core['set_command_hidden']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(update)
+            cursor.execute(update, (1, command))
             conn.commit()
+        registry.update(command=command, hidden=True)
+        return True
     except Exception as e:
         logging.error(f'Failed to execute {update} {e}')
         return False
 
 def unhide_command(command=None):
-    update = f'UPDATE command_settings SET hidden=0 WHERE command="{command}"'
+    update = queries.core['set_command_hidden']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(update)
+            cursor.execute(update, (0, command))
             conn.commit()
+        registry.update(command=command, hidden=False)
+        return True
     except Exception as e:
         logging.error(f'Failed to execute {update} {e}')
         return False
 
 def enable_command(command=None):
-    update = f'UPDATE command_settings SET enabled=1 WHERE command="{command}"'
+    update = queries.core['set_command_enabled']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(update)
+            cursor.execute(update, (1, command))
             conn.commit()
+        registry.update(command=command, enabled=True)
+        return True
     except Exception as e:
         logging.error(f'Failed to execute {update} {e}')
         return False
 
 def disable_command(command=None):
-    update = f'UPDATE command_settings SET enabled=0 WHERE command="{command}"'
+    update = queries.core['set_command_enabled']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(update)
+            cursor.execute(update, (0, command))
             conn.commit()
+        registry.update(command=command, enabled=False)
+        return True
     except Exception as e:
         logging.error(f'Failed to execute {update} {e}')
         return False
 
 # Users
 def get_user_by_id(id=None):
-    select = f'SELECT * FROM users WHERE id="{id}"'
+    select = queries.core['get_user_by_id']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (id,))
             results = cursor.fetchone()
             if results:
                 return results
@@ -205,11 +232,11 @@ def get_user_by_id(id=None):
         return False
 
 def get_user_by_name(name=None):
-    select = f'SELECT * FROM users WHERE name="{name}"'
+    select = queries.core['get_user_by_name']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (name,))
             results = cursor.fetchone()
             if results:
                 return results
@@ -222,10 +249,10 @@ def get_user_by_name(name=None):
 # Channels
 def get_channel_by_name(name=None):
     try:
-        select = f'SELECT * FROM channels WHERE name="{name}"'
-        with conn:
+        select = queries.core['get_channel_by_name']
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (name,))
             results = cursor.fetchone()
             if results:
                 return results
@@ -237,11 +264,11 @@ def get_channel_by_name(name=None):
 
 # Errors
 def get_slack_api_errors(method=None, error=None):
-    select = f'SELECT * FROM slack_errors WHERE method="{method}" and error="{error}"'
+    select = queries.core['get_slack_api_errors']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (method, error))
             results = cursor.fetchone()
             if results:
                 return results
@@ -254,9 +281,9 @@ def get_slack_api_errors(method=None, error=None):
 # Modules
 def module_list():
     output = []
-    select = f'SELECT * FROM modules ORDER BY enabled, module'
+    select = queries.core['module_list']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
             results = cursor.execute(select)
             for row in results:
@@ -267,11 +294,11 @@ def module_list():
         return False
 
 def get_module(module=None):
-    select = f'SELECT * FROM modules WHERE module="{module}"'
+    select = queries.core['get_module']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (module,))
             results = cursor.fetchone()
             return results if results else False
     except Exception as e:
@@ -279,33 +306,33 @@ def get_module(module=None):
         return False
 
 def moduleadd(module=None, enabled=False):
-    insert = f'INSERT INTO modules (module,enabled,can_be_disabled) VALUES ("{module}", {enabled}, 1)'
+    insert = queries.core['moduleadd']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(insert)
+            cursor.execute(insert, (module, enabled))
             conn.commit()
     except Exception as e:
         logging.error(f'Failed to execute {insert}: {e}')
         return False
 
 def enable_module(module=None):
-    update = f'UPDATE modules SET enabled=1 WHERE module="{module}"'
+    update = queries.core['set_module_enabled']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(update)
+            cursor.execute(update, (1, module))
             conn.commit()
     except Exception as e:
         logging.error(f'Failed to execute {update} {e}')
         return False
 
 def disable_module(module=None):
-    update = f'UPDATE modules SET enabled=0 WHERE module="{module}"'
+    update = queries.core['set_module_enabled']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(update)
+            cursor.execute(update, (0, module))
             conn.commit()
     except Exception as e:
         logging.error(f'Failed to execute {update} {e}')
@@ -313,11 +340,11 @@ def disable_module(module=None):
 
 def module_commands(module=None):
     commands = []
-    select = f'SELECT command FROM commands WHERE module="{module}"'
+    select = queries.core['module_commands']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            results = cursor.execute(select)
+            results = cursor.execute(select, (module,))
             for row in results:
                 commands.append(row['command'])
             return commands
@@ -325,12 +352,28 @@ def module_commands(module=None):
         logging.error(f'Failed to execute {select}: {e}')
         return False
 
+def module_manifest(module=None):
+    # The commands table doubles as a manifest of each module's commands so a
+    # module can be registered without being imported.
+    methods = {}
+    select = queries.core['module_manifest']
+    try:
+        with database.read() as conn:
+            cursor = conn.cursor()
+            results = cursor.execute(select, (module,))
+            for row in results:
+                methods[row['command']] = row
+            return methods
+    except Exception as e:
+        logging.error(f'Failed to execute {select}: {e}')
+        return methods
+
 def module_exists(module=None):
-    select = f'SELECT * FROM modules WHERE module="{module}"'
+    select = queries.core['get_module']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (module,))
             results = cursor.fetchone()
             return True if results else False
     except Exception as e:
@@ -338,11 +381,11 @@ def module_exists(module=None):
         return False
 
 def module_is_enabled(module=None):
-    select = f'SELECT enabled FROM modules WHERE module="{module}"'
+    select = queries.core['module_is_enabled']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (module,))
             results = cursor.fetchone()
             return True if results['enabled'] == 1 else False
     except Exception as e:
@@ -352,9 +395,9 @@ def module_is_enabled(module=None):
 # Admin grant/revoke
 def admin_list():
     output = []
-    select = f'SELECT * FROM admins'
+    select = queries.core['admin_list']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
             results = cursor.execute(select)
             for row in results:
@@ -365,11 +408,11 @@ def admin_list():
         return False
 
 def get_admin_by_name(name=None):
-    select = f'SELECT * FROM admins WHERE name="{name}"'
+    select = queries.core['get_admin_by_name']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (name,))
             results = cursor.fetchone()
             if results:
                 return results
@@ -380,11 +423,11 @@ def get_admin_by_name(name=None):
         return False
 
 def get_admin_by_id(id=None):
-    select = f'SELECT * FROM admins WHERE id="{id}"'
+    select = queries.core['get_admin_by_id']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (id,))
             results = cursor.fetchone()
             if results:
                 return results
@@ -395,45 +438,58 @@ def get_admin_by_id(id=None):
         return False
 
 def admin_grant(id=None, name=None, real_name=None, email=None):
-    insert = f'INSERT OR REPLACE INTO admins (id, name, real_name) VALUES ("{id}", "{name}", "{real_name}")'
+    insert = queries.core['admin_grant']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(insert)
+            cursor.execute(insert, (id, name, real_name))
             conn.commit()
+        auth.invalidate()
     except Exception as e:
         logging.error(f'Failed to execute {insert}: {e}')
         return False
 
 def admin_revoke(name=None):
-    delete = f'DELETE FROM admins WHERE name="{name}"'
+    delete = queries.core['admin_revoke']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(delete)
+            cursor.execute(delete, (name,))
             conn.commit()
+        auth.invalidate()
     except Exception as e:
         logging.error(f'Failed to execute {delete}: {e}')
         return False
 
 # Miscellaneous
 def update_seen(userid=None, username=None, channel=None):
-    insert = f'INSERT OR REPLACE INTO seen (id, name, seen_time, seen_channel) VALUES ("{userid}", "{username}", {utils.now()}, "{channel}")'
+    insert = queries.core['update_seen']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(insert)
+            cursor.execute(insert, (userid, username, utils.now(), channel))
             conn.commit()
     except Exception as e:
         logging.error(f'Failed to execute {insert}: {e}')
         return False
 
+def update_seen_many(rows=None):
+    insert = queries.core['update_seen']
+    try:
+        with database.write() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(insert, [(row['id'], row['name'], row['seen_time'], row['seen_channel']) for row in rows])
+        return True
+    except Exception as e:
+        logging.error(f'Failed to execute {insert}: {e}')
+        return False
+
 def get_seen(username=None):
-    select = f'SELECT * FROM seen WHERE name="{username}"'
+    select = queries.core['get_seen']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (username,))
             results = cursor.fetchone()
             if results:
                 return results
@@ -444,16 +500,17 @@ def get_seen(username=None):
         return False
 
 def greeting(language=None):
-    table = 'greetings'
     if language == None:
-        select = f'SELECT * FROM {table} ORDER BY RANDOM() LIMIT 1 COLLATE NOCASE'
+        select = queries.core['random_greeting']
+        parameters = ()
     else:
-        select = f'SELECT * FROM {table} WHERE language="{language}" COLLATE NOCASE'
+        select = queries.core['greeting']
+        parameters = (language,)
     # fetchone!
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            results = cursor.execute(select)
+            results = cursor.execute(select, parameters)
             for row in results:
                 return row
     except Exception as e:
@@ -461,12 +518,11 @@ def greeting(language=None):
         return False
 
 def curse_lookup(username=None):
-    table = 'curses'
-    select = f'SELECT * FROM {table} where username="{username}" LIMIT 1'
+    select = queries.core['curse_lookup']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            results = cursor.execute(select)
+            results = cursor.execute(select, (username,))
             for row in results:
                 return row
     except Exception as e:
@@ -475,6 +531,6 @@ def curse_lookup(username=None):
 
 config_root = os.path.join(os.path.expanduser('~'), '.swagbot')
 dbfile = os.path.join(config_root, 'bot.db')
-conn = sqlite3.connect(dbfile, check_same_thread=False)
-conn.row_factory = utils.dict_factory
-cursor = conn.cursor()
+database = connection.get(path=dbfile)
+
+metrics.instrument_dao(module=__name__)
@@ -1,15 +1,17 @@
 from pprint import pprint
 import logging
 import os
-import sqlite3
+import swagbot.database.connection as connection
+import swagbot.database.queries as queries
+import swagbot.metrics as metrics
 import swagbot.utils.core as utils
 
 def currency_lookup(currency_code=None):
-    select = f'SELECT currency_name,currency_code FROM currency_conversion where currency_code="{currency_code}" LIMIT 1'
+    select = queries.extras['currency_lookup']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            results = cursor.execute(select)
+            results = cursor.execute(select, (currency_code,))
             for row in results:
                 return row
     except Exception as e:
@@ -17,11 +19,11 @@ def currency_lookup(currency_code=None):
         return False
 
 def crypto_lookup(currency_code=None):
-    select = f'SELECT currency_name,currency_code FROM crypto_conversion where currency_code="{currency_code}" LIMIT 1'
+    select = queries.extras['crypto_lookup']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            results = cursor.execute(select)
+            results = cursor.execute(select, (currency_code,))
             for row in results:
                 return row
     except Exception as e:
@@ -30,6 +32,6 @@ def crypto_lookup(currency_code=None):
 
 config_root = os.path.join(os.path.expanduser('~'), '.swagbot')
 dbfile = os.path.join(config_root, 'swagbot.plugins.extras.db')
-conn = sqlite3.connect(dbfile, check_same_thread=False)
-conn.row_factory = utils.dict_factory
-cursor = conn.cursor()
+database = connection.get(path=dbfile)
+
+metrics.instrument_dao(module=__name__)
@@ -1,35 +1,39 @@
 from pprint import pprint
+import json
 import logging
 import os
-import sqlite3
 import swagbot.globals as globals
+import swagbot.database.connection as connection
+import swagbot.database.queries as queries
+import swagbot.metrics as metrics
 import swagbot.utils.core as utils
+import time
 
 def update_channels(channels=None):
     logging.info('Populating the channels table.')
     now = utils.now()
-    for c in channels:
-        is_channel = 1 if c['is_channel'] == True else 0
-        is_group = 1 if c['is_group'] == True else 0
-        is_im = 1 if c['is_im'] == True else 0
-        is_private = 1 if c['is_private'] == True else 0
-        is_mpim = 1 if c['is_mpim'] == True else 0
-        insert = f'INSERT OR REPLACE INTO channels (id, name, is_channel, is_group, is_im, is_private, is_mpim, created, creator, name_normalized, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
-        try:
-            with conn:
-                cursor = conn.cursor()
-                cursor.execute(insert, (c['id'], c['name'], is_channel, is_group, is_im, is_private, is_mpim, c['created'], c['creator'], c['name_normalized'], now))
-                conn.commit()
-        except Exception as e:
-            logging.error(f'Failed to execute {insert}: {e}')
-            return False
+    rows = [(
+        c['id'],
+        c['name'],
+        1 if c['is_channel'] == True else 0,
+        1 if c['is_group'] == True else 0,
+        1 if c['is_im'] == True else 0,
+        1 if c['is_private'] == True else 0,
+        1 if c['is_mpim'] == True else 0,
+        c['created'],
+        c['creator'],
+        c['name_normalized'],
+        1 if c.get('is_archived') == True else 0,
+        now,
+    ) for c in channels]
+    return __sync(table='channels', rows=rows)
 
 def get_channel_by_name(name=None):
-    select = f'SELECT * FROM channels WHERE name="{name}"'
+    select = queries.maintenance['get_channel_by_name']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (name,))
             results = cursor.fetchone()
             if results:
                 return results
@@ -42,36 +46,58 @@ def get_channel_by_name(name=None):
 def update_users(users=None):
     logging.info('Populating the users table.')
     now = utils.now()
-    for u in users:
-        real_name = u['real_name'] if 'real_name' in u else 'Unknown'
-        is_bot = 1 if u['is_bot'] == True else 0
-        is_app_user = 1 if u['is_app_user'] == True else 0
-        email = u['profile']['email'] if ('profile' in u and 'email' in u['profile']) else 'unknown'
-        insert = f'INSERT OR REPLACE INTO users (id, name, real_name, email, is_bot, is_app_user, updated) VALUES (?, ?, ?, ?, ?, ?, ?)'
-        try:
-            with conn:
-                cursor = conn.cursor()
-                cursor.execute(insert, (u['id'], u['name'], real_name, email.lower(), is_bot, is_app_user, now))
-                conn.commit()
-        except Exception as e:
-            logging.error(f'Failed to execute {insert}: {e}')
-            return False
+    rows = [(
+        u['id'],
+        u['name'],
+        u['real_name'] if 'real_name' in u else 'Unknown',
+        (u['profile']['email'] if ('profile' in u and 'email' in u['profile']) else 'unknown').lower(),
+        1 if u['is_bot'] == True else 0,
+        1 if u['is_app_user'] == True else 0,
+        1 if u.get('deleted') == True else 0,
+        now,
+    ) for u in users]
+    return __sync(table='users', rows=rows)
+
+def __sync(table=None, rows=None):
+    # Writes a full sync of users or channels in one transaction, then marks
+    # the rows it didn't include as deleted. Returns the number of rows
+    # written, or False if the transaction was rolled back.
+    insert = queries.maintenance[f'update_{table}']
+    start = time.perf_counter()
+    try:
+        with database.write() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(insert, rows)
+            written = cursor.rowcount
+            # An empty sync is more likely a bad response than an empty
+            # workspace, so it doesn't mark anything as deleted.
+            deleted = 0
+            if written > 0:
+                cursor.execute(queries.maintenance['mark_deleted'][table], (json.dumps([row[0] for row in rows]),))
+                deleted = cursor.rowcount
+    except Exception as e:
+        logging.error(f'Failed to execute {insert}: {e}')
+        return False
+    elapsed = time.perf_counter() - start
+    metrics.sync_rows.inc(labels=(table,), amount=written)
+    logging.info(f'Synced {written} {table} in {elapsed:.3f} seconds ({written / max(elapsed, 0.001):.0f} rows/sec) and marked {deleted} as deleted.')
+    return written
 
 def row_count(table=None):
-    select = f'SELECT * FROM "{table}"'
+    select = queries.maintenance['row_count'].get(table)
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
             cursor.execute(select)
-            return len(cursor.fetchall())
+            return cursor.fetchone()['count']
     except Exception as e:
         logging.error(f'Failed to execute {select}: {e}')
         return False
 
 def check_freshness(table=None):
-    select = f'SELECT MIN(updated) AS updated FROM "{table}"'
+    select = queries.maintenance['check_freshness'].get(table)
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
             cursor.execute(select)
             results = cursor.fetchone()
@@ -85,6 +111,6 @@ def check_freshness(table=None):
 
 config_root = os.path.join(os.path.expanduser('~'), '.swagbot')
 dbfile = os.path.join(config_root, 'bot.db')
-conn = sqlite3.connect(dbfile, check_same_thread=False)
-conn.row_factory = utils.dict_factory
-cursor = conn.cursor()
+database = connection.get(path=dbfile)
+
+metrics.instrument_dao(module=__name__)
@@ -0,0 +1,125 @@
+# Versioned schema migrations. Each database file has an ordered list of
+# migrations, and PRAGMA user_version records how many of them have been
+# applied. migrate() runs when swagbot.database.connection first opens a file,
+# i.e., at startup for bot.db and when a plugin first uses its own database,
+# and applies the missing migrations in order, each in its own transaction.
+#
+# Migrations are only ever appended. A step is either a SQL statement or a
+# function taking the connection, for changes that depend on the existing
+# schema, e.g., add_column() for databases created by the old setup scripts.
+# The baselines use IF NOT EXISTS so they can be applied to those databases
+# too.
+import logging
+import os
+
+def add_column(table=None, column=None, definition=None):
+    def step(conn):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+        if not column in columns:
+            conn.execute(f'ALTER TABLE "{table}" ADD COLUMN {column} {definition}')
+    return step
+
+def create_index(name=None, table=None, columns=None):
+    # Skipped if an existing index, e.g., one created for a UNIQUE column,
+    # already starts with the same columns, since a second one would only
+    # slow down writes.
+    def step(conn):
+        for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+            indexed = [row[2] for row in conn.execute(f'PRAGMA index_info("{index[1]}")')]
+            if indexed[:len(columns)] == columns:
+                return
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({", ".join(columns)})')
+    return step
+
+migrations = {
+    'bot.db': [
+        ('Create the baseline schema', [
+            'CREATE TABLE IF NOT EXISTS afk (username TEXT NOT NULL, message TEXT NOT NULL, timestamp INTEGER NOT NULL)',
+            'CREATE TABLE IF NOT EXISTS command_settings (command TEXT NOT NULL PRIMARY KEY, module TEXT NOT NULL, enabled INTEGER NOT NULL DEFAULT 1, hidden INTEGER NOT NULL DEFAULT 0, channels INTEGER)',
+            'CREATE TABLE IF NOT EXISTS commands (command TEXT NOT NULL PRIMARY KEY, description TEXT, usage TEXT NOT NULL, is_admin INTEGER NOT NULL DEFAULT 0, can_be_disabled INTEGER NOT NULL DEFAULT 1, module TEXT NOT NULL, method TEXT NOT NULL, type TEXT NOT NULL, monospace INTEGER NOT NULL DEFAULT 0, split_output INTEGER NOT NULL DEFAULT 0)',
+            'CREATE TABLE IF NOT EXISTS curses (username TEXT NOT NULL, curses_count INTEGER NOT NULL, last_curse_time INTEGER NOT NULL, last_curse_word TEXT NOT NULL, last_curse_channel TEXT NOT NULL)',
+            'CREATE TABLE IF NOT EXISTS curse_words (word TEXT NOT NULL UNIQUE)',
+            'CREATE TABLE IF NOT EXISTS modules (module TEXT NOT NULL, enabled INTEGER NOT NULL DEFAULT 1, can_be_disabled INTEGER NOT NULL DEFAULT 0)',
+            'CREATE TABLE IF NOT EXISTS greetings (language TEXT NOT NULL PRIMARY KEY UNIQUE, greeting TEXT NOT NULL)',
+            'CREATE TABLE IF NOT EXISTS users (id TEXT NOT NULL PRIMARY KEY UNIQUE, name TEXT NOT NULL UNIQUE, real_name TEXT NOT NULL UNIQUE, email TEXT UNIQUE, is_bot INTEGER, is_app_user INTEGER, deleted INTEGER DEFAULT 0, updated INTEGER DEFAULT 0)',
+            'CREATE TABLE IF NOT EXISTS admins (id TEXT NOT NULL PRIMARY KEY UNIQUE, name TEXT NOT NULL UNIQUE, real_name TEXT NOT NULL UNIQUE)',
+            'CREATE TABLE IF NOT EXISTS seen (id TEXT NOT NULL PRIMARY KEY UNIQUE, name TEXT NOT NULL UNIQUE, seen_time INTEGER DEFAULT 0, seen_channel TEXT)',
+            'CREATE TABLE IF NOT EXISTS channels (id TEXT NOT NULL PRIMARY KEY UNIQUE, name TEXT NOT NULL UNIQUE, is_channel INTEGER DEFAULT 0, is_group INTEGER DEFAULT 0, is_im INTEGER DEFAULT 0, is_private INTEGER DEFAULT 0, is_mpim INTEGER DEFAULT 0, created INTEGER DEFAULT 0, creator TEXT, updated INTEGER DEFAULT 0, name_normalized TEXT)',
+            'CREATE TABLE IF NOT EXISTS slack_errors (method TEXT NOT NULL, error TEXT NOT NULL, bot_error TEXT NOT NULL)',
+            'CREATE TABLE IF NOT EXISTS scheduler (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, description TEXT, module TEXT NOT NULL, interval INTEGER NOT NULL, function TEXT NOT NULL, enabled INTEGER NOT NULL DEFAULT 1, paused_until INTEGER DEFAULT 0, UNIQUE(name, module) ON CONFLICT FAIL)',
+            # Missing from databases created by the old setup script.
+            add_column(table='commands', column='description', definition='TEXT'),
+        ]),
+        ('Index the columns looked up at runtime', [
+            create_index(name='seen_name', table='seen', columns=['name']),
+            create_index(name='users_name', table='users', columns=['name']),
+            create_index(name='channels_name', table='channels', columns=['name']),
+            create_index(name='admins_name', table='admins', columns=['name']),
+            create_index(name='scheduler_module_name', table='scheduler', columns=['module', 'name']),
+            create_index(name='commands_module', table='commands', columns=['module']),
+            create_index(name='command_settings_module', table='command_settings', columns=['module']),
+            create_index(name='slack_errors_method_error', table='slack_errors', columns=['method', 'error']),
+        ]),
+        ('Track deleted channels', [
+            add_column(table='channels', column='deleted', definition='INTEGER DEFAULT 0'),
+        ]),
+    ],
+    'swagbot.plugins.extras.db': [
+        ('Create the baseline schema', [
+            'CREATE TABLE IF NOT EXISTS currency_conversion (currency_code TEXT NOT NULL UNIQUE, currency_name TEXT NOT NULL)',
+            'CREATE TABLE IF NOT EXISTS crypto_conversion (currency_code TEXT NOT NULL UNIQUE, currency_name TEXT NOT NULL)',
+        ]),
+    ],
+    'swagbot.plugins.pagerduty.db': [
+        ('Create the baseline schema', [
+            'CREATE TABLE IF NOT EXISTS escalation_policies (id TEXT NOT NULL PRIMARY KEY, name TEXT NOT NULL)',
+            'CREATE TABLE IF NOT EXISTS schedules (id TEXT NOT NULL PRIMARY KEY, name TEXT NOT NULL)',
+            'CREATE TABLE IF NOT EXISTS services (id TEXT NOT NULL PRIMARY KEY, name TEXT NOT NULL)',
+            'CREATE TABLE IF NOT EXISTS users (id TEXT NOT NULL PRIMARY KEY, name TEXT NOT NULL, email TEXT, role TEXT)',
+            'CREATE TABLE IF NOT EXISTS oncall_temp (escalation_policy TEXT NOT NULL, name TEXT NOT NULL, level INTEGER NOT NULL)',
+            # The plugin used to create users without the columns add_user
+            # writes.
+            add_column(table='users', column='email', definition='TEXT'),
+            add_column(table='users', column='role', definition='TEXT'),
+        ]),
+        ('Index the columns looked up at runtime', [
+            create_index(name='oncall_temp_level', table='oncall_temp', columns=['level']),
+        ]),
+        # The plugin keeps oncall search results in memory now.
+        ('Drop oncall_temp', [
+            'DROP TABLE IF EXISTS oncall_temp',
+        ]),
+    ],
+    'swagbot.plugins.quotes.db': [
+        ('Create the baseline schema', [
+            'CREATE TABLE IF NOT EXISTS quotes (quote TEXT NOT NULL, category TEXT NOT NULL)',
+        ]),
+        ('Index the columns looked up at runtime', [
+            create_index(name='quotes_category', table='quotes', columns=['category']),
+        ]),
+    ],
+}
+
+def migrate(conn=None, name=None):
+    # name is the database's file name, e.g., bot.db. Returns the schema
+    # version the database is left at.
+    name = os.path.basename(name)
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    pending = migrations.get(name, [])[version:]
+    for description, steps in pending:
+        version += 1
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version={version}')
+            conn.execute('COMMIT')
+        except Exception as e:
+            conn.execute('ROLLBACK')
+            logging.error(f'Failed to apply migration {version} ({description}) to {name}: {e}')
+            return version - 1
+        logging.info(f'Applied migration {version} ({description}) to {name}.')
+    return version
@@ -0,0 +1,109 @@
+# Every statement run by the modules in swagbot/database, keyed by module and
+# function. Values are always bound as parameters, never formatted into the
+# SQL, so each statement's text is fixed and sqlite3 prepares it once per
+# connection and then reuses it from the connection's statement cache.
+# Statements whose table is chosen by the caller, e.g., pagerduty.add, have one
+# entry per table.
+
+core = {
+    'command_exists': 'SELECT 1 FROM commands WHERE command=?',
+    'insert_command': 'INSERT OR REPLACE INTO commands (command,description,usage,is_admin,can_be_disabled,module,method,type,monospace,split_output) VALUES (?,?,?,?,?,?,?,?,?,?)',
+    'update_command': 'UPDATE commands SET description=?,usage=?,is_admin=?,can_be_disabled=?,module=?,method=?,type=?,monospace=?,split_output=? WHERE command=?',
+    'command_settings_exist': 'SELECT 1 FROM command_settings WHERE command=?',
+    'insert_command_settings': 'INSERT OR REPLACE INTO command_settings (command,module,enabled,hidden) VALUES (?,?,?,?)',
+    # The first parameter is 1 to include admin commands.
+    'help': 'SELECT commands.*, command_settings.* FROM commands JOIN command_settings ON commands.command=command_settings.command AND command_settings.enabled=1 AND command_settings.hidden=0 WHERE ? OR is_admin=0 ORDER BY command',
+    'usage': 'SELECT usage FROM commands WHERE command=?',
+    'all_commands': 'SELECT command FROM commands',
+    'command_lookup': 'SELECT commands.command, commands.description, commands.usage, commands.is_admin, commands.can_be_disabled, commands.module, commands.method, commands.type, commands.monospace, commands.split_output, command_settings.enabled, command_settings.hidden FROM commands JOIN command_settings ON commands.command = command_settings.command WHERE commands.command=?',
+    'get_command_settings': 'SELECT * FROM command_settings WHERE module=?',
+    'set_command_hidden': 'UPDATE command_settings SET hidden=? WHERE command=?',
+    'set_command_enabled': 'UPDATE command_settings SET enabled=? WHERE command=?',
+    'get_user_by_id': 'SELECT * FROM users WHERE id=?',
+    'get_user_by_name': 'SELECT * FROM users WHERE name=?',
+    'get_channel_by_name': 'SELECT * FROM channels WHERE name=?',
+    'get_slack_api_errors': 'SELECT * FROM slack_errors WHERE method=? and error=?',
+    'module_list': 'SELECT * FROM modules ORDER BY enabled, module',
+    'get_module': 'SELECT * FROM modules WHERE module=?',
+    'moduleadd': 'INSERT INTO modules (module,enabled,can_be_disabled) VALUES (?, ?, 1)',
+    'set_module_enabled': 'UPDATE modules SET enabled=? WHERE module=?',
+    'module_commands': 'SELECT command FROM commands WHERE module=?',
+    'module_manifest': 'SELECT command, description, usage, is_admin, can_be_disabled, method, type, monospace, split_output FROM commands WHERE module=?',
+    'module_is_enabled': 'SELECT enabled FROM modules WHERE module=?',
+    'admin_list': 'SELECT * FROM admins',
+    'get_admin_by_name': 'SELECT * FROM admins WHERE name=?',
+    'get_admin_by_id': 'SELECT * FROM admins WHERE id=?',
+    'admin_grant': 'INSERT OR REPLACE INTO admins (id, name, real_name) VALUES (?, ?, ?)',
+    'admin_revoke': 'DELETE FROM admins WHERE name=?',
+    'update_seen': 'INSERT OR REPLACE INTO seen (id, name, seen_time, seen_channel) VALUES (?, ?, ?, ?)',
+    'get_seen': 'SELECT * FROM seen WHERE name=?',
+    'random_greeting': 'SELECT * FROM greetings ORDER BY RANDOM() LIMIT 1',
+    'greeting': 'SELECT * FROM greetings WHERE language=? COLLATE NOCASE',
+    'curse_lookup': 'SELECT * FROM curses WHERE username=? LIMIT 1',
+}
+
+extras = {
+    'currency_lookup': 'SELECT currency_name,currency_code FROM currency_conversion WHERE currency_code=? LIMIT 1',
+    'crypto_lookup': 'SELECT currency_name,currency_code FROM crypto_conversion WHERE currency_code=? LIMIT 1',
+}
+
+maintenance = {
+    'update_channels': 'INSERT OR REPLACE INTO channels (id, name, is_channel, is_group, is_im, is_private, is_mpim, created, creator, name_normalized, deleted, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+    'get_channel_by_name': 'SELECT * FROM channels WHERE name=?',
+    'update_users': 'INSERT OR REPLACE INTO users (id, name, real_name, email, is_bot, is_app_user, deleted, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+    # The parameter is a JSON array of the ids written by the sync.
+    'mark_deleted': {table: f'UPDATE "{table}" SET deleted=1 WHERE deleted=0 AND id NOT IN (SELECT value FROM json_each(?))' for table in ['channels', 'users']},
+    'row_count': {table: f'SELECT COUNT(*) AS count FROM "{table}"' for table in ['channels', 'users']},
+    'check_freshness': {table: f'SELECT MIN(updated) AS updated FROM "{table}" WHERE deleted=0' for table in ['channels', 'users']},
+}
+
+pagerduty_tables = ['escalation_policies', 'schedules', 'services', 'users']
+
+pagerduty = {
+    'add': {table: f'INSERT OR REPLACE INTO {table} (id, name) VALUES (?, ?)' for table in pagerduty_tables},
+    'add_user': 'INSERT OR REPLACE INTO users (id, name, email, role) VALUES (?, ?, ?, ?)',
+    # The second parameter is a LIKE pattern, or NULL to list everything.
+    'list': {table: f'SELECT * FROM {table} WHERE ?1 IS NULL OR name LIKE ?1' for table in pagerduty_tables},
+}
+
+scheduler = {
+    'update_job': 'UPDATE scheduler SET module=?, name=?, interval=?, function=?, enabled=? WHERE id=?',
+    'insert_job': 'INSERT OR REPLACE INTO scheduler (module, name, interval, function, enabled) VALUES (?, ?, ?, ?, ?)',
+    # A NULL module or name matches every job.
+    'get_jobs': 'SELECT id, module, name, interval, enabled FROM scheduler WHERE (?1 IS NULL OR module=?1) AND (?2 IS NULL OR name=?2)',
+    'delete_job': 'DELETE FROM scheduler WHERE module=? AND name=?',
+    'delete_job_by_id': 'DELETE FROM scheduler WHERE id=?',
+    'set_job_enabled': 'UPDATE scheduler SET enabled=? WHERE module=? AND name=?',
+    'set_job_enabled_by_id': 'UPDATE scheduler SET enabled=? WHERE id=?',
+    'get_all_jobs': 'SELECT * FROM scheduler',
+    'get_jobs_by_module': 'SELECT * FROM scheduler WHERE module=?',
+    'get_job_by_module_and_name': 'SELECT * FROM scheduler WHERE module=? AND name=?',
+    'get_job_by_id': 'SELECT * FROM scheduler WHERE id=?',
+    'delete_jobs_for_module': 'DELETE FROM scheduler WHERE module=?',
+}
+
+quotes = {
+    'random_quote': 'SELECT quote FROM quotes WHERE category=? ORDER BY RANDOM() LIMIT 1',
+}
+
+# swagbot.cache's persistent tier. Caches can use any file, so the table is
+# created by the cache rather than by swagbot.database.migrations.
+cache = {
+    'create_table': 'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)',
+    'create_index': 'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'get': 'SELECT value, expires FROM cache WHERE key=?',
+    'set': 'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+    'purge_expired': 'DELETE FROM cache WHERE expires<?',
+    # Keeps the parameter's number of rows, dropping those expiring soonest.
+    'trim': 'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?)',
+    'clear': 'DELETE FROM cache',
+}
+
+def count():
+    # The number of distinct statements, used to size each connection's
+    # statement cache so none of them are evicted.
+    total = 0
+    for registry in [core, extras, maintenance, pagerduty, scheduler, quotes, cache]:
+        for statement in registry.values():
+            total += len(statement) if isinstance(statement, dict) else 1
+    return total
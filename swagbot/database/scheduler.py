@@ -1,18 +1,23 @@
 import base64
 import logging
 import os
-import sqlite3
+import swagbot.database.connection as connection
+import swagbot.database.queries as queries
+import swagbot.metrics as metrics
 import swagbot.utils.core as utils
 from pprint import pprint
 import dill
 
 def add_job(module=None, name=None, interval=None, function=None, enabled=None):
+    # Called when a plugin is loaded. The function is pickled again each time
+    # so the stored copy, used to restore jobs whose plugin hasn't been loaded,
+    # never runs an older version of the plugin's code or config.
     encoded_data = base64.b64encode(dill.dumps(function))
     job = get_job_by_module_and_name(module=module, name=name)
     if job:
-        update = f'UPDATE scheduler SET module=?, name=?, interval=?, function=?, enabled=? WHERE id=?'
+        update = queries.scheduler['update_job']
         try:
-            with conn:
+            with database.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute(update, (module, name, interval, encoded_data, enabled, job['id']))
                 conn.commit()
@@ -20,9 +25,9 @@ def add_job(module=None, name=None, interval=None, function=None, enabled=None):
             logging.error(f'Failed to execute {update}: {e}')
             return False
     else:
-        insert = f'INSERT OR REPLACE INTO scheduler (module, name, interval, function, enabled) VALUES (?, ?, ?, ?, ?)'
+        insert = queries.scheduler['insert_job']
         try:
-            with conn:
+            with database.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute(insert, (module, name, interval, encoded_data, enabled))
                 conn.commit()
@@ -32,24 +37,11 @@ def add_job(module=None, name=None, interval=None, function=None, enabled=None):
 
 def get_jobs(module=None, name=None):
     output = []
-    where = []
-    where_str = ''
-    if module:
-        where.append(
-            f'module="{module}"'
-        )
-    if name:
-        where.append(
-            f'name="{name}"'
-        )
-    if len(where) > 0:
-        where_str = 'WHERE ' + ' AND '.join(where)
-    
-    select = f'SELECT id, module, name, interval, enabled FROM scheduler {where_str}'
+    select = queries.scheduler['get_jobs']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            results = cursor.execute(select)
+            results = cursor.execute(select, (module if module else None, name if name else None))
             for row in results:
                     output.append(row)
             return output
@@ -58,66 +50,66 @@ def get_jobs(module=None, name=None):
         return False
 
 def delete_job(module=None, name=None):
-    delete = f'DELETE FROM scheduler WHERE module="{module} AND name="{name}"'
+    delete = queries.scheduler['delete_job']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(delete)
+            cursor.execute(delete, (module, name))
             conn.commit()
     except Exception as e:
         logging.error(f'Failed to execute {delete}: {e}')
         return False
 
 def delete_job_by_id(id=None):
-    delete = f'DELETE FROM scheduler WHERE id={id}'
+    delete = queries.scheduler['delete_job_by_id']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(delete)
+            cursor.execute(delete, (id,))
             conn.commit()
     except Exception as e:
         logging.error(f'Failed to execute {delete}: {e}')
         return False
 
 def enable_job(module=None, name=None):
-    delete = f'UPDATE scheduler SET enabled=1 WHERE module="{module} AND name="{name}"'
+    update = queries.scheduler['set_job_enabled']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(delete)
+            cursor.execute(update, (1, module, name))
             conn.commit()
     except Exception as e:
-        logging.error(f'Failed to execute {delete}: {e}')
+        logging.error(f'Failed to execute {update}: {e}')
         return False        
 
 def enable_job_by_id(id=None):
-    delete = f'UPDATE scheduler SET enabled=1 WHERE id={id}'
+    update = queries.scheduler['set_job_enabled_by_id']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(delete, (id))
+            cursor.execute(update, (1, id))
             conn.commit()
     except Exception as e:
-        logging.error(f'Failed to execute {delete}: {e}')
+        logging.error(f'Failed to execute {update}: {e}')
         return False  
 
 def disable_job(module=None, name=None):
-    update = f'UPDATE scheduler SET enabled=0 WHERE module="{module}" AND name="{name}"'
+    update = queries.scheduler['set_job_enabled']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(update)
+            cursor.execute(update, (0, module, name))
             conn.commit()
     except Exception as e:
         logging.error(f'Failed to execute {update}: {e}')
         return False  
 
 def disable_job_by_id(id=None):
-    update = f'UPDATE scheduler SET enabled=0 WHERE id={id}'
+    update = queries.scheduler['set_job_enabled_by_id']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(update, (id))
+            cursor.execute(update, (0, id))
             conn.commit()
     except Exception as e:
         logging.error(f'Failed to execute {update}: {e}')
@@ -125,12 +117,13 @@ def disable_job_by_id(id=None):
 
 def get_all_jobs():
     output = []
-    select = 'SELECT * FROM scheduler'
+    select = queries.scheduler['get_all_jobs']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
             results = cursor.execute(select)
             for row in results:
+                    row = dict(row)
                     row['enabled'] = True if row['enabled'] else False
                     output.append(row)
             return output
@@ -140,12 +133,13 @@ def get_all_jobs():
 
 def get_jobs_by_module(module=None):
     output = []
-    select = f'SELECT * FROM scheduler WHERE module="{module}"'
+    select = queries.scheduler['get_jobs_by_module']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            results = cursor.execute(select)
+            results = cursor.execute(select, (module,))
             for row in results:
+                row = dict(row)
                 row['enabled'] = True if row['enabled'] else False
                 output.append(row)
             return output
@@ -154,11 +148,11 @@ def get_jobs_by_module(module=None):
         return output 
 
 def get_job_by_module_and_name(module=None, name=None):
-    select = f'SELECT * FROM scheduler WHERE module="{module}" AND name="{name}"'
+    select = queries.scheduler['get_job_by_module_and_name']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (module, name))
             results = cursor.fetchone()
             return results if results else False
     except Exception as e:
@@ -166,11 +160,11 @@ def get_job_by_module_and_name(module=None, name=None):
         return False 
 
 def get_job_by_id(id=None):
-    select = f'SELECT * FROM scheduler WHERE id={id}'
+    select = queries.scheduler['get_job_by_id']
     try:
-        with conn:
+        with database.read() as conn:
             cursor = conn.cursor()
-            cursor.execute(select)
+            cursor.execute(select, (id,))
             results = cursor.fetchone()
             return results if results else False
     except Exception as e:
@@ -178,11 +172,11 @@ def get_job_by_id(id=None):
         return False 
 
 def delete_jobs_for_module(module=None):
-    delete = f'DELETE FROM scheduler WHERE module="{module}"'
+    delete = queries.scheduler['delete_jobs_for_module']
     try:
-        with conn:
+        with database.write() as conn:
             cursor = conn.cursor()
-            cursor.execute(delete)
+            cursor.execute(delete, (module,))
             conn.commit()
     except Exception as e:
         logging.error(f'Failed to execute {delete}: {e}')
@@ -190,6 +184,6 @@ def delete_jobs_for_module(module=None):
 
 config_root = os.path.join(os.path.expanduser('~'), '.swagbot')
 dbfile = os.path.join(config_root, 'bot.db')
-conn = sqlite3.connect(dbfile, check_same_thread=False)
-conn.row_factory = utils.dict_factory
-cursor = conn.cursor()
+database = connection.get(path=dbfile)
+
+metrics.instrument_dao(module=__name__)
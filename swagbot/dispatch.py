@@ -0,0 +1,138 @@
+# Commands are validated on the Slack listener thread and then queued here to
+# be executed by a pool of workers, so a slow command never holds a listener.
+# Commands with a priority below express_priority, e.g., time and uptime, are
+# served by their own workers so they never wait behind network-bound commands.
+from queue import Full, PriorityQueue
+from threading import Lock, Thread
+import itertools
+import logging
+import swagbot.metrics as metrics
+import time
+
+default_priority = 50
+express_priority = 20
+
+class Dispatcher(object):
+    def __init__(self, **kwargs):
+        self.name = kwargs.get('name', 'dispatch')
+        self.workers = kwargs.get('workers', 4)
+        self.express_workers = kwargs.get('express_workers', 1)
+        self.queue_size = kwargs.get('queue_size', 100)
+        self.priorities = kwargs.get('priorities', None) or {}
+        self.queues = {
+            'express': PriorityQueue(maxsize=self.queue_size),
+            'normal': PriorityQueue(maxsize=self.queue_size),
+        }
+        self.sequence = itertools.count()
+        self.lock = Lock()
+        self.threads = []
+        self.thread_started = False
+        self.submitted = 0
+        self.rejected = 0
+        self.executed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def priority(self, command=None):
+        if command.name in self.priorities:
+            return self.priorities[command.name]
+        return command.priority if command.priority is not None else default_priority
+
+    def submit(self, command=None):
+        priority = self.priority(command=command)
+        lane = 'express' if priority < express_priority else 'normal'
+        try:
+            # The sequence number keeps commands of equal priority in arrival
+            # order and means Command objects are never compared.
+            self.queues[lane].put_nowait((priority, next(self.sequence), time.monotonic(), command))
+        except Full:
+            with self.lock:
+                self.rejected += 1
+            logging.warning(f'The {lane} dispatch queue is full. Rejecting the command {command.name}.')
+            return False
+
+        depth = self.depth()
+        with self.lock:
+            self.submitted += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    def depth(self):
+        return sum([queue.qsize() for queue in self.queues.values()])
+
+    def worker(self, lane=None):
+        queue = self.queues[lane]
+        while True:
+            priority, _, enqueued, command = queue.get()
+            if command is None:
+                queue.task_done()
+                break
+
+            wait = time.monotonic() - enqueued
+            with self.lock:
+                self.total_wait += wait
+                if wait > self.max_wait:
+                    self.max_wait = wait
+            metrics.command_wait_seconds.observe(labels=(lane,), value=wait)
+            logging.debug(f'Executing the command {command.name} after waiting {wait:.4f} seconds in the {lane} queue.')
+
+            start = time.perf_counter()
+            try:
+                command.execute()
+                with self.lock:
+                    self.executed += 1
+            except Exception as e:
+                with self.lock:
+                    self.failed += 1
+                metrics.command_failures.inc(labels=(command.name,))
+                logging.exception(f'The command {command.name} failed: {e}')
+            finally:
+                metrics.command_seconds.observe(labels=(command.name,), value=time.perf_counter() - start)
+                queue.task_done()
+
+    def start(self):
+        self.thread_started = True
+        for lane, count in [('express', self.express_workers), ('normal', self.workers)]:
+            for i in range(count):
+                thread = Thread(
+                    name=f'{self.name}-{lane}-{i}',
+                    target=self.worker,
+                    kwargs={'lane': lane},
+                    daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+        logging.info(f'Started the dispatcher with {self.workers} workers and {self.express_workers} express workers.')
+
+    def stop(self, timeout=5):
+        if not self.thread_started:
+            return
+        logging.info('Stopping the dispatcher.')
+        self.thread_started = False
+        # Sentinels sort after every real command so queued work is drained.
+        for lane, count in [('express', self.express_workers), ('normal', self.workers)]:
+            for _ in range(count):
+                try:
+                    self.queues[lane].put((float('inf'), next(self.sequence), time.monotonic(), None), timeout=timeout)
+                except Full:
+                    logging.error(f'Timed out stopping a worker for the {lane} dispatch queue.')
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+        self.threads = []
+
+    def stats(self):
+        with self.lock:
+            completed = self.executed + self.failed
+            return {
+                'depth': self.depth(),
+                'max_depth': self.max_depth,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'executed': self.executed,
+                'failed': self.failed,
+                'average_wait': self.total_wait / completed if completed > 0 else 0.0,
+                'max_wait': self.max_wait,
+            }
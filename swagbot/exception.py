@@ -78,3 +78,13 @@ class NotASwagBotObject(Exception):
 	def __str__(self):
 		self.error = 'The class {} requires a valid swagbot.bot.SwagBot object in the constructor. You provided {}.'.format(self.classname, self.got)
 		return self.error
+
+class ArgumentParserError(Exception):
+	def __init__(self, message=None, usage=None):
+		self.message = message
+		self.usage = usage
+		return
+
+	def __str__(self):
+		self.error = self.message if self.message else 'Failed to parse the command arguments.'
+		return self.error
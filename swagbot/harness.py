@@ -0,0 +1,247 @@
+# A load-test harness. SwagBot is started against FakeWebClient, which answers
+# Slack API calls locally, and message events are replayed through
+# process_message at a fixed rate. For each command the harness records the
+# time from the event arriving to the command finishing, and the database,
+# HTTP, and Slack calls made on the way. See benchmarks/replay.py.
+from slack_sdk.web.slack_response import SlackResponse
+from swagbot.client import WebClient
+from swagbot.core import Event
+from swagbot.dispatch import Dispatcher
+from threading import Condition, Lock
+import json
+import logging
+import math
+import swagbot.database.maintenance as maintenance_db
+import swagbot.globals as globals
+import swagbot.metrics as metrics
+import swagbot.outbound as outbound
+import swagbot.utils.core as utils
+import time
+
+def fake_users(count=100):
+    return [{
+        'id': f'U{i:08d}',
+        'name': f'user{i}',
+        'real_name': f'User {i}',
+        'is_bot': False,
+        'is_app_user': False,
+        'deleted': False,
+        'profile': {'email': f'user{i}@example.com'},
+    } for i in range(count)]
+
+def fake_channels(count=20):
+    return [{
+        'id': f'C{i:08d}',
+        'name': f'channel{i}',
+        'name_normalized': f'channel{i}',
+        'is_channel': True,
+        'is_group': False,
+        'is_im': False,
+        'is_private': False,
+        'is_mpim': False,
+        'is_archived': False,
+        'created': 1600000000 + i,
+        'creator': 'U00000000',
+    } for i in range(count)]
+
+class FakeWebClient(WebClient):
+    # Records the messages the bot posts and returns canned, paginated
+    # users.list and conversations.list responses. Every other method succeeds
+    # with an empty response. latency adds a delay to every call to stand in
+    # for the round trip to Slack.
+    def __init__(self, **kwargs):
+        WebClient.__init__(self, token=kwargs.get('token', 'xoxb-harness'))
+        self.latency = kwargs.get('latency', 0)
+        self.users = kwargs.get('users', None) or fake_users()
+        self.channels = kwargs.get('channels', None) or fake_channels()
+        self.lock = Lock()
+        self.posts = []
+        self.calls = {}
+
+    def send_api_call(self, api_method, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        params = {}
+        for key in ['params', 'json', 'data']:
+            params.update(kwargs.get(key, None) or {})
+        with self.lock:
+            self.calls[api_method] = self.calls.get(api_method, 0) + 1
+            if api_method == 'chat.postMessage':
+                self.posts.append((params.get('channel'), params.get('text')))
+
+        if api_method == 'users.list':
+            data = self.__page(key='members', items=self.users, params=params)
+        elif api_method == 'conversations.list':
+            data = self.__page(key='channels', items=self.channels, params=params)
+        elif api_method == 'chat.postMessage':
+            data = {'ok': True, 'channel': params.get('channel'), 'ts': f'{time.time():.6f}'}
+        else:
+            data = {'ok': True}
+        return SlackResponse(
+            client=self,
+            http_verb=kwargs.get('http_verb', 'POST'),
+            api_url=f'{self.base_url}{api_method}',
+            req_args=kwargs,
+            data=data,
+            headers={},
+            status_code=200,
+        ).validate()
+
+    def files_upload_v2(self, **kwargs):
+        # The real method makes several calls, one of them to an upload URL.
+        with self.lock:
+            self.calls['files.upload'] = self.calls.get('files.upload', 0) + 1
+            self.posts.append((kwargs.get('channel'), kwargs.get('content')))
+        return {'ok': True}
+
+    def __page(self, key=None, items=None, params=None):
+        offset = int(params.get('cursor', None) or 0)
+        limit = int(params.get('limit', None) or 100)
+        page = items[offset:offset + limit]
+        next_cursor = str(offset + limit) if offset + limit < len(items) else ''
+        return {'ok': True, key: page, 'response_metadata': {'next_cursor': next_cursor}}
+
+class RecordingDispatcher(Dispatcher):
+    # Wraps each submitted command so the harness knows when it has finished
+    # and what it cost.
+    def __init__(self, **kwargs):
+        Dispatcher.__init__(self, **kwargs)
+        self.harness = kwargs.get('harness')
+
+    def submit(self, command=None):
+        received = self.harness.received
+        with self.harness.condition:
+            self.harness.submitted += 1
+        execute = command.execute
+        def recorded_execute():
+            metrics.track_calls()
+            try:
+                execute()
+            finally:
+                self.harness.record(name=command.name, latency=time.perf_counter() - received, counts=metrics.tracked_calls())
+        command.execute = recorded_execute
+        if not Dispatcher.submit(self, command=command):
+            self.harness.record(name=command.name, latency=time.perf_counter() - received, counts=None)
+            return False
+        return True
+
+class Harness(object):
+    def __init__(self, **kwargs):
+        self.bot = kwargs.get('bot')
+        self.client = kwargs.get('client', None) or FakeWebClient()
+        self.condition = Condition()
+        self.received = None
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.samples = {}
+        self.listener = {'db': 0, 'http': 0, 'slack': 0}
+
+    def start(self):
+        # Swap in a dispatcher with the same settings that records commands,
+        # seed the users and channels tables from the fake workspace, then
+        # start the bot without connecting to Slack.
+        dispatcher = self.bot.dispatcher
+        self.bot.dispatcher = RecordingDispatcher(
+            harness=self,
+            workers=dispatcher.workers,
+            express_workers=dispatcher.express_workers,
+            queue_size=dispatcher.queue_size,
+            priorities=dispatcher.priorities,
+        )
+        maintenance_db.update_users(users=self.client.users)
+        maintenance_db.update_channels(channels=self.client.channels)
+        self.bot.start(client=self.client)
+        globals.ready_time = utils.now()
+
+    def record(self, name=None, latency=None, counts=None):
+        with self.condition:
+            self.completed += 1
+            if counts is None:
+                self.rejected += 1
+            else:
+                self.samples.setdefault(name, []).append((latency, counts))
+            self.condition.notify_all()
+
+    def replay(self, events=None, rate=0):
+        # rate is events per second. 0 replays them as fast as possible.
+        interval = 1.0 / rate if rate else 0
+        start = time.perf_counter()
+        for i, event in enumerate(events):
+            if interval:
+                delay = start + (i * interval) - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.received = time.perf_counter()
+            metrics.track_calls()
+            self.bot.process_message(Event(event=event))
+            counts = metrics.tracked_calls()
+            for kind in self.listener:
+                self.listener[kind] += counts[kind]
+
+    def wait(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.completed < self.submitted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.error(f'Timed out waiting for {self.submitted - self.completed} commands to finish.')
+                    return False
+                self.condition.wait(timeout=remaining)
+        return outbound.sender.flush(timeout=max(deadline - time.monotonic(), 0))
+
+    def report(self, elapsed=None, events=0):
+        lines = []
+        lines.append(f'Replayed {events} events in {elapsed:.3f} seconds ({events / elapsed:.1f} events/s).')
+        lines.append(f'Ran {self.completed - self.rejected} commands ({(self.completed - self.rejected) / elapsed:.1f} commands/s), rejected {self.rejected}.')
+        lines.append(f'Listener: {self.listener["db"]} database, {self.listener["http"]} HTTP, and {self.listener["slack"]} Slack calls.')
+        lines.append(f'Slack: {len(self.client.posts)} messages posted, {sum(self.client.calls.values())} API calls.')
+        rows = []
+        for name in sorted(self.samples.keys()):
+            samples = self.samples[name]
+            latencies = sorted([latency for latency, _ in samples])
+            rows.append([
+                name,
+                len(samples),
+                f'{percentile(latencies, 50) * 1000:.2f}',
+                f'{percentile(latencies, 95) * 1000:.2f}',
+                f'{percentile(latencies, 99) * 1000:.2f}',
+                f'{latencies[-1] * 1000:.2f}',
+                f'{sum([counts["db"] for _, counts in samples]) / len(samples):.1f}',
+                f'{sum([counts["http"] for _, counts in samples]) / len(samples):.1f}',
+                f'{sum([counts["slack"] for _, counts in samples]) / len(samples):.1f}',
+            ])
+        if len(rows) > 0:
+            lines.append(utils.generate_table(headers=['Command', 'Count', 'p50 ms', 'p95 ms', 'p99 ms', 'Max ms', 'DB/cmd', 'HTTP/cmd', 'Slack/cmd'], data=rows))
+        return '\n'.join(lines)
+
+def percentile(values=None, p=50):
+    # Nearest-rank percentile of a sorted list.
+    if len(values) == 0:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(values)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+def load_events(path=None):
+    # One Slack message event per line. Blank lines and lines starting with #
+    # are skipped.
+    events = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                events.append(json.loads(line))
+    return events
+
+def synthetic_events(commands=None, count=100, users=None, channels=None, prefix='!'):
+    events = []
+    for i in range(count):
+        events.append({
+            'type': 'message',
+            'channel_type': 'channel',
+            'user': users[i % len(users)]['id'],
+            'channel': channels[i % len(channels)]['id'],
+            'text': f'{prefix}{commands[i % len(commands)]}',
+            'ts': f'{1700000000 + i}.000000',
+        })
+    return events
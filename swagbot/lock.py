@@ -0,0 +1,62 @@
+# A single-instance guard. The bot holds an exclusive flock on a file under
+# ~/.swagbot for as long as it runs. The kernel drops the lock when the process
+# exits, however it exits, so a lock file left behind by a crashed bot never
+# blocks a new one. The file holds the pid of the bot that owns it, which is
+# only used for reporting.
+import fcntl
+import logging
+import os
+import psutil
+
+class InstanceLock(object):
+    def __init__(self, **kwargs):
+        self.config_root = kwargs.get('config_root', os.path.join(os.path.expanduser('~'), '.swagbot'))
+        self.instance = kwargs.get('instance', None)
+        filename = f'swagbot-{self.instance}.lock' if self.instance else 'swagbot.lock'
+        self.path = kwargs.get('path', os.path.join(self.config_root, filename))
+        self.fd = None
+        self.owner = None
+
+    def __read_pid(self, fd=None):
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            contents = os.read(fd, 32).decode('utf-8').strip()
+            return int(contents) if contents else None
+        except Exception:
+            return None
+
+    def acquire(self):
+        # Returns True if the lock was taken. Otherwise self.owner is the pid
+        # recorded by the process holding it, if it could be read.
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.owner = self.__read_pid(fd=fd)
+            os.close(fd)
+            if self.owner and not psutil.pid_exists(self.owner):
+                # The bot that wrote the pid is gone but the lock is still held,
+                # e.g., by a child process that inherited the descriptor.
+                logging.warning(f'The lock {self.path} is held by another process but the pid {self.owner} recorded in it is no longer running.')
+            return False
+
+        previous = self.__read_pid(fd=fd)
+        if previous and previous != os.getpid():
+            logging.info(f'Replacing the stale lock {self.path} left by the pid {previous}.')
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, f'{os.getpid()}\n'.encode('utf-8'))
+        os.fsync(fd)
+        self.fd = fd
+        self.owner = os.getpid()
+        return True
+
+    def release(self):
+        if self.fd is None:
+            return
+        try:
+            os.ftruncate(self.fd, 0)
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,301 @@
+# In-process metrics. Latency histograms and counters are kept for commands,
+# database queries, outbound HTTP requests, Slack API calls, and scheduled
+# jobs, and components with their own stats(), e.g., the dispatcher, register
+# them to be reported as gauges. Everything can be read with the admin stats
+# command or scraped in the Prometheus text format from an optional local HTTP
+# endpoint configured under metrics in bot.yml.
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread, local
+import bisect
+import functools
+import inspect
+import logging
+import sys
+import time
+
+default_buckets = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+lock = Lock()
+registered = {}
+collectors = {}
+server = None
+calls = local()
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names=None, values=None, extra=None):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs += [f'{name}="{escape(value)}"' for name, value in extra.items()]
+    return '{' + ','.join(pairs) + '}' if len(pairs) > 0 else ''
+
+class Histogram(object):
+    # Bucket counts are stored per bucket and only made cumulative when the
+    # histogram is rendered.
+    def __init__(self, **kwargs):
+        self.name = kwargs.get('name')
+        self.help = kwargs.get('help', '')
+        self.labels = kwargs.get('labels', None) or []
+        self.buckets = kwargs.get('buckets', None) or default_buckets
+        self.lock = Lock()
+        self.series = {}
+
+    def observe(self, labels=(), value=0.0):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0, 'max': 0.0}
+            if index < len(self.buckets):
+                series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+            if value > series['max']:
+                series['max'] = value
+
+    def snapshot(self):
+        with self.lock:
+            return {labels: {'buckets': list(series['buckets']), 'sum': series['sum'], 'count': series['count'], 'max': series['max']} for labels, series in self.series.items()}
+
+    def quantile(self, series=None, q=0.5):
+        # An estimate, interpolated linearly within the bucket holding the q-th
+        # observation as Prometheus' histogram_quantile() does, and capped at
+        # the largest value seen.
+        rank = q * series['count']
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, series['buckets']):
+            if count > 0 and cumulative + count >= rank:
+                return min(lower + (bound - lower) * (rank - cumulative) / count, series['max'])
+            cumulative += count
+            lower = bound
+        return series['max']
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['buckets']):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{format_labels(self.labels, labels, {"le": bound})} {cumulative}')
+            lines.append(f'{self.name}_bucket{format_labels(self.labels, labels, {"le": "+Inf"})} {series["count"]}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, labels)} {series["sum"]}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, labels)} {series["count"]}')
+        return lines
+
+class Counter(object):
+    def __init__(self, **kwargs):
+        self.name = kwargs.get('name')
+        self.help = kwargs.get('help', '')
+        self.labels = kwargs.get('labels', None) or []
+        self.lock = Lock()
+        self.series = {}
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.series)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.snapshot().items()):
+            lines.append(f'{self.name}{format_labels(self.labels, labels)} {value}')
+        return lines
+
+def histogram(name=None, help=None, labels=None, buckets=None):
+    with lock:
+        if not name in registered:
+            registered[name] = Histogram(name=name, help=help, labels=labels, buckets=buckets)
+        return registered[name]
+
+def counter(name=None, help=None, labels=None):
+    with lock:
+        if not name in registered:
+            registered[name] = Counter(name=name, help=help, labels=labels)
+        return registered[name]
+
+def register_stats(name=None, function=None):
+    # function returns a dict of numbers, each reported as the gauge
+    # <name>_<key>. Registering the same name again replaces the function, so
+    # a reloaded plugin doesn't leave its old instance behind.
+    with lock:
+        collectors[name] = function
+
+def unregister_stats(name=None):
+    with lock:
+        collectors.pop(name, None)
+
+def gauges():
+    with lock:
+        functions = dict(collectors)
+    output = {}
+    for name, function in sorted(functions.items()):
+        try:
+            for key, value in function().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    output[f'{name}_{key}'] = value
+        except Exception as e:
+            logging.error(f'Failed to collect the {name} stats: {e}')
+    return output
+
+def render():
+    with lock:
+        metrics = [registered[name] for name in sorted(registered.keys())]
+    lines = []
+    for metric in metrics:
+        lines += metric.render()
+    for name, value in gauges().items():
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+def timings(pattern=None):
+    # Rows for the stats command: one per histogram series, in milliseconds.
+    with lock:
+        metrics = [registered[name] for name in sorted(registered.keys()) if isinstance(registered[name], Histogram)]
+    rows = []
+    for metric in metrics:
+        for labels, series in sorted(metric.snapshot().items()):
+            label = ','.join([str(value) for value in labels])
+            if pattern and not pattern in metric.name and not pattern in label:
+                continue
+            rows.append([
+                metric.name.replace('swagbot_', '', 1),
+                label,
+                series['count'],
+                f'{series["sum"] / series["count"] * 1000:.1f}' if series['count'] > 0 else '',
+                f'{metric.quantile(series=series, q=0.5) * 1000:.1f}',
+                f'{metric.quantile(series=series, q=0.95) * 1000:.1f}',
+                f'{metric.quantile(series=series, q=0.99) * 1000:.1f}',
+                f'{series["max"] * 1000:.1f}',
+            ])
+    return rows
+
+def values(pattern=None):
+    # Rows for the stats command: one per counter series and gauge.
+    with lock:
+        metrics = [registered[name] for name in sorted(registered.keys()) if isinstance(registered[name], Counter)]
+    rows = []
+    for metric in metrics:
+        for labels, value in sorted(metric.snapshot().items()):
+            label = ','.join([str(value) for value in labels])
+            if pattern and not pattern in metric.name and not pattern in label:
+                continue
+            rows.append([metric.name.replace('swagbot_', '', 1), label, value])
+    for name, value in gauges().items():
+        if pattern and not pattern in name:
+            continue
+        rows.append([name.replace('swagbot_', '', 1), '', f'{value:.4f}' if isinstance(value, float) else value])
+    return rows
+
+def track_calls():
+    # Starts counting the database, HTTP, and Slack calls made by the current
+    # thread. The load-test harness uses this to attribute calls to commands.
+    calls.counts = {'db': 0, 'http': 0, 'slack': 0}
+
+def tracked_calls():
+    counts = getattr(calls, 'counts', None)
+    calls.counts = None
+    return counts or {'db': 0, 'http': 0, 'slack': 0}
+
+def current_calls():
+    # The counts the current thread is tracking, or None. Work handed off to
+    # another thread, e.g., queued outbound messages, carries them along and
+    # passes them to resume_calls() so its calls count toward the same command.
+    return getattr(calls, 'counts', None)
+
+def resume_calls(counts=None):
+    calls.counts = counts
+
+def count_call(kind=None):
+    counts = getattr(calls, 'counts', None)
+    if counts is not None:
+        counts[kind] += 1
+
+def instrument_dao(module=None):
+    # Called with __name__ at the bottom of each module in swagbot/database to
+    # time every public function it defines, e.g., core.get_user_by_id.
+    namespace = sys.modules[module].__dict__
+    prefix = module.rsplit('.', 1)[-1]
+    for name, value in list(namespace.items()):
+        if inspect.isfunction(value) and value.__module__ == module and not name.startswith('_'):
+            namespace[name] = __timed(function=value, labels=(f'{prefix}.{name}',))
+
+def __timed(function=None, labels=None):
+    # Only the outermost call is counted and timed, since DAO functions that
+    # call other DAO functions would otherwise be counted more than once.
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        depth = getattr(calls, 'depth', 0)
+        if depth == 0:
+            count_call(kind='db')
+        calls.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            calls.depth = depth
+            if depth == 0:
+                db_seconds.observe(labels=labels, value=time.perf_counter() - start)
+    return wrapper
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(config=None):
+    global server
+    config = config or {}
+    port = config.get('port', None)
+    if not port or server is not None:
+        return
+    address = config.get('address', '127.0.0.1')
+    try:
+        server = ThreadingHTTPServer((address, port), MetricsHandler)
+        server.daemon_threads = True
+    except Exception as e:
+        logging.error(f'Failed to start the metrics endpoint on {address}:{port}: {e}')
+        server = None
+        return
+    thread = Thread(
+        name='metrics',
+        target=server.serve_forever,
+        daemon=True
+    )
+    thread.start()
+    logging.info(f'Serving metrics on http://{address}:{port}/metrics.')
+
+def stop_server():
+    global server
+    if server is None:
+        return
+    server.shutdown()
+    server.server_close()
+    server = None
+
+command_seconds = histogram(name='swagbot_command_seconds', help='Time taken to run a command.', labels=['command'])
+command_failures = counter(name='swagbot_command_failures_total', help='Commands that raised an exception.', labels=['command'])
+command_wait_seconds = histogram(name='swagbot_command_wait_seconds', help='Time commands spent in the dispatch queue.', labels=['lane'])
+db_seconds = histogram(name='swagbot_db_query_seconds', help='Time taken by each database function.', labels=['function'])
+http_seconds = histogram(name='swagbot_http_request_seconds', help='Time taken by outbound HTTP requests, including retries.', labels=['host'])
+http_responses = counter(name='swagbot_http_responses_total', help='Outbound HTTP responses by status code.', labels=['host', 'status'])
+slack_seconds = histogram(name='swagbot_slack_api_seconds', help='Time taken by Slack API calls.', labels=['method'])
+slack_errors = counter(name='swagbot_slack_api_errors_total', help='Slack API calls that returned an error.', labels=['method', 'error'])
+job_seconds = histogram(name='swagbot_job_seconds', help='Time taken to run a scheduled job.', labels=['job'])
+job_failures = counter(name='swagbot_job_failures_total', help='Scheduled job runs that failed.', labels=['job'])
+sync_rows = counter(name='swagbot_sync_rows_total', help='Users and channels written by the directory sync.', labels=['table'])
@@ -0,0 +1,191 @@
+# Outbound messages are queued per channel and delivered by a background thread
+# so command handlers never wait on Slack. Each channel has its own token bucket
+# matching Slack's guidance of about one message per second per channel, runs
+# of queued messages for a channel are coalesced into a single post, and a 429
+# pauses the channel for the Retry-After period before the message is retried.
+# File uploads go through the same queues so they stay in order with messages.
+from collections import deque, OrderedDict
+from slack_sdk.errors import SlackApiError
+from swagbot.utils.ratelimit import TokenBucket
+from threading import Condition, Thread
+import logging
+import swagbot.metrics as metrics
+import time
+
+class Sender(object):
+    def __init__(self, **kwargs):
+        self.name = kwargs.get('name', 'outbound')
+        self.rate = kwargs.get('rate', 1)
+        self.burst = kwargs.get('burst', 3)
+        self.coalesce_limit = kwargs.get('coalesce_limit', 4000)
+        self.max_attempts = kwargs.get('max_attempts', 5)
+        self.condition = Condition()
+        self.queues = OrderedDict()
+        self.buckets = {}
+        self.not_before = {}
+        self.in_flight = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.sender_thread = None
+        self.thread_started = False
+
+    def configure(self, config=None):
+        config = config or {}
+        self.rate = config.get('rate', self.rate)
+        self.burst = config.get('burst', self.burst)
+        self.coalesce_limit = config.get('coalesce_limit', self.coalesce_limit)
+        self.max_attempts = config.get('max_attempts', self.max_attempts)
+
+    def send(self, client=None, channel=None, text=None):
+        self.__enqueue(channel=channel, item=('message', client, text, 0, metrics.current_calls()))
+
+    def upload(self, client=None, channel=None, content=None, filename=None, title=None):
+        self.__enqueue(channel=channel, item=('upload', client, {'content': content, 'filename': filename, 'title': title}, 0, metrics.current_calls()))
+
+    def __enqueue(self, channel=None, item=None):
+        if not self.thread_started:
+            self.__deliver(channel, *item)
+            return
+        with self.condition:
+            self.queues.setdefault(channel, deque()).append(item)
+            self.condition.notify()
+
+    def __bucket(self, channel=None):
+        if not channel in self.buckets:
+            self.buckets[channel] = TokenBucket(rate=self.rate, per=1, capacity=self.burst)
+        return self.buckets[channel]
+
+    def __coalesce(self, queue=None):
+        # A combined post's Slack call is counted toward the command that
+        # queued the first message.
+        kind, client, text, attempts, counts = queue.popleft()
+        if kind != 'message':
+            return kind, client, text, attempts, counts
+        while len(queue) > 0:
+            next_kind, next_client, next_text, next_attempts, _ = queue[0]
+            if next_kind != 'message' or next_client is not client or len(text) + len(next_text) + 1 > self.coalesce_limit:
+                break
+            queue.popleft()
+            text = f'{text}\n{next_text}'
+            attempts = max(attempts, next_attempts)
+        return kind, client, text, attempts, counts
+
+    def __next(self):
+        # Called with the condition held. Returns the next message that may be
+        # sent, or the number of seconds until one can be.
+        now = time.monotonic()
+        wait = None
+        for channel in list(self.queues.keys()):
+            queue = self.queues[channel]
+            if len(queue) == 0:
+                del self.queues[channel]
+                continue
+            delay = self.not_before.get(channel, 0) - now
+            if delay <= 0:
+                delay = self.__bucket(channel=channel).try_acquire()
+            if delay <= 0:
+                # Move the channel to the back so busy channels take turns.
+                self.queues.move_to_end(channel)
+                return (channel, *self.__coalesce(queue=queue)), None
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    def sender(self):
+        while True:
+            with self.condition:
+                item = None
+                while item is None:
+                    if not self.thread_started and len(self.queues) == 0:
+                        return
+                    item, wait = self.__next()
+                    if item is None:
+                        self.condition.wait(timeout=wait)
+                self.in_flight += 1
+            try:
+                metrics.resume_calls(counts=item[-1])
+                self.__post(*item)
+            finally:
+                metrics.resume_calls(counts=None)
+                with self.condition:
+                    self.in_flight -= 1
+                    self.condition.notify_all()
+
+    def __deliver(self, channel=None, kind=None, client=None, payload=None, attempts=0, counts=None):
+        if kind == 'upload':
+            client.files_upload_v2(channel=channel, **payload)
+        else:
+            client.chat_postMessage(channel=channel, text=payload)
+
+    def __post(self, channel=None, kind=None, client=None, payload=None, attempts=0, counts=None):
+        try:
+            self.__deliver(channel, kind, client, payload, attempts, counts)
+            with self.condition:
+                self.sent += 1
+        except SlackApiError as e:
+            if e.response.status_code == 429 and attempts + 1 < self.max_attempts:
+                retry_after = int(e.response.headers.get('Retry-After', 1))
+                logging.warning(f'Rate limited while sending to {channel}. Retrying in {retry_after} seconds.')
+                with self.condition:
+                    self.retried += 1
+                    self.not_before[channel] = time.monotonic() + retry_after
+                    self.queues.setdefault(channel, deque()).appendleft((kind, client, payload, attempts + 1, counts))
+            else:
+                with self.condition:
+                    self.failed += 1
+                logging.error(f'Failed to send a message to {channel}: {e.response["error"]}')
+        except Exception as e:
+            with self.condition:
+                self.failed += 1
+            logging.error(f'Failed to send a message to {channel}: {e}')
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while len(self.queues) > 0 or self.in_flight > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(timeout=remaining)
+        return True
+
+    def start(self, config=None):
+        if self.thread_started:
+            return
+        self.configure(config=config)
+        self.thread_started = True
+        self.sender_thread = Thread(
+            name=self.name,
+            target=self.sender,
+            daemon=True
+        )
+        self.sender_thread.start()
+        logging.info(f'Started the outbound message queue at {self.rate} messages per second per channel.')
+
+    def stop(self, timeout=10):
+        if not self.thread_started:
+            return
+        logging.info('Stopping the outbound message queue.')
+        with self.condition:
+            self.thread_started = False
+            self.condition.notify_all()
+        self.sender_thread.join(timeout=timeout)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'queued': sum([len(queue) for queue in self.queues.values()]),
+                'channels': len(self.queues),
+                'in_flight': self.in_flight,
+                'sent': self.sent,
+                'retried': self.retried,
+                'failed': self.failed,
+            }
+
+sender = Sender()
+
+def send(client=None, channel=None, text=None):
+    sender.send(client=client, channel=channel, text=text)
+
+def upload(client=None, channel=None, content=None, filename=None, title=None):
+    sender.upload(client=client, channel=channel, content=content, filename=filename, title=title)
@@ -1,15 +1,18 @@
 from cpuinfo import get_cpu_info
 from datetime import datetime
 from slack_sdk.errors import SlackApiError
-from swagbot.core import BasePlugin
+from swagbot.core import ArgumentParser, BasePlugin
 import argparse
 import logging
 import os
 import platform
 import psutil
 import re
+import swagbot.auth as auth
 import swagbot.database.core as db
 import swagbot.globals as globals
+import swagbot.metrics as metrics
+import swagbot.registry as registry
 import swagbot.utils.core as utils
 import swagbot.utils.scheduler as scheduler_utils
 import sys
@@ -47,6 +50,7 @@ class Plugin(BasePlugin):
                 'cpu_usage': '%.2f%%' % float(process.cpu_percent()),
                 'memory_usage': '%.2f%%' % float(process.memory_percent()),
                 'status': process.status(),
+                'command_queue': '{depth} queued, {average_wait:.3f}s average wait, {max_wait:.3f}s max wait'.format(**globals.bot.dispatcher.stats()),
             }
             length = 0
             for item in messages_dict.keys():
@@ -72,19 +76,16 @@ class Plugin(BasePlugin):
             self.send_plain(command.event.channel, 'Oops! I was not able to find any available greetings.')
 
     def help(self, command=None):
-        admininfo = db.get_admin_by_id(id=command.event.user)
-        is_admin = 1 if admininfo else 0
-
         command.argv.pop(0)
         help_command = command.argv[0] if len(command.argv) == 1 else None # Account for invalid input
         if help_command:
-            command_info = db.command_lookup(command=help_command)
-            if command_info and command_info['enabled']:
+            command_info = registry.lookup(command=help_command)
+            if command_info and command_info['enabled'] and auth.is_authorized(user=command.event.user, command=command_info):
                 self.send_monospace(command.event.channel, command_info['usage'])
             else:
                 self.send_plain(command.event.channel, f'No help found for `{help_command}`.')
         else:
-            commands = db.help(is_admin=is_admin)
+            commands = [bot_command for bot_command in registry.visible() if auth.is_authorized(user=command.event.user, command=bot_command)]
             if commands:
                 help_output = []
                 if command.message_type == 'private':
@@ -111,7 +112,7 @@ class Plugin(BasePlugin):
         command.argv.pop(0)
         name = command.argv[0]
         if name:
-            userinfo = db.get_seen(username=name)
+            userinfo = globals.bot.seen.get_seen(username=name)
             if userinfo:
                 self.send_plain(command.event.channel, f'<@{name}> was last seen at {utils.ts_to_human(userinfo["seen_time"])}.')
             else:
@@ -149,15 +150,10 @@ class Plugin(BasePlugin):
 ###############################################################################
 
     def jobs(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.jobs_parser.parse_args()
+            args = self.parse_args(parser=self.jobs_parser, argv=command.argv)
         except:
-            if sys.argv[1] in help:
-                self.send_monospace(command.event.channel, help[sys.argv[1]])
-            else:
-                self.send_monospace(command.event.channel, self.jobs_parser.format_help().rstrip())
+            self.send_monospace(command.event.channel, self.jobs_parser.format_help().rstrip())
             return
 
         if args.enable:
@@ -170,16 +166,32 @@ class Plugin(BasePlugin):
             output = scheduler_utils.run(id=args.run)
             self.send_plain(command.event.channel, output)
         else:
-            output = job_list = scheduler_utils.list()
+            job_list = scheduler_utils.list()
             if job_list:
                 if len(job_list) > 0:
-                    for chunk in job_list:
-                        self.send_monospace(command.event.channel, chunk)
+                    self.send_table(command.event.channel, headers=scheduler_utils.list_headers, data=job_list, command=command)
                 else:
                     self.send_plain(command.event.channel, 'No scheduled jobs found.')
             else:
                 self.send_plain(command.event.channel, 'An error occurred when trying to fetch the scheduled job list.')
 
+    def stats(self, command=None):
+        try:
+            args = self.parse_args(parser=self.stats_parser, argv=command.argv)
+        except:
+            self.send_monospace(command.event.channel, self.stats_parser.format_help().rstrip())
+            return
+
+        timings = metrics.timings(pattern=args.filter)
+        values = metrics.values(pattern=args.filter)
+        if len(timings) == 0 and len(values) == 0:
+            self.send_plain(command.event.channel, 'No metrics have been recorded yet.')
+            return
+        if len(timings) > 0:
+            self.send_table(command.event.channel, headers=['Metric', 'Labels', 'Count', 'Avg ms', 'p50 ms', 'p95 ms', 'p99 ms', 'Max ms'], data=timings, command=command)
+        if len(values) > 0:
+            self.send_table(command.event.channel, headers=['Metric', 'Labels', 'Value'], data=values, command=command)
+
     def reload(self, command=None):
         reload_output = []
         reload_output.append('before:')
@@ -198,10 +210,8 @@ class Plugin(BasePlugin):
         globals.ready_time = utils.now()
 
     def admins(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.admins_parser.parse_args()
+            args = self.parse_args(parser=self.admins_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.admins_parser.format_help().rstrip())
             return
@@ -236,20 +246,18 @@ class Plugin(BasePlugin):
             results = db.admin_list()
             if results and len(results) > 0:
                 admins = [[item['real_name'], item['name']] for item in results]
-                self.send_monospace(command.event.channel, utils.generate_table(headers=['Name', 'Username'], data=admins))
+                self.send_table(command.event.channel, headers=['Name', 'Username'], data=admins, command=command)
             else:
                 self.send_plain(command.event.channel, 'Uh oh! No admins found.')
 
     def commands(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.commands_parser.parse_args()
+            args = self.parse_args(parser=self.commands_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.commands_parser.format_help().rstrip())
             return
         if args.enable:
-            to_enable = db.command_lookup(command=args.enable)
+            to_enable = registry.lookup(command=args.enable)
             if to_enable:
                 if to_enable['enabled'] == 0:
                     success = db.enable_command(command=args.enable)
@@ -262,7 +270,7 @@ class Plugin(BasePlugin):
             else:
                 self.send_plain(command.event.channel, f'The command `{args.enable}` was not found.')
         elif args.disable:
-            to_disable = db.command_lookup(command=args.disable)
+            to_disable = registry.lookup(command=args.disable)
             if to_disable:
                 if to_disable['enabled'] == 1:
                     if to_disable['can_be_disabled'] == 0:
@@ -278,7 +286,7 @@ class Plugin(BasePlugin):
             else:
                 self.send_plain(command.event.channel, f'The command `{args.disable}` was not found.')
         elif args.hide:
-            to_hide = db.command_lookup(command=args.hide)
+            to_hide = registry.lookup(command=args.hide)
             if to_hide:
                 if not to_hide['hidden'] == 1:
                     db.hide_command(command=args.hide)
@@ -288,7 +296,7 @@ class Plugin(BasePlugin):
             else:
                 self.send_plain(command.event.channel, f'The command `{args.hide}` was not found.')
         elif args.unhide:
-            to_unhide = db.command_lookup(command=args.unhide)
+            to_unhide = registry.lookup(command=args.unhide)
             if to_unhide:
                 if to_unhide['hidden'] == 1:
                     db.unhide_command(command=args.unhide)
@@ -305,10 +313,8 @@ class Plugin(BasePlugin):
 ###############################################################################
 
     def modules(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.modules_parser.parse_args()
+            args = self.parse_args(parser=self.modules_parser, argv=command.argv)
         except:
                 self.send_monospace(command.event.channel, self.modules_parser.format_help().rstrip())
                 return
@@ -321,7 +327,8 @@ class Plugin(BasePlugin):
                     if args.disable in sys.modules:
                         self.send_plain(command.event.channel, f'The module `{args.disable}` is already loaded.')
                     else:
-                        message = utils.load_module(module=args.enable, client=self.client)
+                        with utils.plugin_lock:
+                            message = utils.load_module(module=args.enable, client=self.client)
                         self.send_plain(command.event.channel, message)
                         if db.module_is_enabled(module=args.enable):
                             commands = db.module_commands(module=args.enable)
@@ -348,7 +355,8 @@ class Plugin(BasePlugin):
 
                     db.disable_module(module=args.disable)
                     if not db.module_is_enabled(module=args.disable):
-                        del globals.plugins[args.disable]
+                        globals.plugins.pop(args.disable, None)
+                        registry.unregister(module=args.disable)
                         commands = db.module_commands(module=args.disable)
                         utils.prune_commands_table()
                         self.send_plain(command.event.channel, f'The module `{args.disable}` was successfully disabled.')
@@ -365,8 +373,8 @@ class Plugin(BasePlugin):
         else:
             results = db.module_list()
             if results and len(results) > 0:
-                modules = [[item['module'], 'Enabled' if item['enabled'] == 1 else 'Disabled'] for item in results]
-                self.send_monospace(command.event.channel, utils.generate_table(headers=['Module', 'Status'], data=modules))
+                modules = [[item['module'], 'Enabled' if item['enabled'] == 1 else 'Disabled', utils.plugin_state(module=item['module'])] for item in results]
+                self.send_table(command.event.channel, headers=['Module', 'Status', 'State'], data=modules, command=command)
             else:
                 self.send_plain(command.event.channel, 'Uh oh! No modules found.')
 
@@ -383,13 +391,11 @@ class Plugin(BasePlugin):
                 for choice, subparser in action.choices.items():
                     help[choice] = subparser.format_help()
 
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.channels_parser.parse_args()
+            args = self.parse_args(parser=self.channels_parser, argv=command.argv)
         except:
-            if sys.argv[1] in help:
-                self.send_monospace(command.event.channel, help[sys.argv[1]])
+            if len(command.argv) > 1 and command.argv[1] in help:
+                self.send_monospace(command.event.channel, help[command.argv[1]])
             else:
                 self.send_monospace(command.event.channel, self.channels_parser.format_help().rstrip())
             return
@@ -510,12 +516,8 @@ class Plugin(BasePlugin):
     def channels_purpose(self, args, command):
         pass
         # Need a function to better handle verification
-        sys.argv = command.argv[0:4]
-        sys.argv.append(' '.join(command.argv[4:]))
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.purpose_parser.parse_args()
+            args = self.parse_args(parser=self.purpose_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.kick_parser.format_help().rstrip())
             return
@@ -541,14 +543,11 @@ class Plugin(BasePlugin):
 
     def channels_topic(self, args, command):
         pprint(args)
-        pprint(sys.argv)
         pass
         # Need a function to better handle verification
-        sys.argv = command.argv[0:4]
-        sys.argv.append(' '.join(command.argv[4:]))
+        argv = command.argv[0:4] + [' '.join(command.argv[4:])]
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.topic_parser.parse_args()
+            args = self.parse_args(parser=self.topic_parser, argv=argv)
         except:
             self.send_plain(command.event.channel, self.topic_parser.format_help().rstrip())
             return
@@ -573,11 +572,8 @@ class Plugin(BasePlugin):
             self.send_plain(command.event.channel, f'Channel `{args.channel}` not found. If this is a valid channel, please contact a bot administrator.')
 
     def whisper(self, command=None):
-        sys.argv = command.argv
-        pprint(sys.argv)
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.whisper_parser.parse_args()
+            args = self.parse_args(parser=self.whisper_parser, argv=command.argv)
         except:
             self.send_plain(command.event.channel, self.whisper_parser.format_help().rstrip())
             return
@@ -598,16 +594,16 @@ class Plugin(BasePlugin):
             logging.error(f'Failed to whisper to {args.username}: {e.response.data["error"]}')
         
     def __configure_parsers(self):
-        self.about_parser = argparse.ArgumentParser(add_help=False, prog='about', description='Display information about this bot.')
+        self.about_parser = ArgumentParser(add_help=False, prog='about', description='Display information about this bot.')
         self.about_parser.set_defaults(func=self.about)
 
         # Admins
-        self.admins_parser = argparse.ArgumentParser(add_help=False, prog='admins', description='List bot admins, grant or revoke admin access.')
+        self.admins_parser = ArgumentParser(add_help=False, prog='admins', description='List bot admins, grant or revoke admin access.')
         self.admins_parser.add_argument('-g', '--grant', help='Grant admin access to a user.', metavar='<username>', action='store')
         self.admins_parser.add_argument('-r', '--revoke', help='Revoke admin access from a user.', metavar='<username>', action='store')
 
         # Channels
-        self.channels_parser = argparse.ArgumentParser(add_help=False, prog='channels', description='Join a channel, leave a channel, invite a user to a channel, set a channel\'s topic or purpose.', epilog='Use "channels <subcommand> --help" for help with subcommands.')
+        self.channels_parser = ArgumentParser(add_help=False, prog='channels', description='Join a channel, leave a channel, invite a user to a channel, set a channel\'s topic or purpose.', epilog='Use "channels <subcommand> --help" for help with subcommands.')
         self.channels_parser.set_defaults(func=self.channels)
         subparsers = self.channels_parser.add_subparsers(help='Sub-command help')
 
@@ -640,43 +636,47 @@ class Plugin(BasePlugin):
         parser_channels_topic.set_defaults(func=self.channels_purpose)
 
         # Commands
-        self.commands_parser = argparse.ArgumentParser(add_help=False, prog='commands', description='Enable, disable, hide, or unhide a bot command.')
+        self.commands_parser = ArgumentParser(add_help=False, prog='commands', description='Enable, disable, hide, or unhide a bot command.')
         self.commands_parser.add_argument('-e', '--enable', help='Enable a bot command.', metavar='<command>', action='store')
         self.commands_parser.add_argument('-d', '--disable', help='Disable a bot command.', metavar='<command>', action='store')
         self.commands_parser.add_argument('-h', '--hide', help='Hide a bot command.', metavar='<command>', action='store')
         self.commands_parser.add_argument('-u', '--unhide', help='Unhide a bot command.', metavar='<command>', action='store')
 
-        self.greeting_parser = argparse.ArgumentParser(add_help=False, prog='greeting', description='Learn how to greet someone in a random language or specify a language to see how to greet someone.')
+        self.greeting_parser = ArgumentParser(add_help=False, prog='greeting', description='Learn how to greet someone in a random language or specify a language to see how to greet someone.')
         self.greeting_parser.set_defaults(func=self.greeting)
 
-        self.help_parser = argparse.ArgumentParser(add_help=False, prog='help', description='Display a list of commands or usage for a specific command.')
+        self.help_parser = ArgumentParser(add_help=False, prog='help', description='Display a list of commands or usage for a specific command.')
         self.help_parser.set_defaults(func=self.help)
 
         # Jobs
-        self.jobs_parser = argparse.ArgumentParser(add_help=False, prog='jobs', description='Manage the SwagBot job scheduler. Use "jobs" without arguments to list scheduled jobs.')
+        self.jobs_parser = ArgumentParser(add_help=False, prog='jobs', description='Manage the SwagBot job scheduler. Use "jobs" without arguments to list scheduled jobs.')
         self.jobs_parser.add_argument('-e', '--enable', help='The ID of the job to enable.', metavar='<id>', action='store')
         self.jobs_parser.add_argument('-d', '--disable', help='The ID of the job to disable.', metavar='<id>', action='store')
         self.jobs_parser.add_argument('-r', '--run', help='The ID of the job to run.', metavar='<id>', action='store')
         self.jobs_parser.set_defaults(func=self.jobs)
 
         # Modules
-        self.modules_parser = argparse.ArgumentParser(add_help=False, prog='modules', description='List, enable, or disable bot modules. Use "modules" without arguments to list modules.')
+        self.modules_parser = ArgumentParser(add_help=False, prog='modules', description='List, enable, or disable bot modules. Use "modules" without arguments to list modules.')
         self.modules_parser.add_argument('-e', '--enable', help='Enable a module and all of its commands.', metavar='<module>', action='store')
         self.modules_parser.add_argument('-d', '--disable', help='Disablea module and all of its commands.', metavar='<modules>', action='store')
 
-        self.reload_parser = argparse.ArgumentParser(add_help=False, prog='reload', description='Reload all confiugred modules.')
+        self.reload_parser = ArgumentParser(add_help=False, prog='reload', description='Reload all confiugred modules.')
         self.reload_parser.set_defaults(func=self.reload)
 
-        self.seen_parser = argparse.ArgumentParser(add_help=False, prog='seen', description='Show when <username> was last seen.')
+        self.seen_parser = ArgumentParser(add_help=False, prog='seen', description='Show when <username> was last seen.')
         self.seen_parser.set_defaults(func=self.seen)
 
-        self.time_parser = argparse.ArgumentParser(add_help=False, prog='time', description='Display the current local time.')
+        self.stats_parser = ArgumentParser(add_help=False, prog='stats', description='Display timings and counters for commands, database queries, HTTP requests, Slack API calls, and scheduled jobs.')
+        self.stats_parser.add_argument('-f', '--filter', help='Only show metrics whose name or labels contain <pattern>.', metavar='<pattern>', action='store')
+        self.stats_parser.set_defaults(func=self.stats)
+
+        self.time_parser = ArgumentParser(add_help=False, prog='time', description='Display the current local time.')
         self.time_parser.set_defaults(func=self.time)
 
-        self.uptime_parser = argparse.ArgumentParser(add_help=False, prog='uptime', description='Display the bot\'s uptime.')
+        self.uptime_parser = ArgumentParser(add_help=False, prog='uptime', description='Display the bot\'s uptime.')
         self.uptime_parser.set_defaults(func=self.uptime)
 
-        self.whisper_parser = argparse.ArgumentParser(add_help=False, prog='whisper', description='Ask the bot to whisper something to another user.')
+        self.whisper_parser = ArgumentParser(add_help=False, prog='whisper', description='Ask the bot to whisper something to another user.')
         self.whisper_parser.add_argument('-u', '--username', help='The username to whisper to.', metavar='<username>', required=True, action='store') 
         self.whisper_parser.add_argument('-m', '--message', help='The message to whisper to <user>.', metavar='<message>', required=True, action='store')
 
@@ -701,6 +701,7 @@ class Plugin(BasePlugin):
                 'hidden': 0,
                 'monospace': 0,
                 'split_output': 0,
+                'priority': 10,
             },
             'help': {
                 'description': self.help_parser.description,
@@ -711,6 +712,7 @@ class Plugin(BasePlugin):
                 'hidden': 0,
                 'monospace': 1,
                 'split_output': 0,
+                'priority': 10,
             },
             'seen': {
                 'description': self.seen_parser.description,
@@ -721,6 +723,7 @@ class Plugin(BasePlugin):
                 'hidden': 0,
                 'monospace': 0,
                 'split_output': 0,
+                'priority': 10,
             },
             'time': {
                 'description': self.time_parser.description,
@@ -729,7 +732,8 @@ class Plugin(BasePlugin):
                 'type': 'all',
                 'can_be_disabled': 1,
                 'hidden': 0,
-                'monospace': 0
+                'monospace': 0,
+                'priority': 10,
             },
             'uptime': {
                 'description': self.uptime_parser.description,
@@ -740,6 +744,7 @@ class Plugin(BasePlugin):
                 'hidden': 0,
                 'monospace': 1,
                 'split_output': 0,
+                'priority': 10,
             },
             'commands': {
                 'description': self.commands_parser.description,
@@ -789,7 +794,17 @@ class Plugin(BasePlugin):
                 'can_be_disabled': 1,
                 'hidden': 0,
                 'monospace': 1,
-                'split_output': 0,
+                'split_output': 1,
+            },
+            'stats': {
+                'description': self.stats_parser.description,
+                'usage': self.stats_parser.format_help().rstrip(),
+                'is_admin': 1,
+                'type': 'all',
+                'can_be_disabled': 1,
+                'hidden': 0,
+                'monospace': 1,
+                'split_output': 1,
             },
             'reload': {
                 'description': self.reload_parser.description,
@@ -1,5 +1,7 @@
-from swagbot.core import BasePlugin
-import argparse
+from concurrent.futures import ThreadPoolExecutor
+from swagbot.cache import Cache
+from swagbot.core import ArgumentParser, BasePlugin
+from swagbot.utils.ratelimit import TokenBucket
 import datetime
 import logging
 import os
@@ -8,11 +10,26 @@ import random
 import re
 import swagbot.database.extras as db
 import swagbot.globals as globals
+import swagbot.metrics as metrics
 import swagbot.request as request
 import swagbot.utils.core as utils
-import sys
 import time
 
+# Seconds to cache each command's API responses unless overridden by cache.ttl
+# in swagbot.plugins.extras.yml.
+cache_ttls = {
+    'crypto': 60,
+    'currency': 300,
+    'dict': 86400,
+    'quakes': 120,
+    'stocks': 300,
+    'weather': 600,
+}
+
+def alphavantage_cacheable(response):
+    # AlphaVantage reports errors and exceeded quotas with a 200.
+    return not ('Error Message' in response or 'Note' in response or 'Information' in response)
+
 class Plugin(BasePlugin):
     def __init__(self, client):
         self.__configure_parsers()
@@ -26,11 +43,27 @@ class Plugin(BasePlugin):
         self.openweathermap_key = self.config['keys'].get('openweathermap', None)
         self.wordnik_key = self.config['keys'].get('wordnik', None)
 
+        # AlphaVantage enforces a per-minute quota across all of its endpoints,
+        # so crypto, currency, and stocks share a single limiter.
+        alphavantage_config = self.config.get('alphavantage', None) or {}
+        self.alphavantage_wait = alphavantage_config.get('max_wait', 60)
+        self.alphavantage_limiter = TokenBucket(rate=alphavantage_config.get('requests_per_minute', 5), per=60)
+        stocks_config = self.config.get('stocks', None) or {}
+        self.stocks_concurrency = stocks_config.get('concurrency', 4)
+
+        cache_config = self.config.get('cache', None) or {}
+        self.cache = Cache(
+            name='extras',
+            size=cache_config.get('size', 1000),
+            default_ttl=cache_config.get('default_ttl', 300),
+            ttls={**cache_ttls, **(cache_config.get('ttl', None) or {})},
+            path=os.path.join(globals.config_root, 'swagbot.plugins.extras.cache.db') if cache_config.get('persist', False) else None,
+        )
+        metrics.register_stats(name='swagbot_cache_extras', function=self.cache.stats)
+
     def apg(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.apg_parser.parse_args()
+            args = self.parse_args(parser=self.apg_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.apg_parser.format_help().rstrip())
             return
@@ -97,10 +130,8 @@ class Plugin(BasePlugin):
             self.send_plain(command.event.channel, 'No question specified.')
 
     def bytes(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.bytes_parser.parse_args()
+            args = self.parse_args(parser=self.bytes_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.bytes_parser.format_help().rstrip())
             return
@@ -149,7 +180,7 @@ class Plugin(BasePlugin):
                     ])
 
         if len(output) > 0:
-            self.send_monospace(command.event.channel, utils.generate_table(headers=['Amount', 'Unit'], data=output))
+            self.send_table(command.event.channel, headers=['Amount', 'Unit'], data=output, command=command)
         else:
             self.send_plain(command.event.channel, 'Hmmm something went wrong.')
 
@@ -174,10 +205,8 @@ class Plugin(BasePlugin):
             self.send_plain(command.event.channel, f'No input specified.')
 
     def crypto(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.crypto_parser.parse_args()
+            args = self.parse_args(parser=self.crypto_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.crypto_parser.format_help().rstrip())
         
@@ -199,18 +228,19 @@ class Plugin(BasePlugin):
             'to_currency': to_code,
             'apikey': self.alphavantage_key,
         }
-        request.get(self, uri=uri, qs=qs)
-        if 'Realtime Currency Exchange Rate' in self.response:
-            to_amount = round(float(args.amount) * float(self.response['Realtime Currency Exchange Rate']['5. Exchange Rate']), 2)
+        res = request.Response()
+        if not self.__cached_get(client=res, name='crypto', uri=uri, qs=qs, cacheable=alphavantage_cacheable, limiter=self.alphavantage_limiter):
+            self.send_plain(command.event.channel, 'The AlphaVantage rate limit has been reached. Try again later.')
+            return
+        if 'Realtime Currency Exchange Rate' in res.response:
+            to_amount = round(float(args.amount) * float(res.response['Realtime Currency Exchange Rate']['5. Exchange Rate']), 2)
             self.send_plain(command.event.channel, f'{args.amount} {from_code} = {to_amount} {to_code}')
         else:
             self.send_plain(command.event.channel, 'Incomplete data received.')
 
     def currency(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.currency_parser.parse_args()
+            args = self.parse_args(parser=self.currency_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.currency_parser.format_help().rstrip())
             return
@@ -236,18 +266,19 @@ class Plugin(BasePlugin):
                 'to_currency': to_code,
                 'apikey': self.alphavantage_key,
             }
-            request.get(self, uri=uri, qs=qs)
-            if 'Realtime Currency Exchange Rate' in self.response:
-                to_amount = round(float(args.amount) * float(self.response['Realtime Currency Exchange Rate']['5. Exchange Rate']), 2)
+            res = request.Response()
+            if not self.__cached_get(client=res, name='currency', uri=uri, qs=qs, cacheable=alphavantage_cacheable, limiter=self.alphavantage_limiter):
+                self.send_plain(command.event.channel, 'The AlphaVantage rate limit has been reached. Try again later.')
+                return
+            if 'Realtime Currency Exchange Rate' in res.response:
+                to_amount = round(float(args.amount) * float(res.response['Realtime Currency Exchange Rate']['5. Exchange Rate']), 2)
                 self.send_plain(command.event.channel, f'{args.amount} {from_code} = {to_amount} {to_code}')
             else:
                 self.send_plain(command.event.channel, 'Incomplete data received.')
 
     def dict(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.dict_parser.parse_args()
+            args = self.parse_args(parser=self.dict_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.dict_parser.format_help().rstrip())
             return
@@ -263,9 +294,10 @@ class Plugin(BasePlugin):
                 'sourceDictionaries': 'all',
                 'useCanonical': 'false',
             }
-            request.get(self, uri=uri, qs=qs)
-            if self.success: # Is the JSON validated in the request module? If not, do so here.
-                response = self.response['body'] if 'body' in self.response else self.response
+            res = request.Response()
+            self.__cached_get(client=res, name='dict', uri=uri, qs=qs)
+            if res.success: # Is the JSON validated in the request module? If not, do so here.
+                response = res.response['body'] if 'body' in res.response else res.response
 
                 if len(response) > 0:
                     dict_output = []
@@ -287,15 +319,14 @@ class Plugin(BasePlugin):
             self.send_plain(command.event.channel, 'I am currently unable to perform dictionary lookups. This error has been logged.')
 
     def quakes(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.quakes_parser.parse_args()
+            args = self.parse_args(parser=self.quakes_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.quakes_parser.format_help().rstrip())
             return
         
-        now = int(time.time())
+        # Round to the minute so repeated lookups share a cache key.
+        now = int(time.time()) // 60 * 60
         local_8601_start_time = datetime.datetime.fromtimestamp(now - 86400).isoformat('T', 'seconds')
         local_8601_end_time = datetime.datetime.fromtimestamp(now).isoformat('T', 'seconds')
 
@@ -308,13 +339,13 @@ class Plugin(BasePlugin):
             'minmagnitude': args.min,
             'offset': 1,
         }
-        request.get(self, uri=uri, qs=qs)
+        res = request.Response()
+        self.__cached_get(client=res, name='quakes', uri=uri, qs=qs)
 
-        if self.success:
+        if res.success:
             output = []
-            chunk_size = 20
-            if len(self.response['features']) > 0:
-                for event in self.response['features']:
+            if len(res.response['features']) > 0:
+                for event in res.response['features']:
                     location = 'Unknown' if event['properties']['place'] is None else event['properties']['place']
                     output.append([
                         datetime.datetime.fromtimestamp(event['properties']['time'] / 1000).strftime('%Y-%m-%d %H:%M:%S'),
@@ -324,62 +355,89 @@ class Plugin(BasePlugin):
                         '{:.2f}'.format(event['properties']['mag'])
                     ])
 
-                chunks = utils.array_to_chunks(output, chunk_size)
-                for chunk in list(chunks):
-                    self.send_monospace(command.event.channel, utils.generate_table(headers=['Time', 'Updated', 'Location', 'Description', 'Mag'], data=chunk))
+                self.send_table(command.event.channel, headers=['Time', 'Updated', 'Location', 'Description', 'Mag'], data=output, command=command)
             else:
                 self.send_plain(command.event.channel, 'No results found for the given criteria')
 
     def stocks(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.stocks_parser.parse_args()
+            args = self.parse_args(parser=self.stocks_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.stocks_parser.format_help().rstrip())
             return
 
-        stock_data = []
-        for symbol in args.symbol:
-            uri = 'https://www.alphavantage.co/query'
-            qs = {
-                'function': 'TIME_SERIES_INTRADAY',
-                'symbol': symbol.upper(),
-                'interval': '60min',
-                'apikey': self.alphavantage_key,
-            }
-            request.get(self, uri=uri, qs=qs)
-            # Trap this
-            # {'Error Message': 'Invalid API call. Please retry or visit the documentation '
-            #                   '(https://www.alphavantage.co/documentation/) for '
-            #                   'TIME_SERIES_INTRADAY.',
-            #  'status_code': 200,
-            #  'success': True}
-            if self.success:
-                response = self.response['body'] if 'body' in self.response else self.response
-                if 'Time Series (60min)' in response:
-                    latest = list(response['Time Series (60min)'].keys())[0]
-                    stock_data.append([
-                        symbol.upper(),
-                        latest,
-                        response['Time Series (60min)'][latest]['1. open'],
-                        response['Time Series (60min)'][latest]['2. high'],
-                        response['Time Series (60min)'][latest]['3. low'],
-                        response['Time Series (60min)'][latest]['4. close'],
-                        response['Time Series (60min)'][latest]['5. volume'],
-                    ])
-            else:
-                self.send_plain(command.event.channel, 'Uh oh! No stock data found. Try again later.')
-        if len(stock_data) > 0:
-            self.send_monospace(command.event.channel, utils.generate_table(headers=['Symbol', 'Date', 'Open', 'High', 'Low', 'Close', 'Volume'], data=stock_data))
+        # Each symbol is looked up on its own thread, limited by the concurrency
+        # cap and the AlphaVantage quota. map() returns the rows in the order
+        # the symbols were requested.
+        symbols = [symbol.upper() for symbol in args.symbol]
+        with ThreadPoolExecutor(max_workers=max(1, min(self.stocks_concurrency, len(symbols)))) as executor:
+            stock_data = list(executor.map(self.__stock_lookup, symbols))
+
+        if len([row for row in stock_data if row[2] != '']) > 0:
+            self.send_table(command.event.channel, headers=['Symbol', 'Date', 'Open', 'High', 'Low', 'Close', 'Volume'], data=stock_data, command=command)
         else:
             self.send_plain(command.event.channel, 'Uh oh! No stock data found. Try again later.')
 
+    def __stock_lookup(self, symbol=None):
+        uri = 'https://www.alphavantage.co/query'
+        qs = {
+            'function': 'TIME_SERIES_INTRADAY',
+            'symbol': symbol,
+            'interval': '60min',
+            'apikey': self.alphavantage_key,
+        }
+        res = request.Response()
+        try:
+            if not self.__cached_get(client=res, name='stocks', uri=uri, qs=qs, cacheable=alphavantage_cacheable, limiter=self.alphavantage_limiter):
+                return [symbol, 'Rate limited, try again later', '', '', '', '', '']
+        except Exception as e:
+            logging.error(f'Failed to look up the stock symbol {symbol}: {e}')
+            return [symbol, 'Request failed', '', '', '', '', '']
+
+        if not res.success:
+            return [symbol, f'Request failed ({res.response.get("status_code")})', '', '', '', '', '']
+
+        response = res.response['body'] if 'body' in res.response else res.response
+        # AlphaVantage returns a 200 with an "Error Message" for unknown symbols
+        # and a "Note" or "Information" when the quota has been exceeded.
+        if 'Time Series (60min)' in response:
+            series = response['Time Series (60min)']
+            latest = list(series.keys())[0]
+            return [
+                symbol,
+                latest,
+                series[latest]['1. open'],
+                series[latest]['2. high'],
+                series[latest]['3. low'],
+                series[latest]['4. close'],
+                series[latest]['5. volume'],
+            ]
+        elif 'Error Message' in response:
+            return [symbol, 'Unknown symbol', '', '', '', '', '']
+        elif 'Note' in response or 'Information' in response:
+            return [symbol, 'AlphaVantage quota exceeded', '', '', '', '', '']
+        return [symbol, 'No data found', '', '', '', '', '']
+
+    def __cached_get(self, client=None, name=None, uri=None, qs={}, cacheable=None, limiter=None):
+        # Returns False if the request was not made because the rate limiter
+        # ran out of tokens. Cache hits don't use a token.
+        key = self.cache.key(uri=uri, qs=qs)
+        cached = self.cache.get(key=key)
+        if cached is not None:
+            client.response = cached
+            client.success = True
+            return True
+
+        if limiter and not limiter.acquire(timeout=self.alphavantage_wait):
+            return False
+        request.get(client, uri=uri, qs=qs, operation=name)
+        if client.success and (cacheable is None or cacheable(client.response)):
+            self.cache.set(key=key, value=client.response, ttl=self.cache.ttl(name=name))
+        return True
+
     def tiny(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.tiny_parser.parse_args()
+            args = self.parse_args(parser=self.tiny_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.tiny_parser.format_help().rstrip())
             return
@@ -395,12 +453,13 @@ class Plugin(BasePlugin):
                     'domain': 'tinyurl.com',
                 }
                 uri = 'https://api.tinyurl.com/create'
-                request.post(self, uri=uri, payload=payload, extra_headers=extra_headers)
-                if self.response['success']:
-                    if 'status_code' in self.response:
-                        if self.response['status_code'] == 200:
-                            if 'data' in self.response and 'tiny_url' in self.response['data']:
-                                self.send_plain(command.event.channel, self.response['data']['tiny_url'])
+                res = request.Response()
+                request.post(res, uri=uri, payload=payload, extra_headers=extra_headers)
+                if res.response['success']:
+                    if 'status_code' in res.response:
+                        if res.response['status_code'] == 200:
+                            if 'data' in res.response and 'tiny_url' in res.response['data']:
+                                self.send_plain(command.event.channel, res.response['data']['tiny_url'])
                             else:
                                 self.send_plain(command.event.channel, 'The URL shortener was unable to shorten the URL.')
                         else:
@@ -417,10 +476,8 @@ class Plugin(BasePlugin):
             self.send_plain(command.event.channel, 'I am currently unable to create tiny URLs. This error has been logged.')            
 
     def units(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.units_parser.parse_args()
+            args = self.parse_args(parser=self.units_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.units_parser.format_help().rstrip())
             return
@@ -437,10 +494,8 @@ class Plugin(BasePlugin):
             self.send_plain(command.event.channel, f'Conversion failed: {e}')
 
     def weather(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.weather_parser.parse_args()
+            args = self.parse_args(parser=self.weather_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.weather_parser.format_help().rstrip())
             return
@@ -464,9 +519,10 @@ class Plugin(BasePlugin):
                 'appid': self.openweathermap_key,
             }
 
-            request.get(self, uri=uri, qs=qs)
-            if self.success:
-                response = self.response['body'] if 'body' in self.response else self.response
+            res = request.Response()
+            self.__cached_get(client=res, name='weather', uri=uri, qs=qs)
+            if res.success:
+                response = res.response['body'] if 'body' in res.response else res.response
                 longitude = response['lon']
                 latitude = response['lat']
                 country = response['country']
@@ -478,9 +534,9 @@ class Plugin(BasePlugin):
                     'lon': longitude,
                     'appid': self.openweathermap_key,
                 }
-                request.get(self, uri=uri, qs=qs)
-                if self.success:
-                    response = self.response['body'] if 'body' in self.response else self.response
+                self.__cached_get(client=res, name='weather', uri=uri, qs=qs)
+                if res.success:
+                    response = res.response['body'] if 'body' in res.response else res.response
                     state = response[0]['state']
 
                 uri = 'https://api.openweathermap.org/data/2.5/weather'
@@ -490,9 +546,9 @@ class Plugin(BasePlugin):
                     'units': 'imperial',
                     'appid': self.openweathermap_key,
                 }
-                request.get(self, uri=uri, qs=qs)
-                if self.success:
-                    response = self.response['body'] if 'body' in self.response else self.response
+                self.__cached_get(client=res, name='weather', uri=uri, qs=qs)
+                if res.success:
+                    response = res.response['body'] if 'body' in res.response else res.response
                     # Put error checking in all of this!!!!!
                     weather_output = []
                     city = response['name']
@@ -535,7 +591,7 @@ class Plugin(BasePlugin):
             self.send_plain(command.event.channel, 'I am currently unable to perform weather lookups. This error has been logged.')
 
     def __configure_parsers(self):
-        self.apg_parser = argparse.ArgumentParser(add_help=False, prog='apg', description='Generate a series of random passwords.')
+        self.apg_parser = ArgumentParser(add_help=False, prog='apg', description='Generate a series of random passwords.')
         self.apg_parser.add_argument('--length', help='The length of the generated password.', required=False, type=int, default=64)
         self.apg_parser.add_argument('-u', '--uppercase', help='Include uppercase letters in the generated passwords.', required=False, action='store_true')
         self.apg_parser.add_argument('-l', '--lowercase', help='Include lowercase letters in the generated passwords.', required=False, action='store_true')
@@ -543,45 +599,45 @@ class Plugin(BasePlugin):
         self.apg_parser.add_argument('-s', '--special', help='Include special characters in the generated passwords.', required=False, action='store_true')
         self.apg_parser.add_argument('-q', '--quantity', help='The number of passwords to generate.', required=False, type=int, default=10)
 
-        self.ball_parser = argparse.ArgumentParser(add_help=False, prog='8ball', description='8ball <question> -- Ask the 8ball a question.')
+        self.ball_parser = ArgumentParser(add_help=False, prog='8ball', description='8ball <question> -- Ask the 8ball a question.')
         self.ball_parser.set_defaults(func=self.ball)
 
-        self.bytes_parser = argparse.ArgumentParser(add_help=False, prog='bytes', description='Perform byte conversions based on input.')
+        self.bytes_parser = ArgumentParser(add_help=False, prog='bytes', description='Perform byte conversions based on input.')
         self.bytes_parser.add_argument('-a', '--amount', help='The amount to convert, without the suffix.', metavar='<int>', required=True, type=int, action='store')
         self.bytes_parser.add_argument('-u', '--unit', help='What to convert from, e.g, MB.', metavar='<str>', choices=['bytes', 'kb', 'mb', 'gb', 'tb', 'pb', 'eb'], required=True, action='store')
 
-        self.calc_parser = argparse.ArgumentParser(add_help=False, prog='calc', description='calc <equation> -- Perform calculations using bc(1).')
+        self.calc_parser = ArgumentParser(add_help=False, prog='calc', description='calc <equation> -- Perform calculations using bc(1).')
         self.calc_parser.set_defaults(func=self.calc)
 
-        self.crypto_parser = argparse.ArgumentParser(add_help=False, prog='crypto', description='Perform crypto currency conversions.')
+        self.crypto_parser = ArgumentParser(add_help=False, prog='crypto', description='Perform crypto currency conversions.')
         self.crypto_parser.add_argument('-a', '--amount', help='The amount to convert, without currency symbol.', metavar='<int>', required=True, type=int)
         self.crypto_parser.add_argument('-f', '--from', help='Currency FROM symbol, e.g., USD.', metavar='<code>', required=True, action='store')
         self.crypto_parser.add_argument('-t', '--to', help='Currency TO symbol, e.g., GBP.', metavar='<code>', required=True, action='store')
 
-        self.currency_parser = argparse.ArgumentParser(add_help=False, prog='currency', description='Perform physical currency conversions.')
+        self.currency_parser = ArgumentParser(add_help=False, prog='currency', description='Perform physical currency conversions.')
         self.currency_parser.add_argument('-a', '--amount', help='The amount to convert, without currency symbol.', metavar='<int>', required=True, type=int)
         self.currency_parser.add_argument('-f', '--from', help='Currency FROM symbol, e.g., USD.', metavar='<code>', required=True, action='store')
         self.currency_parser.add_argument('-t', '--to', help='Currency TO symbol, e.g., USD.', metavar='<code>', required=True, action='store')
 
-        self.dict_parser = argparse.ArgumentParser(add_help=False, prog='dict', description='Perform dictionary lookups.')
+        self.dict_parser = ArgumentParser(add_help=False, prog='dict', description='Perform dictionary lookups.')
         self.dict_parser.add_argument('-w', '--word', help='The word to look up.', metavar='<word>', required=True, action='store')
 
-        self.quakes_parser = argparse.ArgumentParser(add_help=False, prog='quakes', description='Display earhtquake data from the USGS.')
+        self.quakes_parser = ArgumentParser(add_help=False, prog='quakes', description='Display earhtquake data from the USGS.')
         self.quakes_parser.add_argument('-l', '--limit', help='The maximum number of events to show.', metavar='<int>', required=False, default=10, action='store', type=int)
         self.quakes_parser.add_argument('-m', '--min', help='The minimum magnitude.', metavar='<int>', required=False, default=1, action='store', type=int)
 
-        self.stocks_parser = argparse.ArgumentParser(add_help=False, prog='stocks', description='Perform stock symbol lookups.')
+        self.stocks_parser = ArgumentParser(add_help=False, prog='stocks', description='Perform stock symbol lookups.')
         self.stocks_parser.add_argument('-s', '--symbol', help='The stock symbol. Can be used more than once.', metavar='<symbol>', required=True, action='append')
 
-        self.tiny_parser = argparse.ArgumentParser(add_help=False, prog='tiny', description='Shorten a URL via tinyurl.')
+        self.tiny_parser = ArgumentParser(add_help=False, prog='tiny', description='Shorten a URL via tinyurl.')
         self.tiny_parser.add_argument('-u', '--url', help='The URL to shorten.', metavar='<url>', required=True, action='store')
 
-        self.units_parser = argparse.ArgumentParser(add_help=False, prog='units', description='A simple unit converter.')
+        self.units_parser = ArgumentParser(add_help=False, prog='units', description='A simple unit converter.')
         self.units_parser.add_argument('-a', '--amount', help='The amount to convert.', metavar='<int>', required=True, action='store', type=int)
         self.units_parser.add_argument('-f', '--from', help='The from unit.', metavar='<unit>', required=True, action='store')
         self.units_parser.add_argument('-t', '--to', help='The to unit.', metavar='<unit>', required=True, action='store')
 
-        self.weather_parser = argparse.ArgumentParser(add_help=False, prog='weather', description='Display weather conditions for a given postal code.')
+        self.weather_parser = ArgumentParser(add_help=False, prog='weather', description='Display weather conditions for a given postal code.')
         self.weather_parser.add_argument('-l', '--loc', help='A valid postal code.', metavar='<location>', required=True, action='store')
 
     def __setup_methods(self):
@@ -1,10 +1,8 @@
 from slack_sdk.errors import SlackApiError
-from swagbot.core import BasePlugin
-import argparse
+from swagbot.core import ArgumentParser, BasePlugin
 import logging
-import os
+import swagbot.database.maintenance as db
 import swagbot.scheduler
-import sys
 import time
 
 class Plugin(BasePlugin):
@@ -18,65 +16,45 @@ class Plugin(BasePlugin):
         )
         self.stale_threshold = 3660
         self.client = client
-        self.users = []
-        self.channels = []
 
         self.__add_scheduled_jobs()
         self.scheduler.start()
 
-    def update_users(self, cursor=None):
-        if cursor:
-            try:
-                response = self.client.users_list(limit=1000, cursor=cursor)
-            except SlackApiError as e:
-                logging.error(f'Failed to update the user list: {e.response.data["error"]}')
-                return
-            except Exception as e:
-                logging.error(f'Failed to update the user list: Unknown error.')
-                return
-        else:
-            try:
-                response = self.client.users_list(limit=1000)
-            except SlackApiError as e:
-                logging.error(f'Failed to update the user list: {e.response.data["error"]}')
-                return
-            except Exception as e:
-                logging.error(f'Failed to update the user list: Unknown error.')
-                return
+    def update_users(self):
+        users = self.__fetch_all(method=self.client.users_list, key='members', name='user list', limit=1000)
+        if users is not None:
+            db.update_users(users=users)
 
-        for user in response['members']:
-            self.users.append(user)
-        if 'response_metadata' in response and 'next_cursor' in response['response_metadata']:
-            if response['response_metadata']['next_cursor'] != '':
-                time.sleep(1)
-                self.update_users(cursor=response['response_metadata']['next_cursor'])
+    def update_channels(self):
+        channels = self.__fetch_all(method=self.client.conversations_list, key='channels', name='channel list', limit=1000, types='public_channel', exclude_archived=True)
+        if channels is not None:
+            db.update_channels(channels=channels)
 
-    def update_channels(self, cursor=None):
-        if cursor:
-            try:
-                response = self.client.conversations_list(limit=1000, types='public_channel', exclude_archived=True, cursor=cursor)
-            except SlackApiError as e:
-                logging.error(f'Failed to update the channel list: {e.response.data["error"]}')
-                return
-            except Exception as e:
-                logging.error(f'Failed to update the channel list: Unknown error.')
-                return
-        else:
+    def __fetch_all(self, method=None, key=None, name=None, **kwargs):
+        # Returns the items from every page, or None if any page fails so a
+        # partial list is never synced and the rest marked as deleted.
+        items = []
+        cursor = None
+        while True:
             try:
-                response = self.client.conversations_list(limit=1000, types='public_channel', exclude_archived=True)
+                if cursor:
+                    response = method(cursor=cursor, **kwargs)
+                else:
+                    response = method(**kwargs)
             except SlackApiError as e:
-                logging.error(f'Failed to update the channel list: {e.response.data["error"]}')
-                return
+                logging.error(f'Failed to update the {name}: {e.response.data["error"]}')
+                return None
             except Exception as e:
-                logging.error(f'Failed to update the channel list: Unknown error.')
-                return
+                logging.error(f'Failed to update the {name}: Unknown error.')
+                return None
 
-        for conversation in response['channels']:
-            self.channels.append(conversation)
-        if 'response_metadata' in response and 'next_cursor' in response['response_metadata']:
-            if response['response_metadata']['next_cursor'] != '':
-                time.sleep(1)
-                self.update_channels(cursor=response['response_metadata']['next_cursor'])
+            items.extend(response[key])
+            cursor = None
+            if 'response_metadata' in response and 'next_cursor' in response['response_metadata']:
+                cursor = response['response_metadata']['next_cursor']
+            if not cursor:
+                return items
+            time.sleep(1)
 
 ###############################################################################
 #
@@ -93,10 +71,8 @@ class Plugin(BasePlugin):
         #     logging.error(f'Failed to add the scheduled jobs for "{self.classname}": {message}')
 
     def maint(self, command=None):
-        sys.argv = command.argv
         try:
-            with self.redirect_stdout_stderr(os.devnull):
-                args = self.maint_parser.parse_args()
+            args = self.parse_args(parser=self.maint_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.maint_parser.format_help().rstrip())
             return
@@ -120,7 +96,7 @@ class Plugin(BasePlugin):
                 self.send_plain(command.event.channel, 'The bot\'s maintenance thread has been resumed.')
 
     def __configure_parsers(self):
-        self.maint_parser = argparse.ArgumentParser(add_help=False, prog='maint', description='Pause or resume the bot\'s maintenance thread.')
+        self.maint_parser = ArgumentParser(add_help=False, prog='maint', description='Pause or resume the bot\'s maintenance thread.')
         self.maint_parser.add_argument('--pause', help='Pause the bot\'s maintenance thread.', action='store_true')
         self.maint_parser.add_argument('--resume', help='Resume the bot\'s maintenance thread.', action='store_true')
 
@@ -1,6 +1,6 @@
 from pprint import pprint
 from datetime import datetime, timedelta
-from swagbot.core import BasePlugin
+from swagbot.core import ArgumentParser, BasePlugin
 import argparse
 import logging
 import os
@@ -9,7 +9,6 @@ import swagbot.globals as globals
 import swagbot.request as request
 import swagbot.scheduler
 import swagbot.utils.core as utils
-import sys
 
 class Plugin(BasePlugin):
     def __init__(self, client):
@@ -30,14 +29,21 @@ class Plugin(BasePlugin):
         self.scheduler = swagbot.scheduler.Scheduler(
             name = self.classname
         )
-    
-        schema_is_valid = db.validate_schema()
-        if not schema_is_valid:
-            db.create_schema()
 
-        self.__refresh_data()
-        self.__add_scheduled_jobs()
-        self.scheduler.start()
+    def warmup(self):
+        # Fetching the PagerDuty collections can take a while. Until it's done,
+        # commands serve the data left in the tables by the last refresh.
+        try:
+            self.__refresh_data()
+        finally:
+            self.__add_scheduled_jobs()
+            self.scheduler.start()
+
+    def __send_empty(self, channel=None, message=None):
+        if self.is_ready():
+            self.send_plain(channel, message)
+        else:
+            self.send_plain(channel, 'PagerDuty data is still warming up. Please try again in a moment.')
  
 ###############################################################################
 #
@@ -46,9 +52,8 @@ class Plugin(BasePlugin):
 ###############################################################################
 
     def events(self, command=None):
-        sys.argv = command.argv
         try:
-            args = self.events_parser.parse_args()
+            args = self.parse_args(parser=self.events_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.events_parser.format_help().rstrip())
             return
@@ -78,8 +83,7 @@ class Plugin(BasePlugin):
         success, output = self.__pagerduty_events(status=status, urgency=args.urgency, service=args.service, start=start, end=start, limit=args.limit)
         if success:
             if len(output) > 0:
-                for chunk in utils.chunker(output, 10):
-                    self.send_monospace(command.event.channel, utils.generate_table(headers=['Created', 'Service', 'Description', 'Urgency', 'Status', 'Owner'], data=chunk))
+                self.send_table(command.event.channel, headers=['Created', 'Service', 'Description', 'Urgency', 'Status', 'Owner'], data=output, command=command)
             else:
                 self.send_plain(command.event.channel, 'No PagerDuty events found matching the specified criteria.')
         else:
@@ -94,7 +98,7 @@ class Plugin(BasePlugin):
                 are = 'is' if len(output) == 1 else 'are'
                 for channel_id in self.config['jobs'][name]['channels']:
                     self.send_plain(channel_id, f'There {are} currently {len(output)} triggered {plural} in PagerDuty.')
-                    self.send_monospace(channel_id,utils.generate_table(headers=['Created', 'Service', 'Description', 'Urgency', 'Status', 'Owner'], data=output))
+                    self.send_table(channel_id, headers=['Created', 'Service', 'Description', 'Urgency', 'Status', 'Owner'], data=output)
             else:
                 for channel_id in self.config['jobs'][name]['channels']:
                     self.send_plain(channel_id, 'There are currently no triggered incidents.')
@@ -114,10 +118,11 @@ class Plugin(BasePlugin):
         if end:              qs['until'] = end.strftime(self.formatter)
 
         uri = f'https://api.pagerduty.com/incidents?{self.__build_qs_list(qs=qs)}'
-        request.get(self, uri=uri, extra_headers=self.extra_headers)
-        if self.response['success']:
+        res = request.Response()
+        request.get(res, uri=uri, extra_headers=self.extra_headers)
+        if res.response['success']:
             incidents = []
-            for incident in self.response['incidents']:
+            for incident in res.response['incidents']:
                 created = incident['created_at']
                 assignees = [assignee['assignee']['summary'] for assignee in incident['assignments'] if assignee['assignee']['summary'] != 'DevOps Awareness']
                 incidents.append([
@@ -139,9 +144,8 @@ class Plugin(BasePlugin):
 ###############################################################################
 
     def oncall(self, command=None):
-        sys.argv = command.argv
         try:
-            args = self.oncall_parser.parse_args()
+            args = self.parse_args(parser=self.oncall_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.oncall_parser.format_help().rstrip())
             return
@@ -167,19 +171,17 @@ class Plugin(BasePlugin):
         else:
             escalation_policy_ids = []
 
-        self.__oncall_search(escalation_policy_ids=escalation_policy_ids)
-        oncalls = db.get_oncall_temp(min=min, max=max)
-        if oncalls:
+        oncalls = self.__oncall_search(escalation_policy_ids=escalation_policy_ids, min=min, max=max)
+        if oncalls is not False:
             if len(oncalls) > 0:
-                for chunk in utils.chunker(oncalls, 25):
-                    output = []
-                    for item in chunk:
-                        output.append([
-                            item['escalation_policy'],
-                            item['level'],
-                            item['name'],
-                        ])
-                    self.send_monospace(command.event.channel, utils.generate_table(headers=['Escalation Policy', 'Level', 'Name'], data=output))
+                output = []
+                for item in oncalls:
+                    output.append([
+                        item['escalation_policy'],
+                        item['level'],
+                        item['name'],
+                    ])
+                self.send_table(command.event.channel, headers=['Escalation Policy', 'Level', 'Name'], data=output, command=command)
             else:
                 self.send_monospace(command.event.channel, 'Uh oh! No oncall data found. Try again later.')
         else:
@@ -187,8 +189,7 @@ class Plugin(BasePlugin):
 
     def __oncall_ticker(self):
         name = 'oncall_ticker'
-        self.__oncall_search(escalation_policy_ids=self.config['jobs'][name]['escalation_policy_ids'])
-        oncalls = db.get_oncall_temp(min=self.config['jobs'][name]['min'], max=self.config['jobs'][name]['max'])
+        oncalls = self.__oncall_search(escalation_policy_ids=self.config['jobs'][name]['escalation_policy_ids'], min=self.config['jobs'][name]['min'], max=self.config['jobs'][name]['max'])
         if oncalls:
             if len(oncalls) > 0:
                 output = []
@@ -200,7 +201,7 @@ class Plugin(BasePlugin):
                     ])
                 for channel_id in self.config['jobs'][name]['channels']:
                     self.send_plain(channel_id, f'Curretly oncall')
-                    self.send_monospace(channel_id, utils.generate_table(headers=['Escalation Policy', 'Level', 'Name'], data=output))
+                    self.send_table(channel_id, headers=['Escalation Policy', 'Level', 'Name'], data=output)
             else:
                 for channel_id in self.config['jobs'][name]['channels']:
                     self.send_plain(channel_id, 'No oncall data found. I will try again later.')
@@ -208,8 +209,11 @@ class Plugin(BasePlugin):
             for channel_id in self.config['jobs'][name]['channels']:
                 self.send_plain(channel_id, 'No oncall data found. I will try again later.')
 
-    def __oncall_search(self, escalation_policy_ids=[]):
-        db.wipe_oncall_temp()
+    def __oncall_search(self, escalation_policy_ids=[], min=1, max=1000):
+        # Returns the oncalls between levels min and max sorted by escalation
+        # policy and level, or False if the request failed. The results are
+        # kept per call since oncall and the oncall_ticker job can run at the
+        # same time.
         qs = {
             'limit': str(100),
             'team_ids[]': self.config['teams'],
@@ -218,15 +222,19 @@ class Plugin(BasePlugin):
             qs['escalation_policy_ids[]'] = escalation_policy_ids
 
         uri = f'https://api.pagerduty.com/oncalls?{self.__build_qs_list(qs=qs)}'
-        request.get(self, uri=uri, extra_headers=self.extra_headers)
-        if self.response['success']:
-            for oncall in self.response['oncalls']:
-                if oncall['user']['summary'] != 'DevOps Awareness':
-                    db.add_oncall_temp(
-                        summary=oncall['escalation_policy']['summary'],
-                        level=oncall['escalation_level'],
-                        name=oncall['user']['summary']
-                    )
+        res = request.Response()
+        request.get(res, uri=uri, extra_headers=self.extra_headers)
+        if not res.response['success']:
+            return False
+        oncalls = []
+        for oncall in res.response['oncalls']:
+            if oncall['user']['summary'] != 'DevOps Awareness' and min <= oncall['escalation_level'] <= max:
+                oncalls.append({
+                    'escalation_policy': oncall['escalation_policy']['summary'],
+                    'level': oncall['escalation_level'],
+                    'name': oncall['user']['summary'],
+                })
+        return sorted(oncalls, key=lambda item: (item['escalation_policy'], item['level']))
 
 ###############################################################################
 #
@@ -241,11 +249,10 @@ class Plugin(BasePlugin):
                 for choice, subparser in action.choices.items():
                     help[choice] = subparser.format_help()
 
-        sys.argv = command.argv
         try:
-            args = self.overrides_parser.parse_args()
+            args = self.parse_args(parser=self.overrides_parser, argv=command.argv)
         except:
-            self.send_monospace(command.event.channel, help[sys.argv[1]])
+            self.send_monospace(command.event.channel, help[command.argv[1]])
             return
 
         if hasattr(args, 'start'):
@@ -273,10 +280,11 @@ class Plugin(BasePlugin):
             'until': args.end,
         }
         uri = f'https://api.pagerduty.com/schedules/{args.id}/overrides?{self.__build_qs_list(qs=qs)}'
-        request.get(self, uri=uri, extra_headers=self.extra_headers)
-        if self.response['success']:
+        res = request.Response()
+        request.get(res, uri=uri, extra_headers=self.extra_headers)
+        if res.response['success']:
             overrides = []
-            for override in self.response['overrides']:
+            for override in res.response['overrides']:
                 overrides.append([
                     override['id'],
                     args.id,
@@ -285,12 +293,11 @@ class Plugin(BasePlugin):
                     override['user']['summary'],
                 ])
             if len(overrides) > 0:
-                for chunk in utils.chunker(overrides, 10):
-                    self.send_monospace(command.event.channel, utils.generate_table(headers=['ID', 'Schedule ID', 'Start', 'End', 'Name'], data=chunk))
+                self.send_table(command.event.channel, headers=['ID', 'Schedule ID', 'Start', 'End', 'Name'], data=overrides, command=command)
             else:
                 self.send_plain(command.event.channel, 'Uh oh! No override data found. Try again later.')
         else:
-            self.send_plain(command.event.channel, self.response['error']['message'])
+            self.send_plain(command.event.channel, res.response['error']['message'])
             return
 
     def overrides_add(self, args, command):
@@ -307,19 +314,21 @@ class Plugin(BasePlugin):
             ]
         }
         uri = f'https://api.pagerduty.com/schedules/{args.id}/overrides'
-        request.post(self, uri=uri, extra_headers=self.extra_headers, payload=payload)
-        if self.response['success']:
-            self.send_plain(command.event.channel, f'Successfully added schedule override ID {self.response["body"][0]["override"]["id"]}.')
+        res = request.Response()
+        request.post(res, uri=uri, extra_headers=self.extra_headers, payload=payload)
+        if res.response['success']:
+            self.send_plain(command.event.channel, f'Successfully added schedule override ID {res.response["body"][0]["override"]["id"]}.')
         else:
             self.send_plain(command.event.channel, 'Failed to add the schedule override.')
 
     def overrides_delete(self, args, command):
         uri = f'https://api.pagerduty.com/schedules/{args.id}/overrides/{args.override_id}'
-        request.delete(self, uri=uri, extra_headers=self.extra_headers)
-        if self.response['success']:
+        res = request.Response()
+        request.delete(res, uri=uri, extra_headers=self.extra_headers)
+        if res.response['success']:
             self.send_plain(command.event.channel, f'Successfully deleted schedule override ID {args.override_id}.')
         else:
-            self.send_plain(command.event.channel, f'Failed to delete the schedule override: {self.response["error"]["message"]}')
+            self.send_plain(command.event.channel, f'Failed to delete the schedule override: {res.response["error"]["message"]}')
 
 ###############################################################################
 #
@@ -331,13 +340,10 @@ class Plugin(BasePlugin):
         results = db.list(table_name='escalation_policies')
         if results != None:
             if len(results) > 0:
-                for chunk in utils.chunker(results, 25):
-                    output = []
-                    for policy in chunk:
-                        output.append([policy['id'], policy['name']])
-                    self.send_monospace(command.event.channel, utils.generate_table(headers=['Escalation Policy ID', 'Escalation Policy Name'], data=output))
+                output = [[policy['id'], policy['name']] for policy in results]
+                self.send_table(command.event.channel, headers=['Escalation Policy ID', 'Escalation Policy Name'], data=output, command=command)
             else:
-                self.send_plain(command.event.channel, f'You haven\'t added any escalation policies.')
+                self.__send_empty(command.event.channel, f'You haven\'t added any escalation policies.')
         else:
             self.send_plain(command.event.channel, f'Failed to get the list of escalation policies.')
     
@@ -348,9 +354,8 @@ class Plugin(BasePlugin):
 ###############################################################################
 
     def schedules(self, command=None):
-        sys.argv = command.argv
         try:
-            args = self.schedules_parser.parse_args()
+            args = self.parse_args(parser=self.schedules_parser, argv=command.argv)
         except:
             self.send_monospace(command.event.channel, self.schedules_parser.format_help().rstrip())
             return
@@ -359,13 +364,10 @@ class Plugin(BasePlugin):
             results = db.list(table_name='schedules')
             if results != None:
                 if len(results) > 0:
-                    for chunk in utils.chunker(results, 25):
-                        schedules = []
-                        for schedule in chunk:
-                            schedules.append([schedule['id'], schedule['name']])
-                        self.send_monospace(command.event.channel, utils.generate_table(headers=['Schedule ID', 'Schedule Name'], data=schedules))
+                    schedules = [[schedule['id'], schedule['name']] for schedule in results]
+                    self.send_table(command.event.channel, headers=['Schedule ID', 'Schedule Name'], data=schedules, command=command)
                 else:
-                    self.send_plain(command.event.channel, f'You haven\'t added any schedules.')
+                    self.__send_empty(command.event.channel, f'You haven\'t added any schedules.')
             else:
                 self.send_plain(command.event.channel, f'Failed to get the list of schedules.')
 
@@ -380,22 +382,22 @@ class Plugin(BasePlugin):
             }
             qs_str = self.__generate_query_string(qs, args)
             uri = f'https://api.pagerduty.com/schedules/{args.view}?{qs_str}'
-            request.get(self, uri=uri, extra_headers=self.extra_headers)
-            if self.response['success']:
+            res = request.Response()
+            request.get(res, uri=uri, extra_headers=self.extra_headers)
+            if res.response['success']:
                 schedules = []
-                name = self.response['schedule']['name']
-                for person in self.response['schedule']['final_schedule']['rendered_schedule_entries']:
+                name = res.response['schedule']['name']
+                for person in res.response['schedule']['final_schedule']['rendered_schedule_entries']:
                     start = datetime.fromisoformat(person['start'].rstrip('Z'))
                     end = datetime.fromisoformat(person['end'].rstrip('Z'))
                     schedules.append([name, start.strftime(self.formatter), end.strftime(self.formatter), person['user']['summary']])
                 if len(schedules) > 0:
-                    for chunk in utils.chunker(schedules, 20):
-                        self.send_monospace(command.event.channel, utils.generate_table(headers=['Schedule', 'Start', 'End', 'Name'], data=chunk))
+                    self.send_table(command.event.channel, headers=['Schedule', 'Start', 'End', 'Name'], data=schedules, command=command)
                 else:
                     self.send_plain(command.event.channel, f'No schedule information found.')
             else:
-                if 'error' in self.response and 'message' in self.response['error']:
-                    self.send_plain(command.event.channel, self.response['error']['message'])
+                if 'error' in res.response and 'message' in res.response['error']:
+                    self.send_plain(command.event.channel, res.response['error']['message'])
                 else:
                     self.send_plain(command.event.channel, f'Schedule ID {args.view} not found.')
         else:
@@ -409,10 +411,9 @@ class Plugin(BasePlugin):
 
     def services(self, command=None):
         # Need a function to better handle verification
-        sys.argv = command.argv[0:2]
-        sys.argv.append(' '.join(command.argv[2:]))
+        argv = command.argv[0:2] + [' '.join(command.argv[2:])]
         try:
-            args = self.services_parser.parse_args()
+            args = self.parse_args(parser=self.services_parser, argv=argv)
         except:
             self.send_monospace(command.event.channel, self.services_parser.format_help().rstrip())
             return
@@ -422,13 +423,10 @@ class Plugin(BasePlugin):
         results = self.__services_search(pattern=args.pattern)
         if results != None:
             if len(results) > 0:
-                for chunk in utils.chunker(results, 25):
-                    output = []
-                    for service in chunk:
-                        output.append([service['id'], service['name']]) 
-                    self.send_monospace(command.event.channel, utils.generate_table(headers=['Service ID', 'Service Name'], data=output))
+                output = [[service['id'], service['name']] for service in results]
+                self.send_table(command.event.channel, headers=['Service ID', 'Service Name'], data=output, command=command)
             else:
-                self.send_plain(command.event.channel, f'You haven\'t added any PagerDuty services.')
+                self.__send_empty(command.event.channel, f'You haven\'t added any PagerDuty services.')
         else:
             self.send_plain(command.event.channel, f'Failed to get the list of PagerDuty services.')
 
@@ -444,10 +442,9 @@ class Plugin(BasePlugin):
 
     def users(self, command=None):
         # Need a function to better handle verification
-        sys.argv = command.argv[0:2]
-        sys.argv.append(' '.join(command.argv[2:]))
+        argv = command.argv[0:2] + [' '.join(command.argv[2:])]
         try:
-            args = self.users_parser.parse_args()
+            args = self.parse_args(parser=self.users_parser, argv=argv)
         except:
             self.send_monospace(command.event.channel, self.users_parser.format_help().rstrip())
             return
@@ -457,13 +454,10 @@ class Plugin(BasePlugin):
         results = self.__users_search(pattern=args.pattern)
         if results != None:
             if len(results) > 0:
-                for chunk in utils.chunker(results, 25):
-                    output = []
-                    for policy in chunk:
-                        output.append([policy['id'], policy['name']])
-                    self.send_monospace(command.event.channel, utils.generate_table(headers=['User ID', 'User Name'], data=output))
+                output = [[user['id'], user['name']] for user in results]
+                self.send_table(command.event.channel, headers=['User ID', 'User Name'], data=output, command=command)
             else:
-                self.send_plain(command.event.channel, f'Failed to get the list of users.')
+                self.__send_empty(command.event.channel, f'Failed to get the list of users.')
         else:
             self.send_plain(command.event.channel, f'Failed to get the list of users.')
 
@@ -484,11 +478,10 @@ class Plugin(BasePlugin):
                 for choice, subparser in action.choices.items():
                     help[choice] = subparser.format_help()
 
-        sys.argv = command.argv
         try:
-            args = self.windows_parser.parse_args()
+            args = self.parse_args(parser=self.windows_parser, argv=command.argv)
         except:
-            self.send_plain(command.event.channel, help[sys.argv[1]])
+            self.send_plain(command.event.channel, help[command.argv[1]])
             return
 
         if hasattr(args, 'start'):
@@ -604,13 +597,14 @@ class Plugin(BasePlugin):
             'team_ids[]': self.config['teams'],
         }
         uri = f'https://api.pagerduty.com/{item_type}?{self.__build_qs_list(qs=qs)}'
-        request.get(self, uri=uri, extra_headers=self.extra_headers)
+        res = request.Response()
+        request.get(res, uri=uri, extra_headers=self.extra_headers)
 
-        for item in self.response[item_type]:
+        for item in res.response[item_type]:
             db.add(table_name=item_type, name=item['name'], id=item['id'])
 
-        if self.response['more'] == True:
-            total = total + len(self.response[item_type])
+        if res.response['more'] == True:
+            total = total + len(res.response[item_type])
             self.__populate(item_type=item_type, total=total, offset=total+1)
         else:
             logging.info('Done!')
@@ -666,7 +660,7 @@ class Plugin(BasePlugin):
 
     def __configure_parsers(self):
         # Event
-        self.events_parser = argparse.ArgumentParser(add_help=False, prog='incidents', description='List incidents for your configured PagerDuty teams.')
+        self.events_parser = ArgumentParser(add_help=False, prog='incidents', description='List incidents for your configured PagerDuty teams.')
         self.events_parser.add_argument('--status', help='Specify a status (triggered, acknowledged, resolved). Can be used more than once.', metavar='<str>', choices=['triggered', 'acknowledged', 'resolved'], default=[], required=False, action='append')
         self.events_parser.add_argument('-u', '--urgency', help='Specify an urgency (high, low). Can be used more than once.', metavar='<urgency>', choices=['high', 'low'], default=[], required=False, action='append')
         self.events_parser.add_argument('-s', '--service', help='Specify an service ID. Can be used more than once. Cannot be used with --pattern.', metavar='<service>', default=[], required=False, action='append')
@@ -675,24 +669,24 @@ class Plugin(BasePlugin):
         self.events_parser.add_argument('-l', '--limit', help='Limit the results to <int>.', metavar='<int>', required=False, action='store', default=100, type=int)
 
         # Services
-        self.services_parser = argparse.ArgumentParser(add_help=False, prog='schedules', description='List services for your configured PagerDuty teams.')
+        self.services_parser = ArgumentParser(add_help=False, prog='schedules', description='List services for your configured PagerDuty teams.')
         self.services_parser.add_argument('-p', '--pattern', help='Specify a search pattern using %% as a wildcard, e.g., %%VKM%%.', metavar='<pattern>.', required=False, action='store')
         self.services_parser.set_defaults(func=self.services)
 
         # Schedules
-        self.schedules_parser = argparse.ArgumentParser(add_help=False, prog='schedules', description='List and view schedules for your configured PagerDuty teams.')
+        self.schedules_parser = ArgumentParser(add_help=False, prog='schedules', description='List and view schedules for your configured PagerDuty teams.')
         self.schedules_parser.add_argument('-v', '--view', help='View an escalation policy for your configured PagerDuty teams.', metavar='<id>', required=False, action='store')
         self.schedules_parser.add_argument('-s', '--start', help='Optional start time for --view in the format YYYY-MM-DD.', metavar='<date>', required=False, action='store')
         self.schedules_parser.add_argument('-d', '--days', help='How many days to view.', metavar='<days>', required=False, action='store', type=int, default=7)
 
         # Oncall
-        self.oncall_parser = argparse.ArgumentParser(add_help=False, prog='oncall', description='View oncall rotations for your configured PagerDuty teams.')
+        self.oncall_parser = ArgumentParser(add_help=False, prog='oncall', description='View oncall rotations for your configured PagerDuty teams.')
         self.oncall_parser.add_argument('-i', '--id', help='Specify an escalation policy ID. Can be used more than once.', required=False, action='append')
-        self.oncall_parser.add_argument('--min', help='Specify the minimum oncall level to display.', required=False, action='store')
-        self.oncall_parser.add_argument('--max', help='Specify the maximum oncall level to display.', required=False, action='store')
+        self.oncall_parser.add_argument('--min', help='Specify the minimum oncall level to display.', required=False, type=int, action='store')
+        self.oncall_parser.add_argument('--max', help='Specify the maximum oncall level to display.', required=False, type=int, action='store')
 
         # Overrides
-        self.overrides_parser = argparse.ArgumentParser(add_help=False, prog='overrides', description='Manage PagerDuty schedule overrides.')
+        self.overrides_parser = ArgumentParser(add_help=False, prog='overrides', description='Manage PagerDuty schedule overrides.')
         self.overrides_parser.set_defaults(func=self.overrides)
         subparsers = self.overrides_parser.add_subparsers(help='Sub-command help')
 
@@ -715,7 +709,7 @@ class Plugin(BasePlugin):
         parser_delete.set_defaults(func=self.overrides_delete)
 
         # Maintenance Windows
-        self.windows_parser = argparse.ArgumentParser(add_help=False, prog='windows', description='Manage PagerDuty maintenance windows.')
+        self.windows_parser = ArgumentParser(add_help=False, prog='windows', description='Manage PagerDuty maintenance windows.')
         self.windows_parser.set_defaults(func=self.windows)
         subparsers = self.windows_parser.add_subparsers(help='Sub-command help')
 
@@ -737,10 +731,10 @@ class Plugin(BasePlugin):
         parser_windows_delete.add_argument('-o', '--override-id', help='The override ID.', metavar='<id>', required=True, action='store')
         parser_windows_delete.set_defaults(func=self.windows_delete)
 
-        self.policies_parser = argparse.ArgumentParser(add_help=False, prog='policies', description='List escalation policies for your configured PagerDuty teams.')
+        self.policies_parser = ArgumentParser(add_help=False, prog='policies', description='List escalation policies for your configured PagerDuty teams.')
         self.policies_parser.set_defaults(func=self.policies)
 
-        self.users_parser = argparse.ArgumentParser(add_help=False, prog='users', description='List users for your configured PagerDuty teams.')
+        self.users_parser = ArgumentParser(add_help=False, prog='users', description='List users for your configured PagerDuty teams.')
         self.users_parser.add_argument('-p', '--pattern', help='Specify a search pattern using %% as a wildcard, e.g., %%Bob%%.', metavar='<pattern>.', required=False, action='store')
         self.users_parser.set_defaults(func=self.users)
 
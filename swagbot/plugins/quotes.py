@@ -1,8 +1,8 @@
 from pprint import pprint
-from swagbot.core import BasePlugin
-import argparse
+from swagbot.core import ArgumentParser, BasePlugin
 import os
-import sqlite3
+import swagbot.database.connection as connection
+import swagbot.database.queries as queries
 import swagbot.globals as globals
 import swagbot.utils.core as utils
 
@@ -13,9 +13,7 @@ class Plugin(BasePlugin):
         BasePlugin.__init__(self, client)
 
         self.dbfile = os.path.join(globals.config_root, f'swagbot.plugins.quotes.db')
-        self.conn = sqlite3.connect(self.dbfile, check_same_thread=False)
-        self.conn.row_factory = utils.dict_factory
-        self.cursor = self.conn.cursor()
+        self.database = connection.get(path=self.dbfile)
 
     def dad(self, command=None):
         quote = self.__quotes(category='dad')
@@ -39,20 +37,21 @@ class Plugin(BasePlugin):
             self.send_plain(command.event.channel, 'Failed to find a yomama joke. :(')
 
     def __quotes(self, category=None):
-        select = f'SELECT quote FROM quotes where category="{category}" ORDER BY RANDOM() LIMIT 1'
+        select = queries.quotes['random_quote']
 
-        res = self.cursor.execute(select)
-        for row in res:
-            return row['quote']
+        with self.database.read() as conn:
+            res = conn.execute(select, (category,))
+            for row in res:
+                return row['quote']
 
     def __configure_parsers(self):
-        self.dad_parser = argparse.ArgumentParser(add_help=False, prog='dad', description='Tell a dad joke.')
+        self.dad_parser = ArgumentParser(add_help=False, prog='dad', description='Tell a dad joke.')
         self.dad_parser.set_defaults(func=self.dad)
 
-        self.fortune_parser = argparse.ArgumentParser(add_help=False, prog='fortune', description='Tell a Unix fortune.')
+        self.fortune_parser = ArgumentParser(add_help=False, prog='fortune', description='Tell a Unix fortune.')
         self.fortune_parser.set_defaults(func=self.fortune)
 
-        self.yomama_parser = argparse.ArgumentParser(add_help=False, prog='yomama', description='Tell a (sometimes) funny yo mama joke.')
+        self.yomama_parser = ArgumentParser(add_help=False, prog='yomama', description='Tell a (sometimes) funny yo mama joke.')
         self.yomama_parser.set_defaults(func=self.yomama)
 
     def __setup_methods(self):
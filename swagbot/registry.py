@@ -0,0 +1,75 @@
+# In-memory command registry. Entries are built from each plugin's methods dict
+# when the plugin is loaded and kept in sync with the command_settings table so
+# that dispatching a command never has to touch SQLite.
+import logging
+import swagbot.database.core as db
+import swagbot.dispatch as dispatch
+import threading
+
+lock = threading.Lock()
+registered = {}
+
+def __flag(value):
+    return True if value == 1 or value == True else False
+
+def register(module=None, methods=None):
+    settings = {}
+    for row in db.get_command_settings(module=module):
+        settings[row['command']] = row
+
+    entries = {}
+    for command_name, command_settings in methods.items():
+        state = settings.get(command_name, {})
+        entries[command_name] = {
+            'command': command_name,
+            'description': command_settings['description'],
+            'usage': command_settings['usage'],
+            'is_admin': command_settings['is_admin'],
+            'can_be_disabled': __flag(command_settings['can_be_disabled']),
+            'module': module,
+            'method': command_settings['method'] if 'method' in command_settings else command_name,
+            'type': command_settings['type'],
+            'monospace': __flag(command_settings.get('monospace', 0)),
+            'split_output': __flag(command_settings.get('split_output', 0)),
+            'priority': command_settings.get('priority', dispatch.default_priority),
+            'enabled': __flag(state.get('enabled', 1)),
+            'hidden': __flag(state.get('hidden', command_settings.get('hidden', 0))),
+        }
+
+    with lock:
+        for command_name in [name for name, entry in registered.items() if entry['module'] == module]:
+            del registered[command_name]
+        registered.update(entries)
+    logging.debug(f'Registered {len(entries)} commands for the module {module}.')
+
+def unregister(module=None):
+    with lock:
+        for command_name in [name for name, entry in registered.items() if entry['module'] == module]:
+            del registered[command_name]
+
+def prune(commands=None):
+    with lock:
+        for command_name in commands:
+            registered.pop(command_name, None)
+
+def commands():
+    with lock:
+        return list(registered.keys())
+
+def lookup(command=None):
+    entry = registered.get(command)
+    return dict(entry) if entry else False
+
+def update(command=None, **kwargs):
+    # Entries are replaced rather than mutated so a lookup that is in flight on
+    # another thread always sees a consistent row.
+    with lock:
+        if command in registered:
+            entry = dict(registered[command])
+            entry.update(kwargs)
+            registered[command] = entry
+
+def visible():
+    with lock:
+        entries = [dict(entry) for entry in registered.values() if entry['enabled'] and not entry['hidden']]
+    return sorted(entries, key=lambda entry: entry['command'])
@@ -1,39 +1,95 @@
-from urllib.parse import urlencode
-import inspect
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlencode, urlparse
+from urllib3.util.retry import Retry
 import json
 import logging
-import os
 import re
 import requests
-import swagbot.logger as logger
+import swagbot.globals as globals
+import swagbot.metrics as metrics
 import swagbot.utils.core as utils
-
-def get(client, uri=None, qs={}, payload={}, proxy=None, extra_headers={}, debug=False):
-    __swagbot_request(client, http_method='GET', uri=uri, qs=qs, payload=payload, proxy=proxy, extra_headers=extra_headers, debug=debug)
-
-def post(client, uri=None, qs={}, payload={}, proxy=None, extra_headers={}, debug=False):
-    __swagbot_request(client, http_method='POST', uri=uri, qs=qs, payload=payload, proxy=proxy, extra_headers=extra_headers, debug=debug)
-
-def put(client, uri=None, qs={}, payload={}, proxy=None, extra_headers={}, debug=False):
-   __swagbot_request(client, http_method='PUT', uri=uri, qs=qs, payload=payload, proxy=proxy, extra_headers=extra_headers, debug=debug)
-
-def delete(client, uri=None, qs={}, payload={}, proxy=None, extra_headers={}, debug=False):
-    __swagbot_request(client, http_method='DELETE', uri=uri, qs=qs, payload=payload, proxy=proxy, extra_headers=extra_headers, debug=debug)
-
-def __get_method(stack):
-    valid_scripts = ['auth.py', 'core.py']
-    usable_bits = [frame for frame in stack if os.path.basename(frame[1]) in valid_scripts]
-    return usable_bits[-1][3] if len(usable_bits) > 0 else 'unknown method'
-
-def __swagbot_request(client, http_method=None, uri=None, qs={}, payload={}, proxy=None, extra_headers={}, debug=False):
-    logger.configure(debug=debug)
-    method = __get_method(inspect.stack())
-    url = None
-    req = None
+import sys
+import threading
+import time
+
+lock = threading.Lock()
+session = None
+
+class Response(object):
+    # Holds the result of a single request. Plugins normally pass themselves to
+    # get/post/put/delete, which is fine for one request at a time; code that
+    # makes requests from several threads passes one of these per request.
+    def __init__(self):
+        self.response = {}
+        self.success = False
+
+def get(client, uri=None, qs={}, payload={}, proxy=None, extra_headers={}, operation=None, debug=False):
+    __swagbot_request(client, http_method='GET', uri=uri, qs=qs, payload=payload, proxy=proxy, extra_headers=extra_headers, operation=operation, debug=debug)
+
+def post(client, uri=None, qs={}, payload={}, proxy=None, extra_headers={}, operation=None, debug=False):
+    __swagbot_request(client, http_method='POST', uri=uri, qs=qs, payload=payload, proxy=proxy, extra_headers=extra_headers, operation=operation, debug=debug)
+
+def put(client, uri=None, qs={}, payload={}, proxy=None, extra_headers={}, operation=None, debug=False):
+   __swagbot_request(client, http_method='PUT', uri=uri, qs=qs, payload=payload, proxy=proxy, extra_headers=extra_headers, operation=operation, debug=debug)
+
+def delete(client, uri=None, qs={}, payload={}, proxy=None, extra_headers={}, operation=None, debug=False):
+    __swagbot_request(client, http_method='DELETE', uri=uri, qs=qs, payload=payload, proxy=proxy, extra_headers=extra_headers, operation=operation, debug=debug)
+
+def __http_config():
+    config = getattr(globals, 'config', None) or {}
+    return config.get('http', None) or {}
+
+def __get_session():
+    # One session is shared by every plugin so connections to the same host are
+    # kept alive and reused. urllib3's connection pools are thread safe.
+    global session
+    if session is None:
+        with lock:
+            if session is None:
+                http_config = __http_config()
+                retry = Retry(
+                    total=http_config.get('retries', 3),
+                    backoff_factor=http_config.get('backoff_factor', 0.5),
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=http_config.get('pool_connections', 10),
+                    pool_maxsize=http_config.get('pool_maxsize', 10),
+                    max_retries=retry,
+                )
+                new_session = requests.Session()
+                new_session.mount('https://', adapter)
+                new_session.mount('http://', adapter)
+                session = new_session
+    return session
+
+def __get_timeout():
+    http_config = __http_config()
+    return (http_config.get('connect_timeout', 5), http_config.get('timeout', 30))
+
+def __get_operation(depth=3):
+    # The name of the plugin method that called get/post/put/delete. Only the
+    # code object of a single frame is looked at, unlike inspect.stack().
+    try:
+        return sys._getframe(depth).f_code.co_name
+    except ValueError:
+        return 'unknown method'
+
+def __trace(level=None, operation=None, http_method=None, uri=None, res=None, start=None):
+    total = time.perf_counter() - start
+    ttfb = res.elapsed.total_seconds()
+    retries = len(res.raw.retries.history) if res.raw is not None and res.raw.retries else 0
+    logging.log(level, f'HTTP {operation}: {http_method} {uri} status={res.status_code} ttfb={ttfb:.4f}s total={total:.4f}s bytes={len(res.content)} retries={retries}')
+
+def __swagbot_request(client, http_method=None, uri=None, qs={}, payload={}, proxy=None, extra_headers={}, operation=None, debug=False):
+    level = logging.INFO if debug else logging.DEBUG
+    tracing = logging.getLogger().isEnabledFor(level)
+    method = operation if operation else __get_operation()
     res = None
     body = None
     json_body = None
-    logging.debug('Executing method: {0}'.format(method))
     headers = {}
 
     headers['Content-Type'] = 'application/json'
@@ -41,15 +97,29 @@ def __swagbot_request(client, http_method=None, uri=None, qs={}, payload={}, pro
         for k, v in extra_headers.items():
             headers[k] = v
 
-    logging.debug('{0} {1}'.format(http_method, url))
-    if payload:
-        if not 'api_signature' in payload:
-            logging.debug('payload: {0}'.format(payload))
+    if tracing:
+        logging.log(level, f'HTTP {method}: {http_method} {uri}')
+        if payload and not 'api_signature' in payload:
+            logging.log(level, f'HTTP {method}: payload: {payload}')
+        start = time.perf_counter()
 
-    if payload:
-        res = requests.request(http_method, uri, proxies=proxy, headers=headers, params=qs, data=json.dumps(payload), verify=True)
-    else:
-        res = requests.request(http_method, uri, proxies=proxy, headers=headers, params=qs, verify=True)
+    host = urlparse(uri).hostname
+    metrics.count_call(kind='http')
+    request_start = time.perf_counter()
+    try:
+        if payload:
+            res = __get_session().request(http_method, uri, proxies=proxy, headers=headers, params=qs, data=json.dumps(payload), timeout=__get_timeout(), verify=True)
+        else:
+            res = __get_session().request(http_method, uri, proxies=proxy, headers=headers, params=qs, timeout=__get_timeout(), verify=True)
+    except Exception:
+        metrics.http_responses.inc(labels=(host, 'error'))
+        raise
+    finally:
+        metrics.http_seconds.observe(labels=(host,), value=time.perf_counter() - request_start)
+    metrics.http_responses.inc(labels=(host, str(res.status_code)))
+
+    if tracing:
+        __trace(level=level, operation=method, http_method=http_method, uri=uri, res=res, start=start)
 
     body = res.text
     if len(body) <= 0:
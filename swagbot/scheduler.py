@@ -1,107 +1,380 @@
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 from threading import *
 import base64
 import datetime
 import dill
+import heapq
 import logging
 import swagbot.database.scheduler as db
 import swagbot.globals as globals
+import swagbot.metrics as metrics
 import swagbot.utils.scheduler as utils
 import time
 
+catchup_policies = ['skip', 'run-once', 'run-all']
+
+class Engine(object):
+    # A single scheduler thread for the whole bot. Jobs are kept in a heap
+    # ordered by their next run time and the thread sleeps until the nearest
+    # deadline. Job metadata is only re-read from the database after refresh()
+    # is called, i.e., when a job is added, removed, enabled, or disabled.
+    def __init__(self, **kwargs):
+        self.name = kwargs.get('name', 'scheduler')
+        self.catchup = kwargs.get('catchup', 'run-once')
+        self.grace = kwargs.get('grace', 30)
+        self.workers = kwargs.get('workers', 4)
+        self.timeout = kwargs.get('timeout', 600)
+        self.timeouts = kwargs.get('timeouts', {})
+        self.condition = Condition()
+        self.heap = []
+        self.jobs = {}
+        self.modules = {}
+        self.dirty = True
+        self.engine_thread = None
+        self.executor = None
+        self.thread_started = False
+        self.stats_lock = Lock()
+        self.running = {}
+        self.stats = {}
+        self.callables = {}
+
+    def configure(self, config=None):
+        config = config or {}
+        catchup = config.get('catchup', self.catchup)
+        if catchup in catchup_policies:
+            self.catchup = catchup
+        else:
+            logging.error(f'Unknown scheduler catch-up policy "{catchup}". Using "{self.catchup}".')
+        self.grace = config.get('grace', self.grace)
+        self.workers = config.get('workers', self.workers)
+        self.timeout = config.get('timeout', self.timeout)
+        self.timeouts = config.get('timeouts', None) or self.timeouts
+
+    def register(self, module=None):
+        with self.condition:
+            self.modules[module] = True
+            self.dirty = True
+            self.condition.notify()
+
+    def unregister(self, module=None):
+        with self.condition:
+            self.modules.pop(module, None)
+            self.dirty = True
+            self.condition.notify()
+        self.unbind(module=module)
+
+    def bind(self, module=None, name=None, function=None):
+        with self.stats_lock:
+            self.callables[(module, name)] = function
+
+    def unbind(self, module=None, name=None):
+        # Called when a plugin is stopped, reloaded, or its jobs are deleted so
+        # a stale instance's methods are never run.
+        with self.stats_lock:
+            for key in [key for key in self.callables if key[0] == module and (name is None or key[1] == name)]:
+                del self.callables[key]
+
+    def resolve(self, job=None):
+        # Live callables are registered by Scheduler.add_job when the plugin is
+        # loaded. The pickled copy in the database is only decoded for a job
+        # whose plugin has not registered it in this process, and the result is
+        # cached until the module is unbound.
+        key = (job['module'], job['name'])
+        with self.stats_lock:
+            function = self.callables.get(key)
+        if function is None:
+            logging.debug(f'Restoring the job {job["module"]}.{job["name"]} from the database.')
+            function = dill.loads(base64.b64decode(job['function']))
+            with self.stats_lock:
+                function = self.callables.setdefault(key, function)
+        return function
+
+    def pause(self, module=None):
+        with self.condition:
+            if module in self.modules:
+                self.modules[module] = False
+
+    def resume(self, module=None):
+        with self.condition:
+            if module in self.modules:
+                self.modules[module] = True
+                self.condition.notify()
+
+    def refresh(self):
+        with self.condition:
+            self.dirty = True
+            self.condition.notify()
+
+    def next_run(self, interval=None, after=None):
+        # Runs are aligned to the wall clock: a job with an interval of 20 runs
+        # at :00, :20, and :40 past the hour.
+        candidate = datetime.datetime.fromtimestamp(after).replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        while candidate.minute % interval != 0:
+            candidate += datetime.timedelta(minutes=1)
+        return candidate.timestamp()
+
+    def __reload(self, now=None):
+        scheduled = {(module, name): next_run for next_run, module, name in self.heap}
+        jobs = {}
+        heap = []
+        for job in db.get_all_jobs():
+            key = (job['module'], job['name'])
+            if not job['module'] in self.modules or not job['interval']:
+                continue
+            jobs[key] = job
+            previous = self.jobs.get(key)
+            if key in scheduled and previous and previous['interval'] == job['interval']:
+                next_run = scheduled[key]
+            else:
+                next_run = self.next_run(interval=job['interval'], after=now)
+            heap.append((next_run, job['module'], job['name']))
+        heapq.heapify(heap)
+        self.jobs = jobs
+        self.heap = heap
+        self.dirty = False
+
+    def __due(self, job=None, deadline=None, now=None):
+        late = (now - deadline) > self.grace
+        if self.catchup == 'skip':
+            if late:
+                logging.warning(f'Skipping the missed run of {job["module"]}.{job["name"]} scheduled for {datetime.datetime.fromtimestamp(deadline)}.')
+                return 0
+            return 1
+        elif self.catchup == 'run-all':
+            runs = 1
+            slot = self.next_run(interval=job['interval'], after=deadline)
+            while slot <= now:
+                runs += 1
+                slot = self.next_run(interval=job['interval'], after=slot)
+            if runs > 1:
+                logging.warning(f'Catching up {runs} missed runs of {job["module"]}.{job["name"]}.')
+            return runs
+        return 1
+
+    def scheduler(self):
+        while self.thread_started:
+            job = None
+            runs = 0
+            with self.condition:
+                now = time.time()
+                if self.dirty:
+                    self.__reload(now=now)
+                if len(self.heap) == 0:
+                    self.condition.wait()
+                    continue
+                deadline, module, name = self.heap[0]
+                if deadline > now:
+                    self.condition.wait(timeout=deadline - now)
+                    continue
+
+                heapq.heappop(self.heap)
+                job = self.jobs.get((module, name))
+                if job:
+                    heapq.heappush(self.heap, (self.next_run(interval=job['interval'], after=now), module, name))
+                    if self.modules.get(module):
+                        if job['enabled']:
+                            runs = self.__due(job=job, deadline=deadline, now=now)
+                        else:
+                            logging.info(f'The job {job["module"]}.{job["name"]} is disabled. Skipping.')
+
+            if job and runs > 0:
+                self.dispatch(job=job, runs=runs)
+
+    def __acquire(self, job=None):
+        key = (job['module'], job['name'])
+        with self.stats_lock:
+            if key in self.running:
+                return False
+            self.running[key] = time.time()
+            return True
+
+    def __release(self, job=None):
+        with self.stats_lock:
+            self.running.pop((job['module'], job['name']), None)
+
+    def __timed_out(self, job=None, timeout=None):
+        logging.error(f'The job {job["module"]}.{job["name"]} has been running for more than {timeout} seconds.')
+        with self.stats_lock:
+            stats = self.stats.setdefault((job['module'], job['name']), {'run_count': 0, 'last_run': None, 'last_duration': None, 'last_error': None})
+            stats['last_error'] = f'Timed out after {timeout} seconds'
+
+    def dispatch(self, job=None, runs=1):
+        # Only one run of a given job may be in flight. The pool keeps a slow
+        # job from delaying every other job.
+        if not self.__acquire(job=job):
+            logging.warning(f'The job {job["module"]}.{job["name"]} is still running. Skipping this run.')
+            return
+        future = self.executor.submit(self.__run, job, runs)
+        # A run cancelled by stop() never reaches __run, which releases it.
+        future.add_done_callback(lambda future: self.__release(job=job) if future.cancelled() else None)
+
+    def run_job(self, job=None):
+        if not self.__acquire(job=job):
+            return None
+        return self.__run(job, 1)
+
+    def __run(self, job, runs):
+        timeout = self.timeouts.get(f'{job["module"]}.{job["name"]}', self.timeout)
+        watchdog = Timer(timeout, self.__timed_out, kwargs={'job': job, 'timeout': timeout})
+        watchdog.daemon = True
+        watchdog.start()
+        success = False
+        try:
+            for _ in range(runs):
+                success = self.execute(job=job, timeout=timeout)
+        finally:
+            watchdog.cancel()
+            self.__release(job=job)
+        return success
+
+    def execute(self, job=None, timeout=None):
+        logging.info(f'Executing the job {job["module"]}.{job["name"]}.')
+        error = None
+        start = time.perf_counter()
+        try:
+            fn, args = self.resolve(job=job)
+            fn(*args)
+        except Exception as e:
+            error = str(e)
+            logging.error(f'Failed to execute the job {job["module"]}.{job["name"]}: {e}')
+        duration = time.perf_counter() - start
+        if error is None and timeout and duration > timeout:
+            error = f'Exceeded the {timeout} second timeout'
+        metrics.job_seconds.observe(labels=(f'{job["module"]}.{job["name"]}',), value=duration)
+        if error is not None:
+            metrics.job_failures.inc(labels=(f'{job["module"]}.{job["name"]}',))
+
+        with self.stats_lock:
+            stats = self.stats.setdefault((job['module'], job['name']), {'run_count': 0, 'last_run': None, 'last_duration': None, 'last_error': None})
+            stats['run_count'] += 1
+            stats['last_run'] = int(time.time())
+            stats['last_duration'] = duration
+            stats['last_error'] = error
+        return error is None
+
+    def get_stats(self, module=None, name=None):
+        with self.stats_lock:
+            stats = self.stats.get((module, name))
+            return dict(stats) if stats else None
+
+    def start(self):
+        with self.condition:
+            if self.thread_started:
+                return
+            self.configure(config=globals.config.get('scheduler', None))
+            self.thread_started = True
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'{self.name}-worker')
+            self.engine_thread = Thread(
+                name=self.name,
+                target=self.scheduler,
+                daemon=True
+            )
+            self.engine_thread.start()
+        logging.info(f'Started the scheduler engine with {self.workers} workers and the "{self.catchup}" catch-up policy.')
+
+    def stop(self, timeout=10):
+        # Runs that haven't started are cancelled, and running jobs get up to
+        # timeout seconds to finish so they don't outlive the database
+        # connections closed at shutdown.
+        logging.info('Stopping the scheduler engine.')
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.thread_started = False
+            self.condition.notify()
+        if self.engine_thread and self.engine_thread.is_alive():
+            self.engine_thread.join(timeout=timeout)
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            while True:
+                with self.stats_lock:
+                    running = [f'{module}.{name}' for module, name in self.running]
+                if len(running) == 0:
+                    break
+                if time.monotonic() >= deadline:
+                    logging.warning(f'Stopped the scheduler engine with jobs still running: {", ".join(sorted(running))}.')
+                    break
+                time.sleep(0.1)
+
+engine = Engine()
+
 class Scheduler(object):
+    # Each plugin gets its own Scheduler, which is a view of the shared engine
+    # limited to that plugin's jobs.
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', 'scheduler')
-        self.scheduler_thread = Thread(
-            name=self.name,
-            target=self.scheduler,
-            daemon=True
-        )
+        self.engine = engine
         self.thread_started = False
         globals.schedulers[self.name] = self
 
     def add_job(self, module=None, name=None, interval=None, function=None, channels=[], enabled=None):
         logging.info(f'Adding the scheduled job {module}.{name}.')
+        self.engine.bind(module=module, name=name, function=function)
         db.add_job(module=module, name=name, interval=interval, function=function, enabled=enabled)
         if not utils.job_exists(module=module, name=name):
             logging.info(f'Failed to add the scheduled job {module}.{name}.')
-    
+        self.engine.refresh()
+
     def delete_job(self, module=None, name=None):
         if utils.job_exists(module=module, name=name):
             db.delete_job(module=module, name=name)
+            self.engine.unbind(module=module, name=name)
             if utils.job_exists(module=module, name=name):
                 logging.info(f'Failed to delete the scheduled job {module}.{name}.')
+            self.engine.refresh()
         else:
             logging.error(f'The scheduled job {module}.{name} doesn\'t exist.')
 
-    def scheduler(self):
-        while self.thread_started:
-            if self.scheduler_thread.is_alive():
-                now = datetime.datetime.now()
-                jobs = db.get_jobs_by_module(module=self.name)
-                for job in jobs:
-                    if (now.minute % job['interval']) == 0 and now.second == 0:
-                        if job['enabled']:
-                            logging.info(f'Executing the job {job["module"]}.{job["name"]}.')
-                            try:
-                                decoded = dill.loads(base64.b64decode(job['function']))
-                                fn, args = decoded
-                                fn(*args)
-                            except Exception as e:
-                                logging.error(f'Failed to execute the job {job["module"]}.{job["name"]}: {e}')
-                        else:
-                            logging.info(f'The job {job["module"]}.{job["name"]} is disabled. Skipping.')
-            time.sleep(1)
-    
     def job_count(self):
         jobs = self.get_jobs(module=self.name)
-        return len(jobs)
+        return len(jobs) if jobs else 0
 
     def start(self):
         plural = 'job' if self.job_count() == 1 else 'jobs'
-        # logging.info(f'Starting the scheduler {self.name} with {self.job_count()} {plural}.')
         self.thread_started = True
-        self.scheduler_thread.start()
-        if not self.scheduler_thread.is_alive():
-            self.thread_id = self.scheduler_thread.native_id
-            logging.error(f'Failed to start the scheduler {self.name}.')
-        else:
-            logging.info(f'Started the scheduler {self.name} with {self.job_count()} {plural}.')
-    
+        self.engine.register(module=self.name)
+        self.engine.start()
+        logging.info(f'Started the scheduler {self.name} with {self.job_count()} {plural}.')
+
     def stop(self):
         logging.info(f'Stopping the scheduler {self.name}.')
         self.thread_started = False
-        self.scheduler_thread.join(timeout=0)
-    
+        self.engine.unregister(module=self.name)
+
     def pause(self):
         logging.info(f'Pausing the scheduler {self.name}.')
         self.thread_started = False
-    
+        self.engine.pause(module=self.name)
+
     def resume(self):
         logging.info(f'Resuming the scheduler {self.name}.')
         self.thread_started = True
+        self.engine.resume(module=self.name)
 
     # Common functions need to be in a module accessible by all
     def job_exists(self, module=None, name=None):
         return utils.job_exists(module=module, name=name)
-    
+
     def job_exists_by_id(self, id=None):
         return utils.job_exists_by_id(id=id)
-    
+
     def job_enabled(self, module=None, name=None):
         return utils.job_enabled_by_id(module=module, name=name)
 
     def job_enabled_by_id(self, id=None):
         return utils.job_enabled_by_id(id=id)
-    
+
     def get_jobs(self, module=None, name=None):
         return utils.get_jobs(module=module, name=name)
-    
+
     def get_job_by_id(self, id=None):
         return utils.get_job_by_id(id=id)
-    
+
     def get_job_channels(self, module=None, name=None):
         return utils.get_job_channels(module=module, name=name)
 
     def delete_jobs_for_module(self, module=None):
-        return utils.delete_jobs_for_module(module=module)
+        result = utils.delete_jobs_for_module(module=module)
+        self.engine.unbind(module=module)
+        self.engine.refresh()
+        return result
@@ -0,0 +1,95 @@
+from threading import Event, Lock, Thread
+import logging
+import swagbot.database.core as db
+import time
+import swagbot.utils.core as utils
+
+class SeenTracker(object):
+    def __init__(self, **kwargs):
+        self.name = kwargs.get('name', 'seen')
+        self.flush_interval = kwargs.get('flush_interval', 30)
+        self.flush_size = kwargs.get('flush_size', 500)
+        # Seconds a user's name is trusted before it is looked up again, so a
+        # rename is picked up once the maintenance sync has stored it.
+        self.name_ttl = kwargs.get('name_ttl', 3600)
+        self.lock = Lock()
+        self.wakeup = Event()
+        # User ID -> (username, expires)
+        self.names = {}
+        self.seen = {}
+        self.pending = {}
+        self.flush_thread = Thread(
+            name=self.name,
+            target=self.flusher,
+            daemon=True
+        )
+        self.thread_started = False
+
+    def update(self, userid=None, channel=None):
+        username, expires = self.names.get(userid, (None, 0))
+        if expires <= time.monotonic():
+            userinfo = db.get_user_by_id(id=userid)
+            if not userinfo:
+                logging.error(f'User info for {userid} not found')
+                return
+            if username is not None and username != userinfo['name']:
+                with self.lock:
+                    if self.seen.get(username, {}).get('id') == userid:
+                        del self.seen[username]
+            username = userinfo['name']
+            self.names[userid] = (username, time.monotonic() + self.name_ttl)
+
+        row = {
+            'id': userid,
+            'name': username,
+            'seen_time': utils.now(),
+            'seen_channel': channel,
+        }
+        with self.lock:
+            self.seen[username] = row
+            self.pending[userid] = row
+            pending = len(self.pending)
+        if pending >= self.flush_size:
+            self.wakeup.set()
+
+    def get_seen(self, username=None):
+        row = self.seen.get(username)
+        if row:
+            return dict(row)
+        return db.get_seen(username=username)
+
+    def flush(self):
+        with self.lock:
+            rows = list(self.pending.values())
+            self.pending = {}
+        if len(rows) <= 0:
+            return
+
+        if db.update_seen_many(rows=rows):
+            logging.debug(f'Flushed {len(rows)} seen updates.')
+        else:
+            # Put the rows back unless a newer update for the same user arrived
+            # while we were writing.
+            with self.lock:
+                for row in rows:
+                    if not row['id'] in self.pending:
+                        self.pending[row['id']] = row
+
+    def flusher(self):
+        while self.thread_started:
+            self.wakeup.wait(timeout=self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def start(self):
+        self.thread_started = True
+        self.flush_thread.start()
+        logging.info(f'Started the seen tracker with a flush interval of {self.flush_interval} seconds.')
+
+    def stop(self):
+        logging.info('Stopping the seen tracker.')
+        self.thread_started = False
+        self.wakeup.set()
+        if self.flush_thread.is_alive():
+            self.flush_thread.join(timeout=5)
+        self.flush()
@@ -10,7 +10,9 @@ import re
 import swagbot.database.core as db
 import swagbot.exception as exception
 import swagbot.globals as globals
+import swagbot.registry as registry
 import sys
+import threading
 import time
 import yaml
 
@@ -126,7 +128,7 @@ def current_time():
     return human_time
 
 def ts_to_human(timestamp):
-    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
 
 def to_gb(num):
     return int(num / 1024 / 1024 / 1024)
@@ -134,12 +136,6 @@ def to_gb(num):
 def to_mb(num):
     return int(num / 1024 / 1024 / 1024 / 1024)
 
-def dict_factory(cursor, row):
-    d = {}
-    for idx,col in enumerate(cursor.description):
-        d[col[0]] = row[idx]
-    return d
-
 def quote_list(l):
     return ','.join(['\'{}\''.format(x) for x in l])
 
@@ -218,6 +214,40 @@ def generate_table(headers, data):
         disable_numparse=True
     )
 
+def message_limit():
+    output_config = globals.config.get('output', None) or {}
+    return output_config.get('message_limit', 3900)
+
+def upload_threshold():
+    output_config = globals.config.get('output', None) or {}
+    return output_config.get('upload_threshold', 8000)
+
+def pack_table(headers, data, limit=None):
+    return pack_rendered_table(table=generate_table(headers=headers, data=data), limit=limit)
+
+def pack_rendered_table(table=None, limit=None):
+    # Split a rendered table between rows into as few messages as possible,
+    # each no longer than limit characters. Every message repeats the header
+    # and column widths are the same in all of them.
+    limit = limit if limit else message_limit()
+    lines = table.split('\n')
+    header = lines[0:3]
+    footer = lines[-1]
+    chunks = []
+    chunk = list(header)
+    length = len('\n'.join(header)) + len(footer) + 1
+    for row in lines[3:-1]:
+        if len(chunk) > len(header) and length + len(row) + 1 > limit:
+            chunk.append(footer)
+            chunks.append('\n'.join(chunk))
+            chunk = list(header)
+            length = len('\n'.join(header)) + len(footer) + 1
+        chunk.append(row)
+        length += len(row) + 1
+    chunk.append(footer)
+    chunks.append('\n'.join(chunk))
+    return chunks
+
 def iter_namespace(ns_pkg):
     # Specifying the second argument (prefix) to iter_modules makes the
     # returned name an absolute name instead of a relative one. This allows
@@ -225,12 +255,9 @@ def iter_namespace(ns_pkg):
     return pkgutil.iter_modules(ns_pkg.__path__, ns_pkg.__name__ + '.')
 
 def prune_commands_table():
-    loaded_commands = []
-    for _, plugin_obj in globals.plugins.items():
-        plugin_instance = plugin_obj['instance']
-        if hasattr(plugin_instance, 'methods'):
-            loaded_commands += list(plugin_instance.methods.keys())
-    loaded_commands = sorted(loaded_commands)
+    # The registry holds every command of every enabled module, whether the
+    # module was imported or only registered from the commands table.
+    loaded_commands = sorted(registry.commands())
 
     command_table_commands = db.all_commands()
 
@@ -239,15 +266,23 @@ def prune_commands_table():
         command = 'command' if len(to_prune) == 1 else 'commands'
         logging.info(f'Pruning {len(to_prune)} {command} from the commands table.')
         db.prune_commands_table(commands=to_prune)
+        registry.prune(commands=to_prune)
+
+plugin_lock = threading.RLock()
 
 def load_module(module=None, client=None):
     logging.info(f'Loading module {module}.')
     try:
+        start = time.perf_counter()
         module_obj = importlib.import_module(module)
+        imported = time.perf_counter()
         module_instance = module_obj.Plugin(client=client)
+        initialized = time.perf_counter()
+        module_instance.start_warmup()
         logging.info(f'Updating bot commands for the module {module}.')
         db.update_plugin_commands(module=module_instance.classname, methods=module_instance.methods)
-        globals.plugins[module] = {'module': module, 'instance': module_instance}
+        registry.register(module=module_instance.classname, methods=module_instance.methods)
+        globals.plugins[module] = {'module': module, 'instance': module_instance, 'import_time': imported - start, 'init_time': initialized - imported}
         return None
     except Exception as e:
         return e
@@ -255,12 +290,60 @@ def load_module(module=None, client=None):
 def reload_module(module=None, client=None):
     logging.info(f'Reloading module {module}.')
     try:
+        start = time.perf_counter()
         module_obj = importlib.import_module(module)
         importlib.reload(module_obj)
+        imported = time.perf_counter()
         module_instance = module_obj.Plugin(client=client)
+        initialized = time.perf_counter()
+        module_instance.start_warmup()
         logging.info(f'Updating bot commands for the module {module}.')
         db.update_plugin_commands(module=module_instance.classname, methods=module_instance.methods)
-        globals.plugins[module] = {'module': module, 'instance': module_instance}
+        registry.register(module=module_instance.classname, methods=module_instance.methods)
+        globals.plugins[module] = {'module': module, 'instance': module_instance, 'import_time': imported - start, 'init_time': initialized - imported}
         return None
     except Exception as e:
         return e
+
+def register_module(module=None):
+    # Registers a module's commands from the commands table without importing
+    # it. Returns False if the table has no commands for the module, e.g., the
+    # first time it is seen, in which case it has to be loaded.
+    methods = db.module_manifest(module=module)
+    if not methods:
+        return False
+    registry.register(module=module, methods=methods)
+    logging.info(f'Registered {len(methods)} commands for the module {module} without loading it.')
+    return True
+
+def plugin_instance(module=None, client=None):
+    # Returns the instance of a plugin, loading the plugin first if it was only
+    # registered. The lock keeps two workers from loading the same plugin.
+    plugin = globals.plugins.get(module)
+    if plugin:
+        return plugin['instance']
+    with plugin_lock:
+        plugin = globals.plugins.get(module)
+        if not plugin:
+            err = load_module(module=module, client=client)
+            if err:
+                logging.error(f'Failed to load the module {module}: {err}.')
+                return None
+            prune_commands_table()
+            plugin = globals.plugins[module]
+            logging.info(f'Loaded the module {module} on first use in {plugin["import_time"] + plugin["init_time"]:.4f} seconds.')
+        return plugin['instance']
+
+def plugin_state(module=None):
+    plugin = globals.plugins.get(module)
+    if not plugin:
+        return 'Not loaded'
+    return plugin['instance'].state.capitalize()
+
+def plugin_load_report(modules=None):
+    # One line per module showing how long its import and constructor took,
+    # slowest first. Modules that were only registered are listed last.
+    loaded = sorted([plugin for plugin in globals.plugins.values() if plugin['module'] in modules], key=lambda plugin: plugin['import_time'] + plugin['init_time'], reverse=True)
+    report = [f'{plugin["module"]}: {plugin["import_time"] + plugin["init_time"]:.4f} seconds (import {plugin["import_time"]:.4f}, init {plugin["init_time"]:.4f})' for plugin in loaded]
+    report += [f'{module}: not loaded' for module in sorted(modules) if not module in globals.plugins]
+    return report
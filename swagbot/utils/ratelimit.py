@@ -0,0 +1,38 @@
+from threading import Lock
+import time
+
+class TokenBucket(object):
+    # A client-side rate limiter. The bucket holds up to `capacity` tokens and
+    # is refilled at `rate` tokens every `per` seconds. Each request takes one
+    # token, waiting for the refill if the bucket is empty.
+    def __init__(self, **kwargs):
+        self.rate = kwargs.get('rate', 5)
+        self.per = kwargs.get('per', 60)
+        self.capacity = kwargs.get('capacity', self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def __refill(self, now=None):
+        self.tokens = min(self.capacity, self.tokens + ((now - self.updated) * self.rate / self.per))
+        self.updated = now
+
+    def try_acquire(self):
+        # Takes a token if one is available. Returns 0 on success, otherwise the
+        # number of seconds until the next token.
+        with self.lock:
+            self.__refill(now=time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) * self.per / self.rate
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
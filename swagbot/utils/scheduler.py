@@ -1,27 +1,29 @@
-import base64
-import dill
 import logging
 import swagbot.database.scheduler as db
+import swagbot.scheduler as scheduler
 import swagbot.utils.core as utils
 
+list_headers = ['Job ID', 'Module', 'Name', 'Interval', 'Status', 'Runs', 'Last Run', 'Duration', 'Last Error']
+
 def list(module=None, name=None):
     list_output = []
     results = db.get_jobs(module=module, name=name)
     if results:
         if len(results) > 0:
-            for result in results:
-                result['enabled'] = 'Enabled' if result['enabled'] == 1 else 'Disabled'
-            for chunk in utils.chunker(results, 25):
-                output = []
-                for job in chunk:
-                    output.append([
-                        job['id'],
-                        job['module'],
-                        job['name'],
-                        job['interval'],
-                        job['enabled'],
-                    ])
-                list_output.append(utils.generate_table(headers=['Job ID', 'Module', 'Name', 'Interval', 'Status'], data=output))
+            for job in results:
+                stats = scheduler.engine.get_stats(module=job['module'], name=job['name']) or {}
+                last_error = stats.get('last_error') or ''
+                list_output.append([
+                    job['id'],
+                    job['module'],
+                    job['name'],
+                    job['interval'],
+                    'Enabled' if job['enabled'] == 1 else 'Disabled',
+                    stats.get('run_count', 0),
+                    utils.ts_to_human(stats['last_run']) if stats.get('last_run') else 'Never',
+                    '{:.2f}s'.format(stats['last_duration']) if stats.get('last_duration') is not None else '',
+                    last_error[0:40],
+                ])
         return list_output
     else:
         return False
@@ -32,6 +34,7 @@ def enable(id=None):
             job = get_job_by_id(id=id)
             if job:
                 db.enable_job(module=job['module'], name=job['name'])
+                scheduler.engine.refresh()
                 if job_enabled_by_id(id=id):
                     return f'The scheduled job `{job["module"]}.{job["name"]}` was successfully enabled.'
                 else:
@@ -49,6 +52,7 @@ def disable(id=None):
             job = get_job_by_id(id=id)
             if job:
                 db.disable_job(module=job['module'], name=job['name'])
+                scheduler.engine.refresh()
                 if not job_enabled_by_id(id=id):
                     return f'The scheduled job `{job["module"]}.{job["name"]}` was successfully disabled.'
                 else:
@@ -63,14 +67,12 @@ def disable(id=None):
 def run(id=None):
     job = get_job_by_id(id=id)
     if job:
-        logging.info(f'Executing the job {job["module"]}.{job["name"]}.')
-        try:
-            decoded = dill.loads(base64.b64decode(job['function']))
-            fn, args = decoded
-            fn(*args)
+        success = scheduler.engine.run_job(job=job)
+        if success is None:
+            return f'The job `{job["module"]}.{job["name"]}` is already running.'
+        elif success:
             return f'Successfully executed the job `{job["module"]}.{job["name"]}`.'
-        except Exception as e:
-            logging.error(f'Failed to execute the job {job["module"]}.{job["name"]}: {e}')
+        else:
             return f'Failed to execute the job {job["module"]}.{job["name"]}.'
     else:
         return f'Job ID `{id}` not found.'